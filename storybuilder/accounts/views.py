@@ -1,3 +1,5 @@
+import logging
+
 from django.shortcuts import render, redirect
 from django.contrib.auth import login, authenticate, logout
 from django.contrib import messages
@@ -6,28 +8,25 @@ from django.contrib.auth.decorators import login_required
 from .forms import UserRegistrationForm, UserLoginForm, UserProfileForm
 from .models import CustomUser, UserProfile
 
+logger = logging.getLogger(__name__)
+
 
 def register(request):
     """View function for registering a new user account."""
 
-    print("*************************")
-    print("Register New User")
+    logger.debug("Register New User")
 
     if request.method == 'POST':
         form = UserRegistrationForm(request.POST)
         if form.is_valid():
             try:
                 user = form.save()
-                print(f"Saved new user with ID {user.id}, creating user profile ...")
                 profile = UserProfile.objects.create(user=user)
-                print(f"User Profile created with ID {profile.id}")
                 messages.success(request, 'Registration successful!')
-                print("New user created successfully!")
-                print(user)
+                logger.info("Registered user %s with profile %s", user.id, profile.id)
                 return redirect('login') 
-            except Exception as error:
-                print("There was an error while creating a new user.")
-                print(error)
+            except Exception:
+                logger.exception("There was an error while creating a new user.")
 
     else:
         form = UserRegistrationForm()
@@ -41,8 +40,7 @@ def register(request):
 def login_view(request):
     """View function for logging in an existing user."""
 
-    print("********************************")
-    print("Login Existing User")
+    logger.debug("Login Existing User")
 
     if request.method == 'POST':
         form = UserLoginForm(request=request, data=request.POST)
@@ -53,13 +51,11 @@ def login_view(request):
             if user is not None:
                 login(request, user)
                 messages.success(request, 'Login successful!')
-                print("Successfully logged in")
-                print(user)
+                logger.info("Logged in user %s", user.id)
                 return redirect('home')
             else:
                 messages.error(request, 'Invalid username or password')
-                print("Login was unsuccessful")
-                print(user)
+                logger.info("Login was unsuccessful")
     else:
         form = UserLoginForm()
 
@@ -73,13 +69,10 @@ def login_view(request):
 def logout_view(request):
     """View function for logging out an existing user."""
 
-    print("**********************")
-    print("Logout Existing User")
+    logger.debug("Logout Existing User")
 
     logout(request)
     messages.success(request, 'Logout successful!')
-    print("Successfully logged out user")
-    print(request.user)
     return redirect('home')
 
 
@@ -87,8 +80,7 @@ def logout_view(request):
 def profile(request):
     """View function for rendering user profile."""
 
-    print("*******************************")
-    print("Render User Profile")
+    logger.debug("Render User Profile")
 
     # check for user profile, and create one if it doesn't exist
     if request.user.is_authenticated:
@@ -96,15 +88,14 @@ def profile(request):
         try:
             profile = user.profile
         except:
-            print("No user profile, creating one now ...")
             profile = UserProfile.objects.create(user=user) 
-            print(f"Created user profile with ID {profile.id}")
+            logger.info("Created missing profile %s for user %s", profile.id, user.id)
 
         context = {'user': user, 'profile': profile}
         return render(request, 'profile.html', context=context)
     
     else:
-        print("User not logged in")
+        logger.debug("User not logged in")
         return redirect('login')
 
 
@@ -112,8 +103,7 @@ def profile(request):
 def update_profile(request):
     """View function for updating a user profile."""
 
-    print("*******************************")
-    print("Update User Profile")
+    logger.debug("Update User Profile")
 
     # check for user profile, and create one if it doesn't exist
     if request.user.is_authenticated:
@@ -128,8 +118,7 @@ def update_profile(request):
             if form.is_valid():
                 profile = form.save()
                 messages.success(request, 'Profile updated successfully!')
-                print("Successfully updated user profile")
-                print(user)
+                logger.debug("Updated profile of user %s", user.id)
                 return redirect('profile')
         else:
             form = UserProfileForm(instance=profile)
@@ -147,26 +136,23 @@ def update_profile(request):
 def delete_user(request):
     """View function for deleting a user account."""
 
-    print("*****************************")
-    print("Delete User Account")
+    logger.debug("Delete User Account")
 
     if request.user.is_authenticated:
         try:
             user = request.user
             profile = user.profile
 
-            print(f"Preparing to delete user {user} ...")
+            user_id = user.id
             profile.delete()
             user.delete()
-            print("Successfully deleted the user.")
+            logger.info("Deleted user %s", user_id)
 
-        except Exception as error:
-            print("***************")
-            print("There was an error while deleting the user.")
-            print(error)
+        except Exception:
+            logger.exception("There was an error while deleting the user.")
 
         return redirect('home')
 
     else:
-        print("User not logged in")
+        logger.debug("User not logged in")
         return redirect('login')
@@ -0,0 +1,141 @@
+"""Autosave of scene and character edits from partial patches.
+
+An editor sends only the fields it changed. Each patch is validated on its
+own, field by field, and merged into the editor's pending patch, a
+`PendingPatch` row, so any worker process can pick up what another one
+buffered. The merged patch is written with `update_fields` at most once every
+`AUTOSAVE_INTERVAL` seconds per editor and object; patches arriving in
+between are only buffered, and the editor is told when to send again. A
+patch marked `flush` is written at once, so an editor that stops typing can
+save what is still pending.
+
+A merge takes the database write lock before it reads the pending patch, so
+two patches of the same object, say from two tabs, are merged one after the
+other rather than over each other.
+"""
+import json
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.forms import modelform_factory
+
+from .models import Scene, Character, PendingPatch
+
+# Fields an autosave may patch, per model: those of the update forms, apart from relations
+AUTOSAVE_FIELDS = {
+    Scene: ['title', 'description', 'prose'],
+    Character: [
+        'first_name', 'middle_name', 'last_name', 'gender', 'age', 'ethnicity', 'occupation', 'location',
+        'hair_color', 'eye_color', 'height', 'body_type', 'personality_traits', 'mbti_personality',
+        'enneagram_personality', 'description',
+    ],
+}
+
+# Fields the model works out again when any of these fields change
+DEPENDENT_FIELDS = {
+    'prose': ['word_count'],
+    'first_name': ['full_name', 'slug'],
+    'middle_name': ['full_name', 'slug'],
+    'last_name': ['full_name', 'slug'],
+}
+
+KINDS = {Scene: PendingPatch.SCENE, Character: PendingPatch.CHARACTER}
+
+
+class PatchError(Exception):
+    """A patch that could not be saved, with the messages for each field."""
+
+    def __init__(self, errors: dict):
+        self.errors = errors
+        super().__init__(f"The patch has errors in {', '.join(errors)}")
+
+
+def form_data(patch: dict) -> dict:
+    """Turn the values of a JSON patch into form field values."""
+
+    return {
+        field: '' if value is None else value if isinstance(value, str) else json.dumps(value)
+        for field, value in patch.items()
+    }
+
+
+def patch_form(instance, data: dict):
+    """Bind a model form that validates and saves only the patched fields of a scene or character."""
+
+    return modelform_factory(type(instance), fields=list(data))(data, instance=instance)
+
+
+def pending_patches(instance, editor=None):
+    """The pending patches of a scene or character, only the editor's if given."""
+
+    patches = PendingPatch.objects.filter(kind=KINDS[type(instance)], object_id=instance.pk)
+    return patches if editor is None else patches.filter(editor=str(editor))
+
+
+def write_patch(form, patch: dict):
+    """Save the patched fields of a validated patch form, with the fields the model works out from them."""
+
+    fields = set(patch)
+    for field in list(fields):
+        fields.update(DEPENDENT_FIELDS.get(field, []))
+    form.instance.save(update_fields=sorted(fields))
+
+
+def save_patch(instance, data: dict, editor, flush: bool = False, now: float = None) -> dict:
+    """Validate a patch and write it, with anything pending, if the editor's interval has passed.
+
+    Returns the acknowledgement sent back to the editor: the fields written,
+    the fields still pending and, if some are, the seconds to wait before
+    sending again. Raises a PatchError for an invalid patch or for fields
+    that cannot be patched.
+    """
+
+    unknown = sorted(set(data) - set(AUTOSAVE_FIELDS[type(instance)]))
+    if unknown:
+        raise PatchError({field: ['This field cannot be autosaved.'] for field in unknown})
+
+    form = patch_form(instance, data)
+    if not form.is_valid():
+        raise PatchError(form.errors)
+
+    now = time.time() if now is None else now
+    with transaction.atomic():
+        # Take the write lock first, so a patch of the same object from another worker waits for this merge
+        pending_patches(instance, editor).update(written_at=F('written_at'))
+        state, _ = PendingPatch.objects.get_or_create(
+            kind=KINDS[type(instance)], object_id=instance.pk, editor=str(editor), defaults={'story_id': instance.story_id}
+        )
+
+        state.patch.update(data)
+        wait = state.written_at + settings.AUTOSAVE_INTERVAL - now
+        if wait > 0 and not flush:
+            state.save(update_fields=['patch'])
+            return {'saved': [], 'pending': sorted(state.patch), 'retry_after': round(wait, 1)}
+
+        # The pending fields were checked when they arrived; check them again together with this patch
+        form = patch_form(instance, state.patch)
+        if form.is_valid():
+            write_patch(form, state.patch)
+            saved = sorted(state.patch)
+            state.patch, state.written_at = {}, now
+            state.save(update_fields=['patch', 'written_at'])
+
+            # Other editors' rows with nothing pending only hold a write time that has lapsed
+            pending_patches(instance).filter(patch={}, written_at__lt=now - settings.AUTOSAVE_INTERVAL).delete()
+            return {'saved': saved, 'pending': []}
+
+        # Only the fields that fail are dropped, or this patch's if the fields fail together; the rest stay pending
+        errors = form.errors
+        failed = set(errors) & set(state.patch) or set(data)
+        state.patch = {field: value for field, value in state.patch.items() if field not in failed}
+        state.save(update_fields=['patch'])
+
+    raise PatchError(errors)
+
+
+def forget(instance):
+    """Delete the pending patches of a deleted scene or character."""
+
+    pending_patches(instance).delete()
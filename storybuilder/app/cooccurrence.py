@@ -0,0 +1,143 @@
+"""Character co-occurrence analytics from scene membership, computed with NumPy.
+
+The scenes of a story and their characters are read in one query over the
+`Scene.characters` through table, the character names in another, and
+turned into a scene by character incidence matrix with scenes in display
+order. Everything else is derived from it with array operations: the
+co-occurrence matrix is the incidence matrix times its transpose, and the
+presence of each character along the story is the share of scenes it
+appears in per segment of consecutive scenes. Results are cached under the
+story version, like page fragments, so any change to the story's scenes or
+characters computes them afresh.
+"""
+import numpy as np
+from django.conf import settings
+from django.core.cache import caches
+
+from .models import Scene, Character
+
+# Segments the story is split into for the presence matrix, unless asked otherwise
+SEGMENTS = 10
+MAX_SEGMENTS = 100
+
+# Character pairs listed by the number of scenes they share
+TOP_PAIRS = 20
+
+
+def load_incidence(story_id: int):
+    """Read a story's scene membership into a boolean scene by character matrix.
+
+    Returns the matrix and the (ID, slug, name) of the characters of its
+    columns, by ID. Rows are the scenes in display order, including scenes
+    without characters.
+    """
+
+    rows = list(Scene.objects.filter(story_id=story_id).order_by().values_list('order', 'characters'))
+    characters = list(Character.objects.filter(story_id=story_id).order_by('id').values_list('id', 'slug', 'full_name'))
+    character_ids = np.array([pk for pk, _, _ in characters], dtype=np.int64)
+
+    # Scenes without characters come back with a null character, which becomes NaN
+    membership = np.array(rows, dtype=np.float64).reshape(-1, 2)
+    orders, scene_rows = np.unique(membership[:, 0], return_inverse=True)
+    incidence = np.zeros((len(orders), len(characters)), dtype=bool)
+
+    present = ~np.isnan(membership[:, 1])
+    members = membership[present, 1].astype(np.int64)
+    if len(characters):
+        columns = np.minimum(np.searchsorted(character_ids, members), len(characters) - 1)
+        known = character_ids[columns] == members
+        incidence[scene_rows[present][known], columns[known]] = True
+    return incidence, characters
+
+
+def segment_bounds(scene_count: int, segments: int) -> np.ndarray:
+    """Split scene positions into at most `segments` runs of nearly equal length, as boundary indexes."""
+
+    segments = min(segments, scene_count)
+    return np.linspace(0, scene_count, segments + 1).round().astype(np.int64)
+
+
+def analyze(incidence: np.ndarray, segments: int = SEGMENTS) -> dict:
+    """Derive the co-occurrence and presence statistics from an incidence matrix.
+
+    Returns arrays: `cooccurrence`, the scenes shared by each pair of
+    characters, with each character's own scene count on the diagonal;
+    `presence`, each character's share of the scenes in each segment;
+    `bounds`, the segment boundaries; and `first` and `last`, each
+    character's first and last scene index, -1 for characters in no scene.
+    """
+
+    scene_count = incidence.shape[0]
+
+    # Counts stay exact in float32 far beyond any story length, and the product runs on BLAS
+    matrix = incidence.astype(np.float32)
+    cooccurrence = (matrix.T @ matrix).round().astype(np.int64)
+
+    bounds = segment_bounds(scene_count, segments)
+    if scene_count:
+        presence = np.add.reduceat(matrix, bounds[:-1], axis=0) / np.diff(bounds)[:, None]
+    else:
+        presence = np.zeros((0, incidence.shape[1]))
+
+    appears = incidence.any(axis=0)
+    first = np.where(appears, incidence.argmax(axis=0), -1)
+    last = np.where(appears, scene_count - 1 - incidence[::-1].argmax(axis=0), -1)
+
+    return {'cooccurrence': cooccurrence, 'presence': presence.T, 'bounds': bounds, 'first': first, 'last': last}
+
+
+def top_pairs(cooccurrence: np.ndarray, limit: int = TOP_PAIRS) -> list:
+    """Return (row, column, shared scenes, Jaccard index) for the pairs sharing the most scenes."""
+
+    rows, columns = np.triu_indices(len(cooccurrence), k=1)
+    shared = cooccurrence[rows, columns]
+    order = np.argsort(-shared, kind='stable')[:limit]
+    order = order[shared[order] > 0]
+
+    scenes = np.diagonal(cooccurrence)
+    union = scenes[rows[order]] + scenes[columns[order]] - shared[order]
+    jaccard = shared[order] / union
+    return list(zip(rows[order].tolist(), columns[order].tolist(), shared[order].tolist(), jaccard.tolist()))
+
+
+def cooccurrence_summary(story, segments: int = SEGMENTS) -> dict:
+    """Return the co-occurrence analytics of a story as JSON-ready data, cached under its version.
+
+    Scene positions are 1-based, as in the scene URLs. The matrices list
+    characters in the order of `characters`.
+    """
+
+    cache = caches[settings.FRAGMENT_CACHE_ALIAS]
+    key = f"cooccurrence:{story.pk}:{story.version}:{segments}"
+    summary = cache.get(key)
+    if summary is not None:
+        return summary
+
+    incidence, characters = load_incidence(story.pk)
+    stats = analyze(incidence, segments)
+    bounds = stats['bounds'].tolist()
+
+    summary = {
+        'scene_count': incidence.shape[0],
+        'characters': [
+            {
+                'slug': slug,
+                'name': name,
+                'scenes': scenes,
+                'first': first + 1 if first >= 0 else None,
+                'last': last + 1 if last >= 0 else None
+            }
+            for (_, slug, name), scenes, first, last in zip(
+                characters, np.diagonal(stats['cooccurrence']).tolist(), stats['first'].tolist(), stats['last'].tolist()
+            )
+        ],
+        'cooccurrence': stats['cooccurrence'].tolist(),
+        'segments': [{'start': start + 1, 'end': end} for start, end in zip(bounds, bounds[1:])],
+        'presence': stats['presence'].round(3).tolist(),
+        'pairs': [
+            {'characters': [characters[row][1], characters[column][1]], 'scenes': shared, 'jaccard': round(jaccard, 3)}
+            for row, column, shared, jaccard in top_pairs(stats['cooccurrence'])
+        ]
+    }
+    cache.set(key, summary, settings.FRAGMENT_CACHE_TIMEOUT)
+    return summary
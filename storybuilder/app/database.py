@@ -0,0 +1,71 @@
+"""SQLite connection profile and read/write database routing.
+
+Every new SQLite connection gets the pragmas in the `SQLITE_PRAGMAS` setting:
+WAL journaling lets readers carry on while a writer commits, and
+`busy_timeout` makes a writer wait for the lock instead of failing with
+"database is locked".
+
+Reads go to the read-only `DATABASE_READ_ALIAS` connection and writes to the
+primary. Once a request has written, or is not a safe request, or is inside
+a transaction on the primary, its reads stay on the primary too, so it always
+reads its own writes.
+"""
+import contextvars
+import logging
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+# Set for the rest of a request once it writes, see app.middleware.ReadAfterWriteMiddleware
+primary_pinned = contextvars.ContextVar('primary_pinned', default=False)
+
+
+def read_alias():
+    """The alias of the read-only connection, or None if there is none."""
+
+    alias = getattr(settings, 'DATABASE_READ_ALIAS', None)
+    return alias if alias in settings.DATABASES else None
+
+
+@receiver(connection_created)
+def apply_pragmas(sender, connection, **kwargs):
+    """Apply the `SQLITE_PRAGMAS` setting to a new SQLite connection."""
+
+    if connection.vendor != 'sqlite':
+        return
+
+    pragmas = dict(getattr(settings, 'SQLITE_PRAGMAS', {}))
+    if connection.alias == read_alias():
+        # The journal mode is part of the file and can only be set by a writer
+        pragmas.pop('journal_mode', None)
+        pragmas['query_only'] = 'on'
+
+    # Straight on the driver connection, so query logs and counters don't see them
+    for name, value in pragmas.items():
+        connection.connection.execute(f"PRAGMA {name} = {value}")
+    logger.debug("Applied %s to the %s connection", pragmas, connection.alias)
+
+
+class ReadWriteRouter:
+    """Send reads to the read-only connection and everything else to the primary."""
+
+    def db_for_read(self, model, **hints):
+        alias = read_alias()
+        if alias is None or primary_pinned.get() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        primary_pinned.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases are the same database
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return False if db == read_alias() else None
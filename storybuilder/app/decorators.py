@@ -0,0 +1,267 @@
+"""View decorators for the Story Builder.
+
+Each decorator works on both sync and async views. Async views get their
+lookups through the async ORM, so nothing here queries from the event loop.
+"""
+import hashlib
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.contrib.auth.decorators import login_required as auth_login_required
+from django.contrib.auth.views import redirect_to_login
+from django.db.models import Max, Sum
+from django.shortcuts import render
+from django.http import JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, quote_etag
+from django.utils.http import http_date
+
+from .models import Story, Scene, Character, PlotPoint
+from .ordering import get_at_position, aget_at_position
+from .utils import aget_scene, aget_character
+
+
+def login_required(view_func):
+    """Django's `login_required`, also for async views.
+
+    An async view cannot read the lazy `request.user`, so the user is loaded
+    with `request.auser()` instead and set as `request.user` for the rest of
+    the request, including the templates.
+    """
+
+    if not iscoroutinefunction(view_func):
+        return auth_login_required(view_func)
+
+    @wraps(view_func)
+    async def wrapper(request, *args, **kwargs):
+        request.user = await request.auser()
+        if not request.user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await view_func(request, *args, **kwargs)
+
+    return wrapper
+
+
+def not_found(request, model_name: str, as_json: bool):
+    """Render the 404 response used by the story views."""
+
+    if as_json:
+        return JsonResponse({'error': f"{model_name} not found."}, status=404)
+
+    context = {'model_name': model_name}
+    return render(request, '404.html', status=404, context=context)
+
+
+def page_etag(request, *versions) -> str:
+    """Build the ETag of a page from the versions of what it shows and from who is viewing it.
+
+    Pages show the viewer's name and a CSRF token, so both are part of the tag,
+    along with the `PAGE_ETAG_SALT` setting to retire old tags when the page
+    templates change.
+    """
+
+    parts = (*versions, request.user.pk, request.user, request.META.get('CSRF_COOKIE', ''), getattr(settings, 'PAGE_ETAG_SALT', ''))
+    key = ':'.join(str(part) for part in parts)
+    return quote_etag(hashlib.md5(key.encode(), usedforsecurity=False).hexdigest())
+
+
+def conditional_response(request, etag: str, last_modified, view):
+    """Answer a GET or HEAD with 304 Not Modified when the client's copy is current, or else call `view`.
+
+    Responses are labelled with the ETag and Last-Modified headers and marked
+    private and always revalidated, so browsers ask again instead of guessing.
+    """
+
+    if request.method not in ('GET', 'HEAD'):
+        return view()
+
+    response = not_modified(request, etag, last_modified)
+    if response is None:
+        response = view()
+        if response.status_code != 200:
+            return response
+    return label_conditional(response, etag, last_modified)
+
+
+async def aconditional_response(request, etag: str, last_modified, view):
+    """Async version of `conditional_response`, for a `view` returning an awaitable."""
+
+    if request.method not in ('GET', 'HEAD'):
+        return await view()
+
+    response = not_modified(request, etag, last_modified)
+    if response is None:
+        response = await view()
+        if response.status_code != 200:
+            return response
+    return label_conditional(response, etag, last_modified)
+
+
+def not_modified(request, etag: str, last_modified):
+    """Return the 304 response if the client's copy is current, or None."""
+
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    return get_conditional_response(request, etag=etag, last_modified=timestamp)
+
+
+def label_conditional(response, etag: str, last_modified):
+    response.headers.setdefault('ETag', etag)
+    if last_modified:
+        response.headers.setdefault('Last-Modified', http_date(int(last_modified.timestamp())))
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+# Edits and new stories move the latest modification time, and removing a story changes the id sum
+STORY_LIST_SUMMARY = {'ids': Sum('id'), 'last_modified': Max('date_last_saved')}
+
+
+def conditional_story_list(view_func):
+    """Answer requests for the author's story list with 304 while none of their stories have changed."""
+
+    if iscoroutinefunction(view_func):
+
+        @wraps(view_func)
+        async def awrapper(request, *args, **kwargs):
+            summary = await Story.objects.filter(author_id=request.user.id).aaggregate(**STORY_LIST_SUMMARY)
+            etag = page_etag(request, 'stories', summary['ids'], summary['last_modified'])
+            return await aconditional_response(request, etag, summary['last_modified'], lambda: view_func(request, *args, **kwargs))
+
+        return awrapper
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        summary = Story.objects.filter(author_id=request.user.id).aggregate(**STORY_LIST_SUMMARY)
+        etag = page_etag(request, 'stories', summary['ids'], summary['last_modified'])
+        return conditional_response(request, etag, summary['last_modified'], lambda: view_func(request, *args, **kwargs))
+
+    return wrapper
+
+
+def resolve_story(view=None, *, plot: bool = False, as_json: bool = False, conditional: bool = False):
+    """Resolve the author's story and the object named in the URL once per request.
+
+    The story is looked up from the `story_slug` URL argument and passed to the
+    view as `story`. With `plot=True`, or when the URL names a plot point, the
+    plot is loaded in the same query and passed as `plot`. A `scene_order`,
+    `character_slug` or `plotpoint_order` URL argument is resolved to a
+    `scene`, `character` or `plotpoint` argument. Anything missing renders the
+    usual 404 page, or a JSON error with `as_json=True`.
+
+    With `conditional=True`, GET requests are answered with 304 Not Modified
+    from the story version alone, before any child row is loaded.
+
+    Async views get the same arguments, looked up with the async ORM.
+    """
+
+    def decorator(view_func):
+
+        def story_query(request, kwargs):
+            stories = Story.objects.filter(slug=kwargs.get('story_slug'), author_id=request.user.id)
+            if plot or kwargs.get('plotpoint_order') is not None:
+                stories = stories.select_related('plot')
+            return stories
+
+        def attach_story(request, story, kwargs):
+            """Pass the story and its plot to the view, or return the 404 response."""
+
+            if not story:
+                return not_found(request, 'Story', as_json)
+            story.author = request.user
+            kwargs['story'] = story
+
+            if plot or kwargs.get('plotpoint_order') is not None:
+                story_plot = getattr(story, 'plot', None)
+                if not story_plot:
+                    return not_found(request, 'Plot', as_json)
+                if plot:
+                    kwargs['plot'] = story_plot
+            return None
+
+        if iscoroutinefunction(view_func):
+
+            @wraps(view_func)
+            async def awrapper(request, *args, **kwargs):
+                story = await story_query(request, kwargs).afirst()
+                response = attach_story(request, story, kwargs)
+                if response is not None:
+                    return response
+
+                if conditional:
+                    return await aconditional_response(
+                        request, page_etag(request, story.pk, story.version), story.date_last_saved,
+                        lambda: aresolve_children(request, *args, **kwargs)
+                    )
+                return await aresolve_children(request, *args, **kwargs)
+
+            async def aresolve_children(request, *args, **kwargs):
+                story = kwargs['story']
+                if kwargs.get('scene_order') is not None:
+                    scene = await aget_scene(story.id, kwargs['scene_order'])
+                    if not scene:
+                        return not_found(request, 'Scene', as_json)
+                    scene.story = story
+                    kwargs['scene'] = scene
+
+                if kwargs.get('character_slug') is not None:
+                    character = await aget_character(story.id, kwargs['character_slug'])
+                    if not character:
+                        return not_found(request, 'Character', as_json)
+                    character.story = story
+                    kwargs['character'] = character
+
+                if kwargs.get('plotpoint_order') is not None:
+                    plotpoint = await aget_at_position(PlotPoint.objects.filter(plot=story.plot), kwargs['plotpoint_order'])
+                    if not plotpoint:
+                        return not_found(request, 'Plot Point', as_json)
+                    plotpoint.plot = story.plot
+                    kwargs['plotpoint'] = plotpoint
+
+                return await view_func(request, *args, **kwargs)
+
+            return awrapper
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            story = story_query(request, kwargs).first()
+            response = attach_story(request, story, kwargs)
+            if response is not None:
+                return response
+
+            if conditional:
+                return conditional_response(
+                    request, page_etag(request, story.pk, story.version), story.date_last_saved,
+                    lambda: resolve_children(request, *args, **kwargs)
+                )
+            return resolve_children(request, *args, **kwargs)
+
+        def resolve_children(request, *args, **kwargs):
+            story = kwargs['story']
+            if kwargs.get('scene_order') is not None:
+                scene = get_at_position(Scene.objects.filter(story=story), kwargs['scene_order'])
+                if not scene:
+                    return not_found(request, 'Scene', as_json)
+                scene.story = story
+                kwargs['scene'] = scene
+
+            if kwargs.get('character_slug') is not None:
+                character = Character.objects.filter(story=story, slug=kwargs['character_slug']).first()
+                if not character:
+                    return not_found(request, 'Character', as_json)
+                character.story = story
+                kwargs['character'] = character
+
+            if kwargs.get('plotpoint_order') is not None:
+                plotpoint = get_at_position(PlotPoint.objects.filter(plot=story.plot), kwargs['plotpoint_order'])
+                if not plotpoint:
+                    return not_found(request, 'Plot Point', as_json)
+                plotpoint.plot = story.plot
+                kwargs['plotpoint'] = plotpoint
+
+            return view_func(request, *args, **kwargs)
+
+        return wrapper
+
+    if view is not None:
+        return decorator(view)
+    return decorator
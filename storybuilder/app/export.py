@@ -0,0 +1,283 @@
+"""Streaming exports of a whole story: outlines as Markdown, HTML or plain text, and the story graph as JSON.
+
+An outline walks the story, its plot and plot points, its scenes in order
+with their plot point, characters and notes, and its character sheets. Each
+table is read with `.iterator()` in chunks, with the scene characters and
+notes prefetched one chunk at a time, and the text is yielded in small
+pieces as it is written. Memory use stays flat however large the story is.
+
+The story graph is the structure of a story for tools, read in a fixed
+number of queries and encoded one object at a time.
+"""
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
+from django.utils.html import escape
+
+from .models import Character, PlotPoint, Relationship, Scene, SceneNote
+
+# Rows read per query while walking a table
+CHUNK_SIZE = 500
+
+# Bytes of text collected before a piece is handed to the response
+BUFFER_SIZE = 16 * 1024
+
+# Character sheet fields after the name, as (label, attribute)
+CHARACTER_FIELDS = [
+    ('Gender', 'gender'),
+    ('Age', 'age'),
+    ('Ethnicity', 'ethnicity'),
+    ('Occupation', 'occupation'),
+    ('Location', 'location'),
+    ('Hair Color', 'hair_color'),
+    ('Eye Color', 'eye_color'),
+    ('Height', 'height'),
+    ('Body Type', 'body_type'),
+    ('MBTI Type', 'mbti_personality'),
+    ('Enneagram Type', 'enneagram_personality'),
+]
+
+
+def buffered(pieces):
+    """Join small pieces of text into pieces of about `BUFFER_SIZE` characters."""
+
+    buffer = []
+    size = 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= BUFFER_SIZE:
+            yield ''.join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+class OutlineExporter:
+    """Write a story outline as a stream of text pieces.
+
+    The walk over the story lives here; subclasses only decide how headings,
+    paragraphs and lists are written.
+    """
+
+    content_type = 'text/plain; charset=utf-8'
+    extension = 'txt'
+
+    def __init__(self, story, plot=None, chunk_size: int = CHUNK_SIZE):
+        self.story = story
+        self.plot = plot
+        self.chunk_size = chunk_size
+
+    def filename(self) -> str:
+        return f"{self.story.slug or 'story'}.{self.extension}"
+
+    def stream(self):
+        """Yield the export in pieces of about `BUFFER_SIZE` characters."""
+        return buffered(self.outline())
+
+    def outline(self):
+        """Yield the outline piece by piece, one table at a time."""
+
+        story = self.story
+        yield self.begin()
+        yield self.heading(1, story.title)
+        yield self.fields([
+            ('Author', story.author),
+            ('Started', story.date_started),
+            ('Finished', story.date_finished),
+            ('Word Count', story.word_count),
+            ('Genres', ', '.join(story.genres)),
+        ])
+        if story.premise:
+            yield self.heading(2, 'Premise')
+            yield self.paragraph(story.premise)
+        if story.description:
+            yield self.heading(2, 'Description')
+            yield self.paragraph(story.description)
+
+        if self.plot:
+            yield self.heading(2, f"Plot: {self.plot.name}")
+            if self.plot.description:
+                yield self.paragraph(self.plot.description)
+            plotpoints = PlotPoint.objects.filter(plot=self.plot).only('name', 'description', 'order').order_by('order')
+            for position, plotpoint in enumerate(plotpoints.iterator(chunk_size=self.chunk_size), start=1):
+                yield self.heading(3, f"{position}. {plotpoint.name}")
+                if plotpoint.description:
+                    yield self.paragraph(plotpoint.description)
+
+        yield self.heading(2, 'Scenes')
+        scenes = (
+            Scene.objects.filter(story=story)
+            .select_related('plotpoint')
+            .only('title', 'description', 'order', 'plotpoint__name')
+            .prefetch_related(
+                Prefetch('characters', queryset=Character.objects.only('full_name').order_by('full_name')),
+                Prefetch('scenenote_set', queryset=SceneNote.objects.only('scene_id', 'text').order_by('id')),
+            )
+            .order_by('order')
+        )
+        for position, scene in enumerate(scenes.iterator(chunk_size=self.chunk_size), start=1):
+            yield self.heading(3, f"{position}. {scene.title}")
+            if scene.description:
+                yield self.paragraph(scene.description)
+            details = [('Plot Point', scene.plotpoint.name if scene.plotpoint else None)]
+            details.append(('Characters', ', '.join(str(character) for character in scene.characters.all())))
+            yield self.fields(details)
+            notes = [note.text for note in scene.scenenote_set.all()]
+            if notes:
+                yield self.heading(4, 'Notes')
+                yield self.items(notes)
+
+        yield self.heading(2, 'Characters')
+        characters = Character.objects.filter(story=story).order_by('full_name', 'id')
+        for character in characters.iterator(chunk_size=self.chunk_size):
+            yield self.heading(3, character.full_name or character.first_name)
+            if character.description:
+                yield self.paragraph(character.description)
+            details = [(label, getattr(character, name)) for label, name in CHARACTER_FIELDS]
+            details.append(('Traits', ', '.join(character.personality_traits)))
+            yield self.fields(details)
+
+        yield self.end()
+
+    def begin(self) -> str:
+        return ''
+
+    def end(self) -> str:
+        return ''
+
+    def heading(self, level: int, text) -> str:
+        text = str(text)
+        underline = '=' if level == 1 else '-' if level == 2 else ''
+        return f"{text}\n{underline * len(text)}\n\n" if underline else f"{text}\n\n"
+
+    def paragraph(self, text) -> str:
+        return f"{text}\n\n"
+
+    def items(self, items: list) -> str:
+        return ''.join(f"  * {item}\n" for item in items) + '\n'
+
+    def fields(self, pairs: list) -> str:
+        """Write the non-empty (label, value) pairs."""
+
+        lines = [f"{label}: {value}\n" for label, value in pairs if value not in (None, '')]
+        return ''.join(lines) + '\n' if lines else ''
+
+
+class MarkdownExporter(OutlineExporter):
+    """Write a story outline as Markdown."""
+
+    content_type = 'text/markdown; charset=utf-8'
+    extension = 'md'
+
+    def heading(self, level: int, text) -> str:
+        return f"{'#' * level} {text}\n\n"
+
+    def items(self, items: list) -> str:
+        return ''.join(f"- {item}\n" for item in items) + '\n'
+
+    def fields(self, pairs: list) -> str:
+        lines = [f"- **{label}:** {value}\n" for label, value in pairs if value not in (None, '')]
+        return ''.join(lines) + '\n' if lines else ''
+
+
+class HTMLExporter(OutlineExporter):
+    """Write a story outline as a standalone HTML document, escaping all story text."""
+
+    content_type = 'text/html; charset=utf-8'
+    extension = 'html'
+
+    def begin(self) -> str:
+        return f'<!DOCTYPE html>\n<html>\n<head>\n<meta charset="utf-8">\n<title>{escape(self.story.title)}</title>\n</head>\n<body>\n'
+
+    def end(self) -> str:
+        return '</body>\n</html>\n'
+
+    def heading(self, level: int, text) -> str:
+        return f"<h{level}>{escape(text)}</h{level}>\n"
+
+    def paragraph(self, text) -> str:
+        return f"<p>{escape(text)}</p>\n"
+
+    def items(self, items: list) -> str:
+        return '<ul>\n' + ''.join(f"<li>{escape(item)}</li>\n" for item in items) + '</ul>\n'
+
+    def fields(self, pairs: list) -> str:
+        rows = [
+            f"<dt>{escape(label)}</dt><dd>{escape(value)}</dd>\n"
+            for label, value in pairs if value not in (None, '')
+        ]
+        return '<dl>\n' + ''.join(rows) + '</dl>\n' if rows else ''
+
+
+EXPORTERS = {
+    'md': MarkdownExporter,
+    'html': HTMLExporter,
+    'txt': OutlineExporter,
+}
+
+
+STORY_GRAPH_FIELDS = [
+    'id', 'title', 'slug', 'description', 'premise', 'genres', 'word_count',
+    'date_started', 'date_last_saved', 'date_finished', 'scene_count', 'character_count', 'plotpoint_count', 'version'
+]
+CHARACTER_GRAPH_FIELDS = ['id', 'slug', 'full_name', 'first_name', 'middle_name', 'last_name', 'description'] + [
+    name for _, name in CHARACTER_FIELDS
+] + ['personality_traits']
+RELATIONSHIP_GRAPH_FIELDS = ['id', 'source_id', 'target_id', 'kind', 'description']
+
+
+def story_graph(story, plot):
+    """Yield a story's structure as JSON text, piece by piece.
+
+    The document holds the story, its plot, its plot points and scenes in
+    display order with their 1-based positions, its characters and the
+    relationships between them. Scenes name their plot point and characters
+    by ID, and relationships their characters. The plot points, scenes,
+    scene characters, characters and relationships take one query each,
+    whatever the size of the story.
+    """
+
+    encode = DjangoJSONEncoder(separators=(',', ':')).encode
+
+    def items(rows):
+        for index, row in enumerate(rows):
+            yield (',' if index else '') + encode(row)
+
+    plotpoints = PlotPoint.objects.filter(plot=plot).only('id', 'name', 'description').order_by('order')
+    scenes = (
+        Scene.objects.filter(story=story)
+        .only('id', 'title', 'description', 'plotpoint_id')
+        .prefetch_related(Prefetch('characters', queryset=Character.objects.only('id').order_by('id')))
+        .order_by('order')
+    )
+    characters = Character.objects.filter(story=story).values(*CHARACTER_GRAPH_FIELDS).order_by('id')
+    relationships = Relationship.objects.filter(story=story).values(*RELATIONSHIP_GRAPH_FIELDS).order_by('id')
+
+    yield '{"story":' + encode({field: getattr(story, field) for field in STORY_GRAPH_FIELDS})
+    yield ',"plot":' + encode({'id': plot.id, 'name': plot.name, 'description': plot.description})
+
+    yield ',"plot_points":['
+    yield from items(
+        {'id': plotpoint.id, 'position': position, 'name': plotpoint.name, 'description': plotpoint.description}
+        for position, plotpoint in enumerate(plotpoints, start=1)
+    )
+
+    yield '],"scenes":['
+    yield from items(
+        {
+            'id': scene.id,
+            'position': position,
+            'title': scene.title,
+            'description': scene.description,
+            'plot_point': scene.plotpoint_id,
+            'characters': [character.id for character in scene.characters.all()],
+        }
+        for position, scene in enumerate(scenes, start=1)
+    )
+
+    yield '],"characters":['
+    yield from items(characters)
+    yield '],"relationships":['
+    yield from items(relationships)
+    yield ']}'
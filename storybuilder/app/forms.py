@@ -1,9 +1,15 @@
+import logging
+
 from django import forms
+from django.utils.text import slugify
 
 from accounts.models import CustomUser
 
-from .models import Story, Scene, Character, Plot, PlotPoint
+from .models import Story, Scene, Character, Plot, PlotPoint, Relationship
 from .constants import genre_choices, mbti_choices, enneagram_choices
+from .importing import format_for
+
+logger = logging.getLogger(__name__)
 
 
 class StoryForm(forms.ModelForm):
@@ -39,11 +45,8 @@ class StoryForm(forms.ModelForm):
     def clean(self):
         """Override the clean method for the story form."""
 
-        print("**********************************")
-        print("Story Form Clean Method")
-
         cleaned_data = super().clean()
-        print(f"Data before genre cleaning: {cleaned_data}")
+        logger.debug("Cleaning story form fields %s", list(cleaned_data))
 
         # Process other genre choice
         genre_choices = list(cleaned_data['genres'])
@@ -54,10 +57,41 @@ class StoryForm(forms.ModelForm):
             genre_choices.append(cleaned_data['other_choice'])
         cleaned_data['genres'] = genre_choices
 
-        print(f"cleaned_data: {cleaned_data}")
+        # Titles that slugify to the same URL would collide on the story slug
+        title = cleaned_data.get('title')
+        if title and self.instance.author_id:
+            duplicates = Story.objects.filter(
+                author_id=self.instance.author_id,
+                slug=slugify(title)
+            ).exclude(pk=self.instance.pk)
+            if duplicates.exists():
+                raise forms.ValidationError('You already have a story with this title.')
+
         return cleaned_data
     
 
+class StoryImportForm(forms.Form):
+    """Form for creating a whole story from a JSON or Markdown outline file."""
+
+    outline = forms.FileField(label='Outline File')
+    format = forms.ChoiceField(
+        choices=[('', 'From the file name'), ('json', 'JSON'), ('md', 'Markdown')],
+        required=False
+    )
+
+    def clean(self):
+        """Take the outline format from the file name unless one was picked."""
+
+        cleaned_data = super().clean()
+        outline = cleaned_data.get('outline')
+        if outline and not cleaned_data.get('format'):
+            cleaned_data['format'] = format_for(outline.name)
+            if not cleaned_data['format']:
+                raise forms.ValidationError('Please pick the outline format, or upload a .json or .md file.')
+
+        return cleaned_data
+
+
 class SceneForm(forms.ModelForm):
     """Form for creating a new scene in a story."""
 
@@ -68,10 +102,13 @@ class SceneForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         author_id = kwargs.pop('author_id', None)
         story_slug = kwargs.pop('story_slug', None)
+        story = kwargs.pop('story', None)
         super().__init__(*args, **kwargs)
 
         # Define the story that the object is associated with
-        if story_slug and author_id:
+        if story:
+            self.instance.story = story
+        elif story_slug and author_id:
             self.instance.story = Story.objects.get(slug=story_slug, author_id=author_id)
 
         # Pre-populate fields if an instance of the object exists
@@ -94,10 +131,13 @@ class CharacterForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         author_id = kwargs.pop('author_id', None)
         story_slug = kwargs.pop('story_slug', None)
+        story = kwargs.pop('story', None)
         super().__init__(*args, **kwargs)
 
         # Define the story that the object is associated with
-        if story_slug and author_id:
+        if story:
+            self.instance.story = story
+        elif story_slug and author_id:
             self.instance.story = Story.objects.get(slug=story_slug, author_id=author_id)
 
         # Pre-populate fields if an instance of the object exists
@@ -150,6 +190,7 @@ class PlotPointForm(forms.ModelForm):
 
     def __init__(self, *args, **kwargs):
         plot_id = kwargs.pop('plot_id', None)
+        plot = kwargs.pop('plot', None)
         super().__init__(*args, **kwargs)
 
         # Pre-populate fields if an instance of the object exists
@@ -158,20 +199,12 @@ class PlotPointForm(forms.ModelForm):
             self.fields['description'].initial = self.instance.description
 
             # Define the plot that the object is associated with
-            if plot_id:
+            if plot:
+                self.instance.plot = plot
+            elif plot_id:
                 self.instance.plot = Plot.objects.get(pk=plot_id)
 
 
-class WordCountForm(forms.ModelForm):
-    """Form for updating the story word count."""
-
-    word_count = forms.IntegerField(min_value=0, label='New Word Count')
-
-    class Meta:
-        model = Story
-        fields = ['word_count']
-
-
 class SceneNoteForm(forms.Form):
     """Form for adding a new note to a scene."""
 
@@ -188,16 +221,67 @@ class SceneCharacterForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         author_id = kwargs.pop('author_id', None)
         story_slug = kwargs.pop('story_slug', None)
+        story = kwargs.pop('story', None)
         super().__init__(*args, **kwargs)
 
         # Define the story that the object is associated with
-        if story_slug and author_id:
+        if story:
+            self.instance.story = story
+        elif story_slug and author_id:
             self.instance.story = Story.objects.get(slug=story_slug, author_id=author_id)
 
         # Define the character field, scoped to characters belonging to this story
         self.fields['characters'] = forms.ModelMultipleChoiceField(
-            queryset=Character.objects.filter(story=self.instance.story),
+            queryset=Character.objects.filter(story_id=self.instance.story_id),
             widget=forms.CheckboxSelectMultiple,
             required=False,
             initial=self.instance.characters.all() if self.instance.pk else None
         )
+
+
+class RelationshipForm(forms.ModelForm):
+    """Form for relating two characters of a story, named by their slugs."""
+
+    class Meta:
+        model = Relationship
+        fields = ['source', 'target', 'kind', 'description']
+
+    def __init__(self, *args, **kwargs):
+        story = kwargs.pop('story')
+        super().__init__(*args, **kwargs)
+        self.instance.story = story
+
+        # Both characters are looked up by slug among the characters of this story
+        characters = Character.objects.filter(story_id=story.id)
+        for name in ('source', 'target'):
+            self.fields[name] = forms.ModelChoiceField(queryset=characters, to_field_name='slug')
+
+
+class ReorderForm(forms.Form):
+    """Form for moving one scene or plot point, or for reordering all of them.
+
+    Positions are the 1-based positions used in the scene and plot point URLs.
+    """
+
+    kind = forms.ChoiceField(choices=[('scenes', 'Scenes'), ('plotpoints', 'Plot Points')])
+    position = forms.IntegerField(min_value=1, required=False)
+    target = forms.IntegerField(min_value=1, required=False)
+    order = forms.JSONField(required=False)
+
+    def clean(self):
+        """Require either a position and target pair or a full order list."""
+
+        cleaned_data = super().clean()
+        position = cleaned_data.get('position')
+        target = cleaned_data.get('target')
+        order = cleaned_data.get('order')
+
+        if order is not None:
+            if position is not None or target is not None:
+                raise forms.ValidationError('Send either a position and target or a full order, not both.')
+            if not isinstance(order, list) or not all(isinstance(item, int) and not isinstance(item, bool) for item in order):
+                raise forms.ValidationError('The order must be a list of positions.')
+        elif position is None or target is None:
+            raise forms.ValidationError('Send a position and target, or a full order.')
+
+        return cleaned_data
@@ -0,0 +1,73 @@
+"""Versioned caching of rendered page fragments.
+
+Fragments are stored under the id and version of their story, and every write
+to a story or its children bumps the version (see `Story.save` and
+app/signals.py), so a stale fragment is never read again and simply expires.
+
+Async views cannot let a template query on a miss, so they read their
+fragments up front with `aget_fragments`, load only what the misses need,
+and pass what they read to the template as `fragments`.
+"""
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.utils import make_template_fragment_key
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def fragment_key(name: str, story, vary_on=()) -> str:
+    """Build the cache key of a story fragment."""
+
+    return make_template_fragment_key(name, [story.pk, story.version, *vary_on])
+
+
+def get_or_render(name: str, story, render, vary_on=(), fetched=None) -> str:
+    """Return the cached fragment for the story, rendering and storing it on a miss.
+
+    `fetched` is what `aget_fragments` read ahead of rendering; a fragment
+    missing from it is a miss without asking the cache again.
+    """
+
+    cache = caches[settings.FRAGMENT_CACHE_ALIAS]
+    key = fragment_key(name, story, vary_on)
+
+    value = cache.get(key) if fetched is None else fetched.get(name)
+    hit = value is not None
+    if not hit:
+        value = render()
+        cache.set(key, value, settings.FRAGMENT_CACHE_TIMEOUT)
+
+    with _stats_lock:
+        counts = _stats.setdefault(name, {'hits': 0, 'misses': 0})
+        counts['hits' if hit else 'misses'] += 1
+
+    return value
+
+
+async def aget_fragments(story, *fragments) -> dict:
+    """Read the cached fragments of a story, given as (name, vary_on) pairs, in one cache call.
+
+    Returns the rendered fragments that were found, by name.
+    """
+
+    cache = caches[settings.FRAGMENT_CACHE_ALIAS]
+    names = {fragment_key(name, story, vary_on): name for name, vary_on in fragments}
+    found = await cache.aget_many(list(names))
+    return {names[key]: value for key, value in found.items()}
+
+
+def fragment_stats() -> dict:
+    """Return the hit and miss counts of every fragment served by this process."""
+
+    with _stats_lock:
+        return {name: dict(counts) for name, counts in _stats.items()}
+
+
+def reset_fragment_stats():
+    """Forget the hit and miss counts."""
+
+    with _stats_lock:
+        _stats.clear()
@@ -0,0 +1,129 @@
+"""Character relationship graphs, held in memory per story.
+
+Neighbors further than one step away, shortest paths and connected groups
+would each take one SQL self-join of the relationship table per step. The
+relationships of a story are instead read once, in a single query, into an
+adjacency map that every graph query walks in memory. Built graphs are kept
+in a process-local LRU keyed by the story's `graph_version`, which
+app/signals.py bumps on every relationship change and nothing else, so
+edits to scenes or characters leave the graph cached.
+
+The graph holds character IDs only; views look up the names of the
+characters in an answer with one query.
+"""
+from collections import deque
+from functools import lru_cache
+
+from django.conf import settings
+
+from .models import Relationship
+
+# Furthest a neighbor query walks from its character
+MAX_DEPTH = 6
+
+
+class CharacterGraph:
+    """The relationships of one story as an undirected adjacency map.
+
+    `edges` maps each relationship ID to (source ID, target ID, kind) and
+    `adjacency` maps each related character ID to its (neighbor ID,
+    relationship ID) pairs. A graph is shared between requests and is never
+    changed after it is built.
+    """
+
+    def __init__(self, edges):
+        self.edges = {}
+        self.adjacency = {}
+        for pk, source, target, kind in edges:
+            self.edges[pk] = (source, target, kind)
+            self.adjacency.setdefault(source, []).append((target, pk))
+            self.adjacency.setdefault(target, []).append((source, pk))
+        self._groups = {}
+
+    def links(self, character_id: int, kinds=None):
+        """Yield the (neighbor ID, relationship ID) pairs of a character, only of `kinds` if given."""
+
+        for neighbor, pk in self.adjacency.get(character_id, ()):
+            if kinds is None or self.edges[pk][2] in kinds:
+                yield neighbor, pk
+
+    def walk(self, start: int, kinds=None, depth: int = None, stop: int = None) -> dict:
+        """Breadth-first walk from a character, returning {character ID: (distance, parent ID)}.
+
+        The walk goes at most `depth` steps and ends early once `stop` is reached.
+        """
+
+        reached = {start: (0, None)}
+        queue = deque([start])
+        while queue:
+            current = queue.popleft()
+            distance = reached[current][0]
+            if current == stop or (depth is not None and distance >= depth):
+                continue
+            for neighbor, _ in self.links(current, kinds):
+                if neighbor not in reached:
+                    reached[neighbor] = (distance + 1, current)
+                    if neighbor == stop:
+                        return reached
+                    queue.append(neighbor)
+        return reached
+
+    def between(self, first: int, second: int, kinds=None) -> list:
+        """The IDs of the relationships between two neighboring characters."""
+
+        return [pk for neighbor, pk in self.links(first, kinds) if neighbor == second]
+
+    def neighbors(self, character_id: int, depth: int = 1, kinds=None) -> list:
+        """Return (character ID, distance, parent ID) for every character within `depth` steps, nearest first."""
+
+        reached = self.walk(character_id, kinds, depth=min(depth, MAX_DEPTH))
+        del reached[character_id]
+        return sorted(((pk, distance, parent) for pk, (distance, parent) in reached.items()), key=lambda item: item[1])
+
+    def shortest_path(self, start: int, end: int, kinds=None):
+        """Return the character IDs on a shortest path from `start` to `end`, or None if they are not connected."""
+
+        reached = self.walk(start, kinds, stop=end)
+        if end not in reached:
+            return None
+
+        path = [end]
+        while path[-1] != start:
+            path.append(reached[path[-1]][1])
+        return path[::-1]
+
+    def groups(self, kinds=None) -> list:
+        """Return the connected groups of related characters as sorted ID lists, largest group first."""
+
+        key = frozenset(kinds) if kinds is not None else None
+        if key not in self._groups:
+            seen = set()
+            groups = []
+            for character_id in self.adjacency:
+                if character_id in seen or not any(self.links(character_id, kinds)):
+                    continue
+                group = self.walk(character_id, kinds)
+                seen.update(group)
+                groups.append(sorted(group))
+            groups.sort(key=lambda group: (-len(group), group[0]))
+            self._groups[key] = groups
+        return self._groups[key]
+
+
+def load_graph(story_id: int) -> CharacterGraph:
+    """Read the relationships of a story into a new graph, in one query."""
+
+    return CharacterGraph(
+        Relationship.objects.filter(story_id=story_id).order_by('pk').values_list('pk', 'source_id', 'target_id', 'kind')
+    )
+
+
+@lru_cache(maxsize=settings.GRAPH_CACHE_SIZE)
+def cached_graph(story_id: int, graph_version: int) -> CharacterGraph:
+    return load_graph(story_id)
+
+
+def get_graph(story) -> CharacterGraph:
+    """Return the relationship graph of a story, built only if its relationships changed since it was last built."""
+
+    return cached_graph(story.pk, story.graph_version)
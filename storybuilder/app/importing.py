@@ -0,0 +1,423 @@
+"""Bulk import of whole story outlines from JSON or Markdown files.
+
+A JSON outline is an object with the story fields and lists of its plot
+points, characters and scenes::
+
+    {
+        "title": "Story title",
+        "description": "...", "premise": "...", "genres": ["Fantasy"],
+        "plot": {"name": "...", "description": "..."},
+        "plot_points": [{"name": "...", "description": "..."}],
+        "characters": [{"first_name": "Sam", "last_name": "Grey", "age": 30, "personality_traits": ["brave"]}],
+        "scenes": [{"title": "...", "description": "...", "prose": "...", "plot_point": "Plot point name or position",
+                    "characters": ["Sam Grey"], "notes": ["..."]}]
+    }
+
+The story's word count is the sum of its scenes' prose, so it is counted
+rather than read from the outline.
+
+A Markdown outline uses the layout written by the Markdown export, so an
+exported story can be imported again. It is parsed line by line as the
+upload is read.
+
+The whole outline is checked before anything is written, and every problem
+is reported with the scene, character or line it came from. A valid outline
+is written in one transaction with a handful of bulk inserts.
+"""
+import codecs
+import json
+import logging
+import re
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.utils.text import slugify
+
+from . import search
+from .export import CHARACTER_FIELDS
+from .models import Story, Scene, SceneNote, Character, Plot, PlotPoint
+from .ordering import ORDER_GAP
+from .seeding import insert_scene_characters
+from .wordcount import count_words
+
+logger = logging.getLogger(__name__)
+
+# Problems reported before giving up on an outline
+MAX_ERRORS = 100
+
+# Rows per bulk insert statement
+BATCH_SIZE = 1000
+
+STORY_FIELDS = ['title', 'description', 'premise', 'genres']
+PLOTPOINT_FIELDS = ['name', 'description']
+SCENE_FIELDS = ['title', 'description', 'prose']
+CHARACTER_NAME_FIELDS = ['first_name', 'middle_name', 'last_name']
+CHARACTER_DETAIL_FIELDS = [name for _, name in CHARACTER_FIELDS] + ['description', 'personality_traits']
+
+# Outline values are text, apart from lists of text and these numbers, which may also be written as text
+NUMBER_FIELDS = ('age',)
+
+
+class OutlineError(Exception):
+    """An outline that could not be imported, with one message per problem."""
+
+    def __init__(self, errors: list):
+        self.errors = errors
+        super().__init__(f"The outline has {len(errors)} problem(s): {'; '.join(errors[:3])}")
+
+
+class Outline:
+    """A parsed story outline, before validation.
+
+    Plot points, characters and scenes are (location, fields) pairs, where the
+    location names the item in error messages. Problems found while parsing
+    are collected in `errors`.
+    """
+
+    def __init__(self):
+        self.story = {}
+        self.plot = None
+        self.plotpoints = []
+        self.characters = []
+        self.scenes = []
+        self.errors = []
+
+
+def parse_json(lines) -> Outline:
+    """Parse a JSON outline from an iterable of text lines."""
+
+    try:
+        data = json.loads(''.join(lines))
+    except json.JSONDecodeError as error:
+        raise OutlineError([f"line {error.lineno}: This is not valid JSON ({error.msg})."])
+    if not isinstance(data, dict):
+        raise OutlineError(['The outline must be a JSON object.'])
+
+    outline = Outline()
+    outline.story = {field: data[field] for field in STORY_FIELDS if field in data}
+    if isinstance(data.get('plot'), dict):
+        outline.plot = data['plot']
+
+    for key, items, label in (
+        ('plot_points', outline.plotpoints, 'plot point'),
+        ('characters', outline.characters, 'character'),
+        ('scenes', outline.scenes, 'scene'),
+    ):
+        values = data.get(key) or []
+        if not isinstance(values, list):
+            outline.errors.append(f"{key}: Expected a list.")
+            continue
+        for number, value in enumerate(values, start=1):
+            if isinstance(value, dict):
+                items.append((f"{label} {number}", value))
+            else:
+                outline.errors.append(f"{label} {number}: Expected an object.")
+
+    return outline
+
+
+HEADING = re.compile(r'^(#{1,4})\s+(.*?)\s*$')
+FIELD = re.compile(r'^[-*]\s+\*\*(.+?):\*\*\s*(.*?)\s*$')
+ITEM = re.compile(r'^[-*]\s+(.*?)\s*$')
+NUMBERED = re.compile(r'^\d+\.\s+')
+
+STORY_LABELS = {'Genres': 'genres'}
+CHARACTER_LABELS = {label: name for label, name in CHARACTER_FIELDS}
+CHARACTER_LABELS['Traits'] = 'personality_traits'
+SCENE_LABELS = {'Plot Point': 'plot_point', 'Characters': 'characters'}
+LIST_FIELDS = ('genres', 'characters', 'personality_traits', 'notes')
+
+
+def parse_markdown(lines) -> Outline:
+    """Parse a Markdown outline, in the layout of the Markdown export, one line at a time."""
+
+    outline = Outline()
+    section = None
+    item = None
+    labels = {}
+    text_field = None
+    notes = None
+
+    for number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+
+        heading = HEADING.match(line)
+        if heading:
+            level, text = len(heading.group(1)), heading.group(2)
+            notes = None
+
+            if level == 1:
+                outline.story['title'] = text
+                section, item, labels, text_field = 'story', outline.story, STORY_LABELS, None
+            elif level == 2:
+                section, item, labels, text_field = text.partition(':')[0].lower(), None, {}, None
+                if section == 'plot':
+                    outline.plot = item = {'name': text.partition(':')[2].strip()}
+                    text_field = 'description'
+                elif section in ('premise', 'description'):
+                    item, text_field = outline.story, section
+            elif level == 3 and section in ('plot', 'plot points', 'scenes', 'characters'):
+                if section == 'scenes':
+                    item, labels = {'title': NUMBERED.sub('', text)}, SCENE_LABELS
+                    outline.scenes.append((f"line {number}", item))
+                elif section == 'characters':
+                    item, labels = {'name': text}, CHARACTER_LABELS
+                    outline.characters.append((f"line {number}", item))
+                else:
+                    item, labels = {'name': NUMBERED.sub('', text)}, {}
+                    outline.plotpoints.append((f"line {number}", item))
+                text_field = 'description'
+            elif level == 4 and section == 'scenes' and text == 'Notes' and item is not None:
+                notes = item['notes'] = []
+            continue
+
+        # Note items, with any continuation lines of a multi-line note
+        if notes is not None:
+            entry = ITEM.match(line)
+            if entry:
+                notes.append(entry.group(1))
+            elif notes:
+                notes[-1] = f"{notes[-1]}\n{line}"
+            continue
+
+        field = FIELD.match(line)
+        if field and item is not None and field.group(1) in labels:
+            name = labels[field.group(1)]
+            value = field.group(2)
+            if name in LIST_FIELDS:
+                value = [part.strip() for part in value.split(',') if part.strip()]
+            item[name] = value
+        elif item is not None and text_field:
+            item[text_field] = f"{item[text_field]}\n{line}" if item.get(text_field) else line
+
+    return outline
+
+
+PARSERS = {
+    'json': parse_json,
+    'md': parse_markdown,
+}
+
+
+def format_for(filename: str):
+    """Guess the outline format from a file name, or None if it is not a known format."""
+
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    return {'json': 'json', 'md': 'md', 'markdown': 'md'}.get(extension)
+
+
+def read_lines(upload, encoding: str = 'utf-8'):
+    """Decode an uploaded file into text lines as it is read."""
+
+    try:
+        yield from codecs.iterdecode(upload, encoding)
+    except UnicodeDecodeError:
+        raise OutlineError([f"The file is not {encoding} text."])
+
+
+class OutlineImporter:
+    """Validate a parsed outline and create its story for an author in one transaction."""
+
+    def __init__(self, author, batch_size: int = BATCH_SIZE):
+        self.author = author
+        self.batch_size = batch_size
+        self.errors = []
+
+    def error(self, location: str, message):
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append(f"{location}: {message}")
+
+    def check(self, location: str, instance, exclude: list):
+        """Validate the model fields of an unsaved instance, recording every problem.
+
+        Nullable fields an outline leaves out are stored as null rather than
+        reported as blank.
+        """
+
+        missing = [
+            field.name for field in instance._meta.concrete_fields
+            if field.null and getattr(instance, field.attname) in (None, '')
+        ]
+        try:
+            instance.clean_fields(exclude=[*exclude, *missing])
+        except ValidationError as error:
+            for field, messages in error.message_dict.items():
+                for message in messages:
+                    self.error(location, f"{field.replace('_', ' ')}: {message}")
+
+    def build(self, outline: Outline):
+        """Turn an outline into unsaved model instances, or raise an OutlineError listing every problem."""
+
+        self.errors = list(outline.errors)
+
+        fields, mistyped = self.fields_of('story', outline.story, STORY_FIELDS)
+        story = Story(author=self.author, **fields)
+        if story.genres is None:
+            story.genres = []
+        self.check('story', story, exclude=['author', 'slug', *Story.derived_fields, *mistyped])
+        if story.title and Story.objects.filter(author=self.author, slug=slugify(story.title)).exists():
+            self.error('story', 'You already have a story with this title.')
+
+        plot_fields, mistyped = self.fields_of('plot', outline.plot or {}, PLOTPOINT_FIELDS)
+        plot = Plot(
+            story=story,
+            name=plot_fields.get('name') or f"Plot for {story.title}",
+            description=plot_fields.get('description') or 'Briefly summarize the plot of your story here.'
+        )
+        self.check('plot', plot, exclude=['story', *mistyped])
+
+        plotpoints = []
+        plotpoints_by_name = {}
+        for location, fields in outline.plotpoints:
+            fields, mistyped = self.fields_of(location, fields, PLOTPOINT_FIELDS)
+            plotpoint = PlotPoint(plot=plot, order=(len(plotpoints) + 1) * ORDER_GAP, **fields)
+            self.check(location, plotpoint, exclude=['plot', *mistyped])
+            plotpoints.append(plotpoint)
+            plotpoints_by_name.setdefault(plotpoint.name, plotpoint)
+
+        characters = []
+        characters_by_name = {}
+        slugs = set()
+        for location, fields in outline.characters:
+            fields = dict(fields)
+            name_mistyped = []
+            if 'name' in fields:
+                name = fields.pop('name')
+                if not self.typed(location, 'name', name):
+                    name_mistyped, name = ['first_name'], None
+                parts = (name or '').split()
+                fields.setdefault('first_name', parts[0] if parts else '')
+                if len(parts) > 1:
+                    fields.setdefault('last_name', parts[-1])
+                if len(parts) > 2:
+                    fields.setdefault('middle_name', ' '.join(parts[1:-1]))
+            fields, mistyped = self.fields_of(location, fields, CHARACTER_NAME_FIELDS + CHARACTER_DETAIL_FIELDS)
+            mistyped += name_mistyped
+            character = Character(story=story, **fields)
+            if character.personality_traits is None:
+                character.personality_traits = []
+            character.clean()
+            self.check(location, character, exclude=['story', 'slug', *mistyped])
+
+            slug = base_slug = slugify(character.full_name or '')
+            suffix = 2
+            while slug in slugs:
+                slug = f"{base_slug}-{suffix}"
+                suffix += 1
+            slugs.add(slug)
+            character.slug = slug
+
+            characters.append(character)
+            characters_by_name.setdefault(character.full_name, character)
+
+        scenes = []
+        notes = []
+        links = []
+        for location, fields in outline.scenes:
+            scene_fields, mistyped = self.fields_of(location, fields, SCENE_FIELDS)
+            scene = Scene(story=story, order=(len(scenes) + 1) * ORDER_GAP, **scene_fields)
+            self.check(location, scene, exclude=['story', 'plotpoint', *mistyped])
+            scene.word_count = count_words(scene.prose or '')
+
+            reference = fields.get('plot_point')
+            if reference not in (None, ''):
+                if isinstance(reference, int) and not isinstance(reference, bool):
+                    scene.plotpoint = plotpoints[reference - 1] if 0 < reference <= len(plotpoints) else None
+                else:
+                    scene.plotpoint = plotpoints_by_name.get(str(reference))
+                if scene.plotpoint is None:
+                    self.error(location, f"There is no plot point {reference!r}.")
+
+            # Characters are linked by full name, so a repeated name links the first of them once
+            linked = set()
+            for name in self.list_of(location, fields, 'characters'):
+                character = characters_by_name.get(name)
+                if character is None:
+                    self.error(location, f"There is no character named {name!r}.")
+                elif id(character) not in linked:
+                    linked.add(id(character))
+                    links.append((scene, character))
+
+            for text in self.list_of(location, fields, 'notes'):
+                note = SceneNote(scene=scene, text=text)
+                self.check(location, note, exclude=['scene', 'created_at'])
+                notes.append(note)
+
+            scenes.append(scene)
+
+        if self.errors:
+            raise OutlineError(self.errors)
+
+        return story, plot, plotpoints, characters, scenes, notes, links
+
+    def typed(self, location: str, field: str, value) -> bool:
+        """Check that an outline value has the type of its field, recording a problem if not."""
+
+        if value is None:
+            return True
+        if field in LIST_FIELDS:
+            valid, expected = isinstance(value, list) and all(isinstance(item, str) for item in value), 'a list of text'
+        elif field in NUMBER_FIELDS:
+            valid, expected = isinstance(value, (int, str)) and not isinstance(value, bool), 'a number'
+        else:
+            valid, expected = isinstance(value, str), 'text'
+
+        if not valid:
+            self.error(location, f"{field.replace('_', ' ')}: Expected {expected}.")
+        return valid
+
+    def fields_of(self, location: str, fields: dict, allowed: list) -> tuple:
+        """Pick the model fields of an outline item, leaving out values of the wrong type.
+
+        Returns the fields and the names of those left out, which are already
+        reported and need no further checks.
+        """
+
+        picked = {field: fields[field] for field in allowed if field in fields}
+        mistyped = [field for field, value in picked.items() if not self.typed(location, field, value)]
+        return {field: value for field, value in picked.items() if field not in mistyped}, mistyped
+
+    def list_of(self, location: str, fields: dict, key: str) -> list:
+        values = fields.get(key) or []
+        if not self.typed(location, key, values):
+            return []
+        return values
+
+    def create(self, outline: Outline) -> Story:
+        """Create the story of a valid outline with bulk inserts in one transaction."""
+
+        story, plot, plotpoints, characters, scenes, notes, links = self.build(outline)
+
+        # Related objects were built unsaved; bulk_create picks up their ids once they are saved
+        with transaction.atomic():
+            try:
+                story.save()
+            except IntegrityError:
+                raise OutlineError(['story: You already have a story with this title.'])
+            plot.save()
+
+            PlotPoint.objects.bulk_create(plotpoints, batch_size=self.batch_size)
+            Character.objects.bulk_create(characters, batch_size=self.batch_size)
+            Scene.objects.bulk_create(scenes, batch_size=self.batch_size)
+            SceneNote.objects.bulk_create(notes, batch_size=self.batch_size)
+            insert_scene_characters([(scene.id, character.id) for scene, character in links], self.batch_size)
+
+            # Bulk inserts skip the signals, so count the children and index them here
+            Story.objects.filter(pk=story.pk).recount()
+            search.index_story(story.pk, batch_size=self.batch_size)
+            story.refresh_from_db(fields=Story.derived_fields)
+
+        logger.info(
+            "Imported story %s for author %s: %d scenes, %d characters, %d plot points, %d notes",
+            story.pk, self.author.pk, len(scenes), len(characters), len(plotpoints), len(notes)
+        )
+        return story
+
+
+def import_outline(author, lines, format: str, batch_size: int = BATCH_SIZE) -> Story:
+    """Parse an outline in the given format ('json' or 'md') and create its story for an author."""
+
+    outline = PARSERS[format](lines)
+    return OutlineImporter(author, batch_size=batch_size).create(outline)
@@ -0,0 +1,65 @@
+"""Logging helpers: request IDs on every record and context summaries that never touch the database."""
+import contextvars
+import json
+import logging
+
+from django.db.models import Model, QuerySet
+from django.utils.functional import LazyObject, empty
+
+# Set by app.middleware.RequestIDMiddleware for the duration of a request
+request_id = contextvars.ContextVar('request_id', default='-')
+
+
+class RequestIDFilter(logging.Filter):
+    """Add the current request ID to each record as `request_id`."""
+
+    def filter(self, record):
+        record.request_id = request_id.get()
+        return True
+
+
+class JSONFormatter(logging.Formatter):
+    """Format each record as one JSON object per line."""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'request_id': getattr(record, 'request_id', '-'),
+            'message': record.getMessage(),
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+def describe(value) -> str:
+    """Summarize a value for a log message without evaluating querysets, lazy objects or model __str__ methods."""
+
+    # Checked first, since isinstance() on a lazy object would set it up
+    if isinstance(value, LazyObject):
+        return '<lazy>' if value._wrapped is empty else describe(value._wrapped)
+    if isinstance(value, QuerySet):
+        state = f"{len(value._result_cache)} rows" if value._result_cache is not None else 'unevaluated'
+        return f"<QuerySet {value.model.__name__} {state}>"
+    if isinstance(value, Model):
+        return f"<{type(value).__name__} pk={value.pk}>"
+    if isinstance(value, (str, int, float, bool, type(None))):
+        return repr(value)
+    return f"<{type(value).__name__}>"
+
+
+class SafeContext:
+    """Lazy, database-free rendering of a template context for log messages.
+
+    Pass it as a logging argument, e.g. ``logger.debug("Context: %s",
+    SafeContext(context))``, so nothing is formatted unless the record is
+    actually emitted.
+    """
+
+    def __init__(self, context: dict):
+        self.context = context
+
+    def __str__(self):
+        return '{' + ', '.join(f"{key}: {describe(value)}" for key, value in self.context.items()) + '}'
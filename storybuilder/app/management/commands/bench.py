@@ -0,0 +1,235 @@
+"""Benchmark every page of the app and accounts URLconfs against seeded data."""
+import json
+import statistics
+import time
+import tracemalloc
+from contextlib import ExitStack
+from datetime import datetime, timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client, override_settings
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+from django.urls import reverse
+
+from accounts import urls as accounts_urls
+from app import urls as app_urls
+from app import revisions
+from app.middleware import QueryCounter
+from app.models import Story, Scene, Character, Relationship
+from app.seeding import StorySeeder
+
+# Routes that would destroy the seeded data or the logged in session
+SKIPPED_ROUTES = {
+    'delete_story', 'delete_scene', 'delete_character', 'delete_plotpoint', 'delete_relationship', 'delete_user', 'logout'
+}
+
+# Routes that answer with a redirect back to the page they changed
+REDIRECT_ROUTES = {'move_up', 'move_down'}
+
+
+class Command(BaseCommand):
+    help = 'Measure latency, query count and peak memory of every route on a throwaway seeded database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stories', type=int, default=3, help='Stories seeded for the benchmark author.')
+        parser.add_argument('--scenes', type=int, default=100, help='Scenes, characters and plot points per story.')
+        parser.add_argument('--iterations', type=int, default=20, help='Timed requests per route.')
+        parser.add_argument('--routes', nargs='+', help='Only benchmark these URL names.')
+        parser.add_argument('--save', help='Write the results to this JSON baseline file.')
+        parser.add_argument('--compare', help='Compare the results to this JSON baseline file.')
+        parser.add_argument(
+            '--threshold', type=float, default=0.2,
+            help='Relative p50 slowdown that counts as a regression (default 0.2 = 20%%).'
+        )
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare']) as baseline_file:
+                    baseline = json.load(baseline_file)
+            except (OSError, ValueError) as error:
+                raise CommandError(f"Could not read baseline {options['compare']}: {error}")
+
+        # Run against throwaway test databases so the real one is never touched
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            with override_settings(DEBUG=False):
+                self.seed(options['stories'], options['scenes'])
+                results = self.run_routes(options['iterations'], options['routes'])
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        report = {
+            'created': datetime.now(timezone.utc).isoformat(),
+            'stories': options['stories'],
+            'scenes': options['scenes'],
+            'iterations': options['iterations'],
+            'routes': results,
+        }
+        self.print_report(results, baseline, options['threshold'])
+
+        # Timings of error pages say nothing about the views, so they never make a baseline
+        if self.failures:
+            raise CommandError(f"{len(self.failures)} route(s) did not answer as expected: {', '.join(self.failures)}.")
+
+        if options['save']:
+            with open(options['save'], 'w') as baseline_file:
+                json.dump(report, baseline_file, indent=2)
+            self.stdout.write(f"Saved baseline to {options['save']}")
+
+        if baseline and self.regressions:
+            raise CommandError(f"{len(self.regressions)} route(s) regressed against {options['compare']}.")
+
+    def seed(self, story_count: int, per_story: int):
+        """Create the benchmark author with stories full of scenes, characters and plot points.
+
+        Bulk seeding skips the signals, so the benchmarked story, scene and
+        character get a first revision here, and the first characters of the
+        story a chain of relationships for the graph routes.
+        """
+
+        seeder = StorySeeder(
+            stories=story_count,
+            scenes=per_story,
+            characters=per_story,
+            plotpoints=per_story,
+            notes=1
+        )
+        self.author = seeder.seed_authors(['bench'])[0]
+        self.story = Story.objects.filter(author=self.author).order_by('id').first()
+        self.character = Character.objects.filter(story=self.story).order_by('id').first()
+
+        for instance in (self.story, Scene.objects.filter(story=self.story).order_by('order')[1], self.character):
+            revisions.record(instance)
+
+        chain = list(Character.objects.filter(story=self.story).order_by('id')[:3])
+        for source, target in zip(chain, chain[1:]):
+            Relationship.objects.create(story=self.story, source=source, target=target, kind='friend')
+        self.path_end = chain[-1]
+
+    def routes(self):
+        """Yield (key, URL name, URL kwargs) for every benchmarked route."""
+
+        url_kwargs = {
+            'story_slug': self.story.slug,
+            'scene_order': 2,
+            'character_slug': self.character.slug,
+            'plotpoint_order': 2,
+            'number': 1,
+        }
+
+        for urlpatterns in (app_urls.urlpatterns, accounts_urls.urlpatterns):
+            for pattern in urlpatterns:
+                if pattern.name in SKIPPED_ROUTES:
+                    continue
+                kwargs = {name: url_kwargs[name] for name in pattern.pattern.converters}
+
+                # move_up and move_down share their names between scenes and plot points
+                key = pattern.name
+                if pattern.name in ('move_up', 'move_down'):
+                    key += ':scene' if 'scene_order' in kwargs else ':plotpoint'
+                yield key, pattern.name, kwargs
+
+    def request(self, client: Client, url_name: str, url: str):
+        """Make the benchmark request for a route."""
+
+        if url_name == 'reorder':
+            response = client.post(url, data={'kind': 'scenes', 'position': 3, 'target': 2}, content_type='application/json')
+        elif url_name == 'autosave_scene':
+            response = client.post(url, data={'prose': 'The storm gathered over a quiet harbor.'}, content_type='application/json')
+        elif url_name == 'autosave_character':
+            response = client.post(url, data={'occupation': 'Harbor pilot'}, content_type='application/json')
+        elif url_name == 'relationship_path':
+            response = client.get(url, {'from': self.character.slug, 'to': self.path_end.slug})
+        elif url_name == 'search':
+            response = client.get(url, {'q': 'storm harbor'})
+        else:
+            response = client.get(url)
+
+        # A streamed body is only read as it is sent, so reading it is part of the request
+        if response.streaming:
+            b''.join(response.streaming_content)
+        return response
+
+    def answered(self, url_name: str, response) -> bool:
+        """Whether a route answered with the view's own response rather than an error or a redirect to log in."""
+
+        if url_name in REDIRECT_ROUTES:
+            return response.status_code == 302 and not response.url.startswith(reverse('login'))
+        return 200 <= response.status_code < 300 or response.status_code == 304
+
+    def run_routes(self, iterations: int, only=None) -> dict:
+        """Time every route, count its queries and measure its peak memory."""
+
+        client = Client()
+        client.force_login(self.author)
+        results = {}
+        self.failures = []
+
+        for key, url_name, kwargs in self.routes():
+            if only and url_name not in only and key not in only:
+                continue
+            url = reverse(url_name, kwargs=kwargs)
+
+            # Warm up caches and count queries on one request, on the primary and the read-only connection
+            queries = QueryCounter()
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(queries))
+                response = self.request(client, url_name, url)
+
+            if not self.answered(url_name, response):
+                self.failures.append(key)
+
+            timings = []
+            for _ in range(iterations):
+                started = time.perf_counter()
+                self.request(client, url_name, url)
+                timings.append((time.perf_counter() - started) * 1000)
+
+            tracemalloc.start()
+            self.request(client, url_name, url)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            timings.sort()
+            results[key] = {
+                'url': url,
+                'status': response.status_code,
+                'p50_ms': round(statistics.median(timings), 3),
+                'p95_ms': round(timings[max(0, round(len(timings) * 0.95) - 1)], 3),
+                'queries': queries.count,
+                'peak_kib': round(peak / 1024, 1),
+            }
+
+        return results
+
+    def print_report(self, results: dict, baseline, threshold: float):
+        """Print one line per route, marking regressions against the baseline."""
+
+        self.regressions = []
+        previous = baseline['routes'] if baseline else {}
+
+        self.stdout.write(f"{'route':<26} {'status':>6} {'p50 ms':>9} {'p95 ms':>9} {'queries':>8} {'peak KiB':>9}")
+        for key, result in results.items():
+            line = (
+                f"{key:<26} {result['status']:>6} {result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} "
+                f"{result['queries']:>8} {result['peak_kib']:>9.1f}"
+            )
+
+            before = previous.get(key)
+            if before:
+                problems = []
+                if result['p50_ms'] > before['p50_ms'] * (1 + threshold):
+                    problems.append(f"p50 {before['p50_ms']:.2f} -> {result['p50_ms']:.2f} ms")
+                if result['queries'] > before['queries']:
+                    problems.append(f"queries {before['queries']} -> {result['queries']}")
+                if problems:
+                    self.regressions.append(key)
+                    line += '  REGRESSION: ' + ', '.join(problems)
+
+            self.stdout.write(line)
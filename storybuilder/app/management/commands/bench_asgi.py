@@ -0,0 +1,224 @@
+"""Compare the throughput of the read-only pages through the WSGI and ASGI handlers."""
+import asyncio
+import io
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+from django.urls import reverse
+
+from app import urls as app_urls
+from app.models import Story, Character
+from app.seeding import StorySeeder
+
+# The pages served by async views
+READ_ROUTES = [
+    'stories', 'story_detail', 'scenes', 'scene_detail', 'characters', 'character_detail', 'plot_detail', 'plotpoint_detail'
+]
+
+
+class Command(BaseCommand):
+    help = 'Measure requests per second of the read-only pages under concurrent readers, through WSGI and through ASGI.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stories', type=int, default=3, help='Stories seeded for the benchmark author.')
+        parser.add_argument('--scenes', type=int, default=100, help='Scenes, characters and plot points per story.')
+        parser.add_argument('--readers', type=int, default=16, help='Requests in flight at once.')
+        parser.add_argument('--requests', type=int, default=400, help='Timed requests per route and handler.')
+        parser.add_argument('--routes', nargs='+', choices=READ_ROUTES, help='Only benchmark these URL names.')
+
+    def handle(self, *args, **options):
+        # Readers on other threads need their own connections to the same
+        # database, so a SQLite test database lives in a file, not in memory
+        setup_test_environment()
+        workdir = None
+        if connection.vendor == 'sqlite':
+            workdir = tempfile.mkdtemp()
+            connection.settings_dict['TEST']['NAME'] = os.path.join(workdir, 'bench.sqlite3')
+        old_config = setup_databases(verbosity=0, interactive=False)
+
+        try:
+            with override_settings(DEBUG=False):
+                cookie = self.seed(options['stories'], options['scenes'])
+                connection.close()
+                results = self.run_routes(cookie, options['readers'], options['requests'], options['routes'])
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+            if workdir:
+                shutil.rmtree(workdir, ignore_errors=True)
+
+        self.print_report(results, options['readers'])
+
+    def seed(self, story_count: int, per_story: int) -> str:
+        """Create the benchmark author's stories and return the Cookie header of their session."""
+
+        seeder = StorySeeder(stories=story_count, scenes=per_story, characters=per_story, plotpoints=per_story, notes=1)
+        author = seeder.seed_authors(['bench'])[0]
+        self.story = Story.objects.filter(author=author).order_by('id').first()
+        self.character = Character.objects.filter(story=self.story).order_by('id').first()
+
+        client = Client()
+        client.force_login(author)
+        return f"{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}"
+
+    def urls(self, only=None):
+        """Yield (URL name, URL) for every benchmarked route."""
+
+        url_kwargs = {
+            'story_slug': self.story.slug,
+            'scene_order': 2,
+            'character_slug': self.character.slug,
+            'plotpoint_order': 2,
+        }
+        for pattern in app_urls.urlpatterns:
+            if pattern.name in READ_ROUTES and (not only or pattern.name in only):
+                kwargs = {name: url_kwargs[name] for name in pattern.pattern.converters}
+                yield pattern.name, reverse(pattern.name, kwargs=kwargs)
+
+    def run_routes(self, cookie: str, readers: int, count: int, only=None) -> dict:
+        wsgi = WSGIHandler()
+        asgi = ASGIHandler()
+        results = {}
+
+        for name, url in self.urls(only):
+            # One request each to warm the fragment cache
+            status = self.wsgi_get(wsgi, url, cookie)[0]
+            asyncio.run(self.asgi_get(asgi, url, cookie))
+
+            results[name] = {
+                'url': url,
+                'status': status,
+                'wsgi': self.summarize(*self.run_wsgi(wsgi, url, cookie, readers, count)),
+                'asgi': self.summarize(*asyncio.run(self.run_asgi(asgi, url, cookie, readers, count))),
+            }
+
+        return results
+
+    ### WSGI: a thread per reader, as in a threaded WSGI server
+
+    def wsgi_get(self, handler, url: str, cookie: str):
+        """Make one GET request through the WSGI handler, returning its status and latency."""
+
+        environ = {
+            'REQUEST_METHOD': 'GET',
+            'SCRIPT_NAME': '',
+            'PATH_INFO': url,
+            'QUERY_STRING': '',
+            'SERVER_NAME': 'testserver',
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'REMOTE_ADDR': '127.0.0.1',
+            'HTTP_HOST': 'testserver',
+            'HTTP_COOKIE': cookie,
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': 'http',
+            'wsgi.input': io.BytesIO(),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        statuses = []
+
+        started = time.perf_counter()
+        body = handler(environ, lambda status, headers, exc_info=None: statuses.append(status))
+        for _ in body:
+            pass
+        body.close()
+        return int(statuses[0].split()[0]), time.perf_counter() - started
+
+    def run_wsgi(self, handler, url: str, cookie: str, readers: int, count: int):
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=readers) as pool:
+            responses = list(pool.map(lambda _: self.wsgi_get(handler, url, cookie), range(count)))
+        return responses, time.perf_counter() - started
+
+    ### ASGI: one event loop with a task per reader, as in a single ASGI worker
+
+    async def asgi_get(self, application, url: str, cookie: str):
+        """Make one GET request through the ASGI handler, returning its status and latency."""
+
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': url,
+            'raw_path': url.encode(),
+            'query_string': b'',
+            'root_path': '',
+            'headers': [(b'host', b'testserver'), (b'cookie', cookie.encode())],
+            'client': ('127.0.0.1', 0),
+            'server': ('testserver', 80),
+        }
+        requested = False
+        finished = asyncio.Event()
+        statuses = []
+
+        async def receive():
+            nonlocal requested
+            if not requested:
+                requested = True
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            await finished.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                statuses.append(message['status'])
+
+        started = time.perf_counter()
+        await application(scope, receive, send)
+        finished.set()
+        return statuses[0], time.perf_counter() - started
+
+    async def run_asgi(self, application, url: str, cookie: str, readers: int, count: int):
+        remaining = iter(range(count))
+        responses = []
+
+        async def reader():
+            for _ in remaining:
+                responses.append(await self.asgi_get(application, url, cookie))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(reader() for _ in range(readers)))
+        return responses, time.perf_counter() - started
+
+    def summarize(self, responses: list, elapsed: float) -> dict:
+        timings = sorted(latency * 1000 for _, latency in responses)
+        return {
+            'errors': sum(1 for status, _ in responses if status != 200),
+            'rps': round(len(responses) / elapsed, 1),
+            'p50_ms': round(statistics.median(timings), 3),
+            'p95_ms': round(timings[max(0, round(len(timings) * 0.95) - 1)], 3),
+        }
+
+    def print_report(self, results: dict, readers: int):
+        self.stdout.write(f"{readers} concurrent readers")
+        self.stdout.write(
+            f"{'route':<18} {'status':>6} {'WSGI req/s':>11} {'p50 ms':>8} {'p95 ms':>8} "
+            f"{'ASGI req/s':>11} {'p50 ms':>8} {'p95 ms':>8} {'ASGI/WSGI':>10}"
+        )
+        for name, result in results.items():
+            wsgi, asgi = result['wsgi'], result['asgi']
+            line = (
+                f"{name:<18} {result['status']:>6} {wsgi['rps']:>11.1f} {wsgi['p50_ms']:>8.2f} {wsgi['p95_ms']:>8.2f} "
+                f"{asgi['rps']:>11.1f} {asgi['p50_ms']:>8.2f} {asgi['p95_ms']:>8.2f} {asgi['rps'] / wsgi['rps']:>10.2f}"
+            )
+            errors = wsgi['errors'] + asgi['errors']
+            if errors:
+                line += f"  {errors} non-200 responses"
+            self.stdout.write(line)
@@ -0,0 +1,116 @@
+"""Benchmark the slug and order lookup helpers as the tables grow."""
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from accounts.models import CustomUser
+from app.models import Story, Scene, Character, Plot, PlotPoint
+from app.ordering import ORDER_GAP
+from app.utils import get_story_by_slug, get_scene, get_character, get_plotpoint
+
+
+class Rollback(Exception):
+    """Raised to throw away the benchmark rows once the run is finished."""
+
+
+class Command(BaseCommand):
+    help = 'Measure lookup latency of the app.utils helpers at growing row counts.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=int, nargs='+', default=[1000, 10000, 50000],
+            help='Total scene, character and plot point rows to benchmark at.'
+        )
+        parser.add_argument('--per-story', type=int, default=100, help='Rows of each kind per story.')
+        parser.add_argument('--lookups', type=int, default=500, help='Lookups timed per helper and size.')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.per_story = options['per_story']
+
+        # Everything runs in one transaction that is rolled back at the end
+        try:
+            with transaction.atomic():
+                self.author = CustomUser.objects.create(
+                    username='bench-lookups',
+                    email='bench-lookups@example.com',
+                    first_name='Bench',
+                    last_name='Lookups'
+                )
+                self.stories = []
+                self.show_query_plans()
+
+                for size in sorted(options['sizes']):
+                    self.grow_to(size)
+                    self.report(size, options['lookups'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def grow_to(self, size: int):
+        """Add stories with scenes, characters and plot points until `size` rows of each exist."""
+
+        story_count = max(1, size // self.per_story)
+        start = len(self.stories)
+        new_stories = Story.objects.bulk_create([
+            Story(title=f"Story {i}", slug=f"story-{i}", description='', author=self.author)
+            for i in range(start, story_count)
+        ])
+        plots = Plot.objects.bulk_create([
+            Plot(name=f"Plot for {story.title}", story=story) for story in new_stories
+        ])
+
+        scenes, characters, plotpoints = [], [], []
+        for story, plot in zip(new_stories, plots):
+            for order in range(1, self.per_story + 1):
+                scenes.append(Scene(title=f"Scene {order}", description='', story=story, order=order * ORDER_GAP))
+                characters.append(Character(first_name=f"Person{order}", full_name=f"Person{order}", slug=f"person{order}", story=story))
+                plotpoints.append(PlotPoint(name=f"Point {order}", description='', plot=plot, order=order * ORDER_GAP))
+
+        Scene.objects.bulk_create(scenes, batch_size=1000)
+        Character.objects.bulk_create(characters, batch_size=1000)
+        PlotPoint.objects.bulk_create(plotpoints, batch_size=1000)
+        self.stories.extend(new_stories)
+
+    def report(self, size: int, lookups: int):
+        """Time each lookup helper against random existing targets."""
+
+        author_id = self.author.id
+        helpers = {
+            'get_story_by_slug': lambda story, n: get_story_by_slug(story.slug, author_id),
+            'get_scene': lambda story, n: get_scene(story.id, n),
+            'get_character': lambda story, n: get_character(story.id, f"person{n}"),
+            'get_plotpoint': lambda story, n: get_plotpoint(story.slug, n, author_id),
+        }
+
+        self.stdout.write(f"\n{size} rows per model ({len(self.stories)} stories)")
+        for name, lookup in helpers.items():
+            targets = [
+                (self.random.choice(self.stories), self.random.randint(1, self.per_story))
+                for _ in range(lookups)
+            ]
+            started = time.perf_counter()
+            for story, n in targets:
+                if lookup(story, n) is None:
+                    raise AssertionError(f"{name} missed story {story.slug} item {n}")
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f"  {name:<20} {elapsed / lookups * 1_000_000:>9.1f} us/lookup")
+
+    def show_query_plans(self):
+        """Print the SQLite plan for each lookup to confirm the composite indexes are used."""
+
+        if connection.vendor != 'sqlite':
+            return
+
+        queries = {
+            'get_story_by_slug': Story.objects.filter(slug='story-1', author_id=1),
+            'get_scene': Scene.objects.filter(story_id=1).order_by('order')[:1],
+            'get_character': Character.objects.filter(story_id=1, slug='person1'),
+            'get_plotpoint': PlotPoint.objects.filter(plot__story_id=1).order_by('order')[:1],
+        }
+        self.stdout.write("Query plans:")
+        for name, queryset in queries.items():
+            self.stdout.write(f"  {name:<20} {queryset.explain()}")
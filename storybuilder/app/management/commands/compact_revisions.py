@@ -0,0 +1,25 @@
+"""Apply the revision retention policy: delete old revisions and rebase the chains that lose their snapshot."""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from app.revisions import compact
+
+
+class Command(BaseCommand):
+    help = 'Delete revisions past their retention, turning the oldest kept revision of each object into a snapshot.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keep', type=int, default=settings.REVISION_KEEP,
+            help='Latest revisions of each story, scene and character always kept.'
+        )
+        parser.add_argument(
+            '--keep-days', type=int, default=settings.REVISION_KEEP_DAYS,
+            help='Days of revisions always kept.'
+        )
+
+    def handle(self, *args, **options):
+        result = compact(options['keep'], options['keep_days'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {result['deleted']} revisions and turned {result['rebased']} into snapshots."
+        ))
@@ -0,0 +1,39 @@
+"""Create a whole story for an author from a JSON or Markdown outline file."""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import CustomUser
+from app.importing import OutlineError, format_for, import_outline
+
+
+class Command(BaseCommand):
+    help = 'Import a story outline, with its plot points, characters, scenes and notes, in one transaction.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='The outline file.')
+        parser.add_argument('--author', required=True, help='Username of the author who will own the story.')
+        parser.add_argument('--format', choices=['json', 'md'], help='Outline format; guessed from the file name by default.')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per bulk insert statement.')
+
+    def handle(self, *args, **options):
+        author = CustomUser.objects.filter(username=options['author']).first()
+        if not author:
+            raise CommandError(f"There is no author with the username {options['author']!r}.")
+
+        format = options['format'] or format_for(options['path'])
+        if not format:
+            raise CommandError('Pass --format json or --format md for this file.')
+
+        started = time.perf_counter()
+        try:
+            with open(options['path'], encoding='utf-8') as lines:
+                story = import_outline(author, lines, format, batch_size=options['batch_size'])
+        except OutlineError as error:
+            for message in error.errors:
+                self.stderr.write(message)
+            raise CommandError(f"The outline has {len(error.errors)} problem(s); nothing was imported.")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {story.title!r} with {story.scene_count} scenes in {time.perf_counter() - started:.1f}s."
+        ))
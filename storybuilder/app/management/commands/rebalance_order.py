@@ -0,0 +1,35 @@
+"""Respace crowded scene and plot point sort keys."""
+from django.core.management.base import BaseCommand
+
+from app.models import Story, Scene, Plot, PlotPoint
+from app.ordering import ORDER_GAP, rebalance, smallest_gap
+
+
+class Command(BaseCommand):
+    help = 'Rebalance scene and plot point sort keys whose gaps have become too small.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-gap', type=int, default=ORDER_GAP // 16,
+            help='Rebalance a list when any two neighbouring keys are closer than this.'
+        )
+        parser.add_argument('--all', action='store_true', help='Rebalance every list regardless of its gaps.')
+
+    def handle(self, *args, **options):
+        lists = [
+            ('scene', Story, lambda parent_id: Scene.objects.filter(story_id=parent_id)),
+            ('plot point', Plot, lambda parent_id: PlotPoint.objects.filter(plot_id=parent_id)),
+        ]
+
+        for label, parent_model, siblings_of in lists:
+            rebalanced = 0
+            for parent_id in parent_model.objects.values_list('id', flat=True).iterator():
+                siblings = siblings_of(parent_id)
+                gap = smallest_gap(siblings)
+                if gap is None:
+                    continue
+                if options['all'] or gap < options['min_gap']:
+                    rebalance(siblings)
+                    rebalanced += 1
+
+            self.stdout.write(f"Rebalanced {rebalanced} {label} list(s).")
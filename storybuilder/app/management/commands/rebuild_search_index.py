@@ -0,0 +1,23 @@
+"""Rebuild the full-text search index from the story, scene and character tables."""
+from django.core.management.base import BaseCommand, CommandError
+
+from app import search
+
+
+class Command(BaseCommand):
+    help = 'Backfill the FTS5 search index in batches, for everyone or for one author.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--author', type=int, help='Only rebuild the rows of this author ID.')
+        parser.add_argument('--batch-size', type=int, default=2000, help='Rows written per transaction.')
+
+    def handle(self, *args, **options):
+        if not search.available():
+            raise CommandError('The search index needs an SQLite database with FTS5.')
+
+        total = search.rebuild(
+            batch_size=options['batch_size'],
+            author_id=options['author'],
+            log=lambda count: self.stdout.write(f"Indexed {count} rows")
+        )
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt the search index with {total} rows."))
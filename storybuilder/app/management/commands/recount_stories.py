@@ -0,0 +1,32 @@
+"""Repair the denormalized child and word counts on stories."""
+from django.core.management.base import BaseCommand
+
+from app.models import Story, Scene
+from app.wordcount import count_words
+
+
+class Command(BaseCommand):
+    help = 'Recompute the scene, character, plot point and word counts stored on each story.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--author', type=int, help='Only recount the stories of this author ID.')
+        parser.add_argument('--prose', action='store_true', help='Count the words of every scene again from its prose first.')
+
+    def handle(self, *args, **options):
+        stories = Story.objects.all()
+        if options['author']:
+            stories = stories.filter(author_id=options['author'])
+
+        if options['prose']:
+            scenes = Scene.objects.filter(story__in=stories).only('id', 'prose', 'word_count')
+            changed = []
+            for scene in scenes.iterator(chunk_size=500):
+                word_count = count_words(scene.prose)
+                if word_count != scene.word_count:
+                    scene.word_count = word_count
+                    changed.append(scene)
+            Scene.objects.bulk_update(changed, ['word_count'], batch_size=500)
+            self.stdout.write(f"Corrected the word counts of {len(changed)} scenes.")
+
+        updated = stories.recount()
+        self.stdout.write(f"Recounted {updated} stories.")
@@ -0,0 +1,25 @@
+"""Compact the writing progress history: drop old raw events and fold old daily totals into weeks."""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from app.progress import compact
+
+
+class Command(BaseCommand):
+    help = 'Delete word count events past their retention and fold old daily rollups into weekly rollups.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--raw-days', type=int, default=settings.WORD_COUNT_RAW_DAYS,
+            help='Days of raw word count events to keep.'
+        )
+        parser.add_argument(
+            '--daily-days', type=int, default=settings.WORD_COUNT_DAILY_DAYS,
+            help='Days of daily rollups to keep before folding them into weeks.'
+        )
+
+    def handle(self, *args, **options):
+        result = compact(options['raw_days'], options['daily_days'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {result['events']} word count events and folded {result['daily']} daily rollups into weeks."
+        ))
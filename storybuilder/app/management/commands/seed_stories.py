@@ -0,0 +1,56 @@
+"""Fill the database with deterministic synthetic stories for load testing."""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import CustomUser
+from app.seeding import StorySeeder
+
+
+class Command(BaseCommand):
+    help = 'Generate authors with stories, scenes, characters, plot points, notes and scene characters in bulk.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--authors', type=int, default=100, help='Authors to create.')
+        parser.add_argument('--stories', type=int, default=10, help='Stories per author.')
+        parser.add_argument('--scenes', type=int, default=100, help='Scenes per story.')
+        parser.add_argument('--characters', type=int, default=50, help='Characters per story.')
+        parser.add_argument('--plotpoints', type=int, default=20, help='Plot points per story.')
+        parser.add_argument('--notes', type=int, default=2, help='Notes per scene.')
+        parser.add_argument('--links', type=int, default=3, help='Characters per scene.')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed; the same seed gives the same data.')
+        parser.add_argument('--prefix', default='seed', help='Username prefix of the generated authors.')
+        parser.add_argument('--authors-per-transaction', type=int, default=10)
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per bulk insert statement.')
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        if CustomUser.objects.filter(username__startswith=f"{prefix}-").exists():
+            raise CommandError(f"Authors with the prefix {prefix!r} already exist; pick another --prefix.")
+
+        seeder = StorySeeder(
+            stories=options['stories'],
+            scenes=options['scenes'],
+            characters=options['characters'],
+            plotpoints=options['plotpoints'],
+            notes=options['notes'],
+            links=options['links'],
+            seed=options['seed'],
+            batch_size=options['batch_size']
+        )
+
+        usernames = [f"{prefix}-{index}" for index in range(1, options['authors'] + 1)]
+        step = max(1, options['authors_per_transaction'])
+        started = time.perf_counter()
+
+        for start in range(0, len(usernames), step):
+            seeder.seed_authors(usernames[start:start + step])
+            done = min(start + step, len(usernames))
+            self.stdout.write(f"Seeded {done}/{len(usernames)} authors ({time.perf_counter() - started:.1f}s)")
+
+        per_story = options['scenes'] * (1 + options['links'] + options['notes']) + options['characters'] + options['plotpoints'] + 2
+        rows = options['authors'] * (2 + options['stories'] * per_story)
+        self.stdout.write(self.style.SUCCESS(
+            f"Created about {rows} rows in {time.perf_counter() - started:.1f}s."
+        ))
+        self.stdout.write('Bulk inserts skip the search index; run rebuild_search_index to make them searchable.')
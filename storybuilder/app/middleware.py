@@ -0,0 +1,185 @@
+"""Middleware for the Story Builder."""
+import contextvars
+import logging
+import time
+import uuid
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+from .database import primary_pinned
+from .log import request_id
+
+logger = logging.getLogger(__name__)
+
+
+class QueryCounter:
+    """Database execute wrapper that counts queries and their total duration."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - started
+
+
+# The counter of the request being handled, set by QueryBudgetMiddleware
+query_counter = contextvars.ContextVar('query_counter', default=None)
+
+
+def count_queries(execute, sql, params, many, context):
+    """Execute wrapper that counts a query into the current request's counter, if there is one."""
+
+    counter = query_counter.get()
+    if counter is None:
+        return execute(sql, params, many, context)
+    return counter(execute, sql, params, many, context)
+
+
+def install_query_counting():
+    """Leave `count_queries` on every database connection of the current thread, once per connection."""
+
+    for connection in connections.all():
+        if count_queries not in connection.execute_wrappers:
+            connection.execute_wrappers.append(count_queries)
+
+
+def query_budget(url_name):
+    """Return the declared query budget for a URL name, or the default budget."""
+
+    budgets = getattr(settings, 'QUERY_BUDGETS', {})
+    return budgets.get(url_name, getattr(settings, 'QUERY_BUDGET_DEFAULT', None))
+
+
+class ContextMiddleware:
+    """Base for middleware that sets a context variable for the duration of each request.
+
+    Subclasses name the `variable` and return its value for a request from
+    `value()`. It runs natively under both WSGI and ASGI, so async views are
+    not pushed onto a thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+    variable = None
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+
+        token = self.variable.set(self.value(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            self.variable.reset(token)
+        return self.finish(request, response)
+
+    async def __acall__(self, request):
+        token = self.variable.set(self.value(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            self.variable.reset(token)
+        return self.finish(request, response)
+
+    def value(self, request):
+        raise NotImplementedError
+
+    def finish(self, request, response):
+        return response
+
+
+class QueryBudgetMiddleware(ContextMiddleware):
+    """Count the queries and database time of each request against its URL's budget.
+
+    Requests that run more queries than `QUERY_BUDGETS[url_name]` (or
+    `QUERY_BUDGET_DEFAULT`) are logged as warnings. With DEBUG on, the counts
+    are also returned in the X-Query-Count, X-Query-Time-Ms and X-Query-Budget
+    response headers.
+
+    Queries are counted by `count_queries` into the request's counter, found
+    through a context variable, so async views are counted natively under
+    ASGI, where their ORM calls run on another thread with its own
+    connections, and concurrent requests never share a counter.
+    """
+
+    variable = query_counter
+
+    def __call__(self, request):
+        if not self.is_async:
+            install_query_counting()
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        await sync_to_async(install_query_counting)()
+        return await super().__acall__(request)
+
+    def value(self, request):
+        request.query_counter = QueryCounter()
+        return request.query_counter
+
+    def finish(self, request, response):
+        counter = request.query_counter
+        match = request.resolver_match
+        url_name = match.url_name if match else None
+        budget = query_budget(url_name)
+        duration_ms = counter.duration * 1000
+
+        if budget is not None and counter.count > budget:
+            logger.warning(
+                "Query budget exceeded for %s: %d queries (budget %d) in %.1f ms",
+                url_name, counter.count, budget, duration_ms
+            )
+
+        if settings.DEBUG:
+            response['X-Query-Count'] = str(counter.count)
+            response['X-Query-Time-Ms'] = f"{duration_ms:.1f}"
+            if budget is not None:
+                response['X-Query-Budget'] = str(budget)
+
+        return response
+
+
+class RequestIDMiddleware(ContextMiddleware):
+    """Tag every log record written while handling a request with the request's ID.
+
+    The ID is taken from a valid incoming X-Request-ID header, or generated,
+    and is echoed back in the X-Request-ID response header.
+    """
+
+    variable = request_id
+
+    def value(self, request):
+        incoming = request.headers.get('X-Request-ID', '')
+        request.id = incoming if 0 < len(incoming) <= 64 and incoming.isprintable() else uuid.uuid4().hex
+        return request.id
+
+    def finish(self, request, response):
+        response['X-Request-ID'] = request.id
+        return response
+
+
+class ReadAfterWriteMiddleware(ContextMiddleware):
+    """Start each request reading from the read-only database, see app/database.py.
+
+    Requests that may write read from the primary from the start; the others
+    move to it on their first write.
+    """
+
+    variable = primary_pinned
+
+    def value(self, request):
+        return request.method not in ('GET', 'HEAD', 'OPTIONS')
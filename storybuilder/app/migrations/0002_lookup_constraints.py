@@ -0,0 +1,70 @@
+# Generated by Django 5.0.6 on 2026-10-18 18:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def renumber_orders(apps, schema_editor):
+    """Renumber scene and plot point orders to a dense 1..n sequence per parent."""
+
+    for model_name, parent_field in (('Scene', 'story_id'), ('PlotPoint', 'plot_id')):
+        model = apps.get_model('app', model_name)
+        rows = list(model.objects.order_by(parent_field, 'order', 'id').only('id', parent_field, 'order'))
+
+        # Park every row outside the final range first so the renumbering can't collide
+        model.objects.update(order=-models.F('id'))
+
+        changed = []
+        parent_id, position = None, 0
+        for row in rows:
+            if getattr(row, parent_field) != parent_id:
+                parent_id, position = getattr(row, parent_field), 0
+            position += 1
+            row.order = position
+            changed.append(row)
+        model.objects.bulk_update(changed, ['order'], batch_size=500)
+
+
+def deduplicate_slugs(apps, schema_editor):
+    """Suffix duplicate story and character slugs so they are unique per parent."""
+
+    for model_name, parent_field in (('Story', 'author_id'), ('Character', 'story_id')):
+        model = apps.get_model('app', model_name)
+        seen = set()
+        changed = []
+        for row in model.objects.order_by('id').only('id', parent_field, 'slug'):
+            key = (getattr(row, parent_field), row.slug)
+            if key in seen:
+                row.slug = f"{row.slug}-{row.id}"
+                changed.append(row)
+            seen.add((getattr(row, parent_field), row.slug))
+        model.objects.bulk_update(changed, ['slug'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(renumber_orders, migrations.RunPython.noop),
+        migrations.RunPython(deduplicate_slugs, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='character',
+            constraint=models.UniqueConstraint(fields=('story', 'slug'), name='story_character_slug_constraint'),
+        ),
+        migrations.AddConstraint(
+            model_name='plotpoint',
+            constraint=models.UniqueConstraint(fields=('plot', 'order'), name='plot_plotpoint_order_constraint'),
+        ),
+        migrations.AddConstraint(
+            model_name='scene',
+            constraint=models.UniqueConstraint(fields=('story', 'order'), name='story_scene_order_constraint'),
+        ),
+        migrations.AddConstraint(
+            model_name='story',
+            constraint=models.UniqueConstraint(fields=('author', 'slug'), name='author_slug_constraint'),
+        ),
+    ]
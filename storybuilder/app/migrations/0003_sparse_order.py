@@ -0,0 +1,61 @@
+# Generated by Django 5.0.6 on 2026-10-18 18:07
+
+from django.db import migrations, models
+
+# Copied from app.ordering so the migration doesn't depend on app code
+ORDER_GAP = 1024
+
+
+def spread_orders(apps, schema_editor):
+    """Turn the dense 1..n orders into sort keys spaced ORDER_GAP apart."""
+
+    for model_name in ('Scene', 'PlotPoint'):
+        model = apps.get_model('app', model_name)
+        model.objects.update(order=-models.F('order'))
+        model.objects.update(order=-models.F('order') * ORDER_GAP)
+
+
+def compact_orders(apps, schema_editor):
+    """Turn sparse sort keys back into a dense 1..n order per parent."""
+
+    for model_name, parent_field in (('Scene', 'story_id'), ('PlotPoint', 'plot_id')):
+        model = apps.get_model('app', model_name)
+        rows = list(model.objects.order_by(parent_field, 'order', 'id').only('id', parent_field, 'order'))
+        model.objects.update(order=-models.F('id'))
+
+        parent_id, position = None, 0
+        for row in rows:
+            if getattr(row, parent_field) != parent_id:
+                parent_id, position = getattr(row, parent_field), 0
+            position += 1
+            row.order = position
+        model.objects.bulk_update(rows, ['order'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0002_lookup_constraints'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='plotpoint',
+            options={'ordering': ['order']},
+        ),
+        migrations.AlterModelOptions(
+            name='scene',
+            options={'ordering': ['order']},
+        ),
+        migrations.AlterField(
+            model_name='plotpoint',
+            name='order',
+            field=models.IntegerField(blank=True, default=1),
+        ),
+        migrations.AlterField(
+            model_name='scene',
+            name='order',
+            field=models.IntegerField(blank=True, default=1),
+        ),
+        migrations.RunPython(spread_orders, compact_orders),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.0.6 on 2026-10-18 18:09
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def count_children(apps, schema_editor):
+    """Fill in the new count columns from the existing child rows."""
+
+    Story = apps.get_model('app', 'Story')
+    Scene = apps.get_model('app', 'Scene')
+    Character = apps.get_model('app', 'Character')
+    PlotPoint = apps.get_model('app', 'PlotPoint')
+
+    def count_of(model, story_path):
+        return Coalesce(models.Subquery(
+            model.objects.filter(**{story_path: models.OuterRef('pk')})
+            .order_by().values(story_path).annotate(total=models.Count('pk')).values('total')
+        ), 0)
+
+    Story.objects.update(
+        scene_count=count_of(Scene, 'story'),
+        character_count=count_of(Character, 'story'),
+        plotpoint_count=count_of(PlotPoint, 'plot__story')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0003_sparse_order'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='story',
+            name='character_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='story',
+            name='plotpoint_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='story',
+            name='scene_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_children, migrations.RunPython.noop),
+    ]
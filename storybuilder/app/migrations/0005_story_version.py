@@ -0,0 +1,19 @@
+# Generated by Django 5.0.6 on 2026-10-18 18:19
+
+import app.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0004_story_counts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='story',
+            name='version',
+            field=models.PositiveBigIntegerField(default=app.models.initial_version),
+        ),
+    ]
@@ -0,0 +1,56 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    """Create the FTS5 search table, on SQLite only, and index the existing rows."""
+
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+
+    schema_editor.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS app_search USING fts5(
+            author, title, body, kind UNINDEXED, object_id UNINDEXED, story_id UNINDEXED,
+            tokenize = 'porter unicode61 remove_diacritics 2'
+        )
+    """)
+
+    Story = apps.get_model('app', 'Story')
+    Scene = apps.get_model('app', 'Scene')
+    Character = apps.get_model('app', 'Character')
+
+    rows = [
+        (story_id * 4 + 1, f"a{author_id}", title, description or '', 1, story_id, story_id)
+        for story_id, author_id, title, description in Story.objects.values_list('id', 'author_id', 'title', 'description')
+    ]
+    rows += [
+        (scene_id * 4 + 2, f"a{author_id}", title, '\n'.join([description or '', *(str(note) for note in notes or [])]), 2, scene_id, story_id)
+        for scene_id, story_id, author_id, title, description, notes
+        in Scene.objects.values_list('id', 'story_id', 'story__author_id', 'title', 'description', 'notes')
+    ]
+    rows += [
+        (character_id * 4 + 3, f"a{author_id}", full_name or '', description or '', 3, character_id, story_id)
+        for character_id, story_id, author_id, full_name, description
+        in Character.objects.values_list('id', 'story_id', 'story__author_id', 'full_name', 'description')
+    ]
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(
+            "INSERT INTO app_search (rowid, author, title, body, kind, object_id, story_id) VALUES (%s, %s, %s, %s, %s, %s, %s)",
+            rows
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS app_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0005_story_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
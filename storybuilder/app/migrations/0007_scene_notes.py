@@ -0,0 +1,93 @@
+# Generated by Django 5.0.6 on 2026-10-18 18:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def move_notes(apps, schema_editor):
+    """Copy every Scene.notes array into SceneNote rows, keeping the array order."""
+
+    Scene = apps.get_model('app', 'Scene')
+    SceneNote = apps.get_model('app', 'SceneNote')
+
+    now = timezone.now()
+    batch = []
+    for scene_id, notes in Scene.objects.order_by('id').values_list('id', 'notes').iterator(chunk_size=2000):
+        batch.extend(SceneNote(scene_id=scene_id, text=str(note), created_at=now) for note in notes or [])
+        if len(batch) >= 2000:
+            SceneNote.objects.bulk_create(batch)
+            batch = []
+    SceneNote.objects.bulk_create(batch)
+
+
+def restore_notes(apps, schema_editor):
+    """Fold SceneNote rows back into the Scene.notes arrays."""
+
+    Scene = apps.get_model('app', 'Scene')
+    SceneNote = apps.get_model('app', 'SceneNote')
+
+    notes = {}
+    for scene_id, text in SceneNote.objects.order_by('id').values_list('scene_id', 'text'):
+        notes.setdefault(scene_id, []).append(text)
+    scenes = list(Scene.objects.filter(pk__in=notes))
+    for scene in scenes:
+        scene.notes = notes[scene.pk]
+    Scene.objects.bulk_update(scenes, ['notes'], batch_size=500)
+
+
+def reindex_scenes(apps, schema_editor):
+    """Index notes as their own search rows, and scenes without them."""
+
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("DELETE FROM app_search WHERE kind = 2")
+        cursor.execute("""
+            INSERT INTO app_search (rowid, author, title, body, kind, object_id, story_id)
+            SELECT app_scene.id * 4 + 2, 'a' || app_story.author_id, app_scene.title, coalesce(app_scene.description, ''),
+                   2, app_scene.id, app_scene.story_id
+            FROM app_scene JOIN app_story ON app_story.id = app_scene.story_id
+        """)
+        cursor.execute("""
+            INSERT INTO app_search (rowid, author, title, body, kind, object_id, story_id)
+            SELECT app_scenenote.id * 4, 'a' || app_story.author_id, '', app_scenenote.text,
+                   0, app_scene.id, app_scene.story_id
+            FROM app_scenenote
+            JOIN app_scene ON app_scene.id = app_scenenote.scene_id
+            JOIN app_story ON app_story.id = app_scene.story_id
+        """)
+
+
+def unindex_notes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute("DELETE FROM app_search WHERE kind = 0")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0006_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SceneNote',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('text', models.TextField(max_length=500)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('scene', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='app.scene')),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+        migrations.RunPython(move_notes, restore_notes),
+        migrations.RemoveField(
+            model_name='scene',
+            name='notes',
+        ),
+        migrations.RunPython(reindex_scenes, unindex_notes),
+    ]
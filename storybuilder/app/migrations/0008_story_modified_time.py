@@ -0,0 +1,35 @@
+# Generated by Django 5.0.6 on 2026-10-18 18:37
+
+from django.db import migrations, models
+
+
+def add_midnight(apps, schema_editor):
+    """Turn the saved dates into midnight timestamps, which SQLite leaves as bare dates."""
+
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(
+            "UPDATE app_story SET date_last_saved = date_last_saved || ' 00:00:00' WHERE length(date_last_saved) = 10"
+        )
+
+
+def drop_time(apps, schema_editor):
+    """Cut the saved timestamps back to dates on SQLite."""
+
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute("UPDATE app_story SET date_last_saved = substr(date_last_saved, 1, 10)")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0007_scene_notes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='story',
+            name='date_last_saved',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(add_midnight, drop_time),
+    ]
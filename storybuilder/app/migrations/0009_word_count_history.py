@@ -0,0 +1,43 @@
+# Generated by Django 5.0.6 on 2026-10-18 18:53
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0008_story_modified_time'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WordCountRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('day', 'Day'), ('week', 'Week')], max_length=4)),
+                ('start', models.DateField()),
+                ('words', models.IntegerField(default=0)),
+                ('updates', models.PositiveIntegerField(default=0)),
+                ('word_count', models.PositiveIntegerField(default=0)),
+                ('story', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='word_count_rollups', to='app.story')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='WordCountEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recorded_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('word_count', models.PositiveIntegerField()),
+                ('story', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='word_count_events', to='app.story')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['story', 'recorded_at'], name='wordcount_story_time_idx'), models.Index(fields=['recorded_at'], name='wordcount_time_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='wordcountrollup',
+            constraint=models.UniqueConstraint(fields=('story', 'period', 'start'), name='story_period_start_constraint'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.0.6 on 2026-10-18 18:57
+
+from django.db import migrations, models
+
+
+def carry_word_counts(apps, schema_editor):
+    """Keep each story's hand-entered word count as the offset its scene word counts, which start at zero, add to."""
+
+    Story = apps.get_model('app', 'Story')
+    Story.objects.update(word_count_offset=models.F('word_count'))
+
+
+def drop_scene_words(apps, schema_editor):
+    """Take the words of scene prose back out of each story's word count, leaving the hand-entered count."""
+
+    Story = apps.get_model('app', 'Story')
+    Story.objects.update(word_count=models.F('word_count_offset'), version=models.F('version') + 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0009_word_count_history'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scene',
+            name='prose',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='scene',
+            name='word_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='story',
+            name='word_count_offset',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(carry_word_counts, drop_scene_words),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.0.6 on 2026-10-18 19:01
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0010_scene_prose'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Revision',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.PositiveSmallIntegerField(choices=[(1, 'Story'), (2, 'Scene'), (3, 'Character')])),
+                ('object_id', models.PositiveIntegerField()),
+                ('number', models.PositiveIntegerField()),
+                ('base', models.PositiveIntegerField()),
+                ('data', models.BinaryField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('story', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='revisions', to='app.story')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['created_at'], name='revision_time_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='revision',
+            constraint=models.UniqueConstraint(fields=('kind', 'object_id', 'number'), name='revision_object_number_constraint'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.0.6 on 2026-10-18 19:07
+
+import app.models
+import django.db.models.deletion
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0011_revisions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='story',
+            name='graph_version',
+            field=models.PositiveBigIntegerField(default=app.models.initial_version),
+        ),
+        migrations.CreateModel(
+            name='Relationship',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('family', 'Family'), ('friend', 'Friend'), ('ally', 'Ally'), ('rival', 'Rival'), ('enemy', 'Enemy'), ('romance', 'Romance'), ('mentor', 'Mentor'), ('colleague', 'Colleague'), ('other', 'Other')], max_length=30)),
+                ('description', models.CharField(blank=True, default='', max_length=250)),
+                ('source', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='relationships_from', to='app.character')),
+                ('story', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='relationships', to='app.story')),
+                ('target', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='relationships_to', to='app.character')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='relationship',
+            constraint=models.UniqueConstraint(django.db.models.functions.comparison.Least('source', 'target'), django.db.models.functions.comparison.Greatest('source', 'target'), models.F('kind'), name='relationship_pair_kind_constraint', violation_error_message='These characters already have this relationship.'),
+        ),
+        migrations.AddConstraint(
+            model_name='relationship',
+            constraint=models.CheckConstraint(check=models.Q(('source', models.F('target')), _negated=True), name='relationship_two_characters_constraint'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.0.6 on 2026-10-18 19:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0012_relationships'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingPatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.PositiveSmallIntegerField(choices=[(2, 'Scene'), (3, 'Character')])),
+                ('object_id', models.PositiveIntegerField()),
+                ('editor', models.CharField(max_length=100)),
+                ('patch', models.JSONField(default=dict)),
+                ('written_at', models.FloatField(default=0)),
+                ('story', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pending_patches', to='app.story')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='pendingpatch',
+            constraint=models.UniqueConstraint(fields=('kind', 'object_id', 'editor'), name='pending_patch_object_editor_constraint'),
+        ),
+    ]
@@ -1,10 +1,17 @@
-from django.db import models
-from django.db.models import UniqueConstraint
+import time
+
+from django.db import models, transaction
+from django.core.exceptions import ValidationError
+from django.db.models import CheckConstraint, Count, F, OuterRef, Q, Subquery, Sum, UniqueConstraint
+from django.db.models.functions import Coalesce, Greatest, Least
+from django.utils import timezone
 from django.utils.text import slugify
 
 from accounts.models import CustomUser
 
 from .constants import genre_choices, mbti_choices, enneagram_choices
+from .ordering import save_appended
+from .wordcount import count_change
 
 # Length constants
 tiny_length = 30
@@ -13,6 +20,45 @@ mid_length = 250
 long_length = 500
 
 
+def initial_version() -> int:
+    """Start story versions at the creation time, so a reused id never meets an old cached fragment."""
+    return time.time_ns()
+
+
+def story_changed() -> dict:
+    """Column updates that mark a story as changed: the next cache version and the modification time."""
+    return {'version': F('version') + 1, 'date_last_saved': timezone.now()}
+
+
+class StoryQuerySet(models.QuerySet):
+    """Query set for stories, with a repair for the denormalized child counts."""
+
+    def bump_version(self):
+        """Invalidate everything cached for these stories without reading them."""
+
+        return self.update(**story_changed())
+
+    def recount(self):
+        """Recompute the scene, character, plot point and word counts from the child tables.
+
+        The word count is the scene sum on top of the story's word count offset.
+        """
+
+        def count_of(model, story_path, total=Count('pk')):
+            return Coalesce(Subquery(
+                model.objects.filter(**{story_path: OuterRef('pk')})
+                .order_by().values(story_path).annotate(total=total).values('total')
+            ), 0)
+
+        return self.update(
+            word_count=count_of(Scene, 'story', Sum('word_count')) + F('word_count_offset'),
+            scene_count=count_of(Scene, 'story'),
+            character_count=count_of(Character, 'story'),
+            plotpoint_count=count_of(PlotPoint, 'plot__story'),
+            **story_changed()
+        )
+
+
 class Story(models.Model):
     """The story data structure, with characters, plots, worlds, and scenes."""
 
@@ -23,18 +69,41 @@ class Story(models.Model):
 
     genres = models.JSONField(blank=True, default=list)
 
+    # Sum of the scene word counts and the offset, kept in step by app/signals.py
     word_count = models.PositiveIntegerField(default=0)
+    # Words counted by hand before scenes had prose, carried forward on top of the scene sum
+    word_count_offset = models.PositiveIntegerField(default=0, editable=False)
     date_started = models.DateField(auto_now_add=True)
-    date_last_saved = models.DateField(auto_now=True)
+    # Modification time of the story or any of its children, kept with the version
+    date_last_saved = models.DateTimeField(auto_now=True)
     date_finished = models.DateField(null=True)
     slug = models.SlugField(max_length=mid_length, blank=True)
     author = models.ForeignKey(CustomUser, on_delete=models.CASCADE, default=None, related_name='stories')
 
+    # Child counts, kept exact by app/signals.py
+    scene_count = models.PositiveIntegerField(default=0)
+    character_count = models.PositiveIntegerField(default=0)
+    plotpoint_count = models.PositiveIntegerField(default=0)
+
+    # Cache version, bumped by every write to the story or its children
+    version = models.PositiveBigIntegerField(default=initial_version)
+    # Relationship graph version, bumped only by relationship changes, see app/graph.py
+    graph_version = models.PositiveBigIntegerField(default=initial_version)
+
+    # Columns only ever written with F() updates, never from a possibly stale instance
+    derived_fields = ('word_count', 'word_count_offset', 'scene_count', 'character_count', 'plotpoint_count', 'version', 'graph_version')
+
+    objects = StoryQuerySet.as_manager()
+
     class Meta:
         constraints = [
             UniqueConstraint(
                 fields=['author', 'title'],
                 name='author_title_constraint'
+            ),
+            UniqueConstraint(
+                fields=['author', 'slug'],
+                name='author_slug_constraint'
             )
         ]
 
@@ -45,7 +114,22 @@ class Story(models.Model):
     def save(self, *args, **kwargs):
         """Override the save method for the story model."""
         self.slug = slugify(self.title)
+
+        # Leave the derived columns alone when updating an existing story, apart from bumping its version
+        updating = not self._state.adding
+        if updating:
+            if kwargs.get('update_fields') is None:
+                kwargs['update_fields'] = [
+                    field.name for field in self._meta.concrete_fields
+                    if not field.primary_key and field.name not in self.derived_fields
+                ]
+            kwargs['update_fields'] = [*kwargs['update_fields'], 'version']
+            self.version = F('version') + 1
         super(Story, self).save(*args, **kwargs)
+
+        # Defer the bumped version so it is read back only if something asks for it
+        if updating:
+            del self.__dict__['version']
     
 
 class Character(models.Model):
@@ -80,6 +164,14 @@ class Character(models.Model):
     story = models.ForeignKey(Story, on_delete=models.CASCADE, default=None)
     slug = models.SlugField(max_length=mid_length, blank=True)
 
+    class Meta:
+        constraints = [
+            UniqueConstraint(
+                fields=['story', 'slug'],
+                name='story_character_slug_constraint'
+            )
+        ]
+
     def __str__(self):
         """Override string method to display character name."""
         return self.full_name
@@ -98,39 +190,114 @@ class Character(models.Model):
 
     def save(self, *args, **kwargs):
         """Override the save method for the character model."""
-        self.slug = slugify(self.full_name)
+        self.slug = self.unique_slug(slugify(self.full_name))
         super(Character, self).save(*args, **kwargs)
 
+    def unique_slug(self, base_slug: str):
+        """Return a slug that no other character in the same story is using."""
+
+        taken = set(
+            Character.objects.filter(
+                story_id=self.story_id,
+                slug__startswith=base_slug
+            ).exclude(pk=self.pk).values_list('slug', flat=True)
+        )
+
+        slug = base_slug
+        suffix = 2
+        while slug in taken:
+            slug = f"{base_slug}-{suffix}"
+            suffix += 1
+        return slug
+
 
 class Scene(models.Model):
     """A single unit or building block of a story."""
 
     title = models.CharField(max_length=short_length, null=False)
     description = models.TextField(max_length=long_length, null=True)
-    notes = models.JSONField(blank=True, default=list)
+
+    # The scene's draft, and its word count as of the last save
+    prose = models.TextField(blank=True, default='')
+    word_count = models.PositiveIntegerField(default=0, editable=False)
 
     # Relationships: One story and one possible plot point, one or more characters
     story = models.ForeignKey(Story, on_delete=models.CASCADE, default=None)
     plotpoint = models.ForeignKey('PlotPoint', on_delete=models.SET_DEFAULT, default=None, blank=True, null=True)
     characters = models.ManyToManyField(Character, blank=True)
 
-    # Order in display list
-    order = models.SmallIntegerField(default=1, blank=True)
+    # Sparse sort key in the display list, see app/ordering.py
+    order = models.IntegerField(default=1, blank=True)
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(
+                fields=['story', 'order'],
+                name='story_scene_order_constraint'
+            )
+        ]
+        ordering = ['order']
 
     def __str__(self):
         """Override the string method for the Scene object."""
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Remember the prose as loaded, to count only what a save changes."""
+
+        scene = super().from_db(db, field_names, values)
+        scene.saved_prose = scene.__dict__.get('prose')
+        scene.saved_word_count = scene.__dict__.get('word_count')
+        return scene
+
     def save(self, *args, **kwargs):
-        """Override the save method for the scene model."""
+        """Override the save method for the scene model.
+
+        The word count is updated from the part of the prose that changed
+        since it was loaded, and app/signals.py adds the difference to the
+        story in the same transaction.
+        """
+
+        update_fields = kwargs.get('update_fields')
+        with transaction.atomic():
+            self.word_count_change = 0
+            if update_fields is None or 'prose' in update_fields:
+                saved_prose, saved_word_count = self.saved_text()
+                self.word_count_change = count_change(saved_prose, self.prose)
+                self.word_count = saved_word_count + self.word_count_change
+                if update_fields is not None:
+                    kwargs['update_fields'] = {*update_fields, 'word_count'}
+            if not self.id:
+                save_appended(self, Scene.objects.filter(story=self.story), super().save, *args, **kwargs)
+            else:
+                super().save(*args, **kwargs)
+
+        self.saved_prose, self.saved_word_count = self.prose, self.word_count
+
+    def saved_text(self) -> tuple:
+        """Return the stored prose and word count, read again only if they were not loaded."""
+
+        if self._state.adding:
+            return '', 0
+        if getattr(self, 'saved_prose', None) is None or getattr(self, 'saved_word_count', None) is None:
+            return Scene.objects.filter(pk=self.pk).values_list('prose', 'word_count').get()
+        return self.saved_prose, self.saved_word_count
+
+
+class SceneNote(models.Model):
+    """A note on a scene, one row per note so adding a note is a single insert."""
+
+    scene = models.ForeignKey(Scene, on_delete=models.CASCADE)
+    text = models.TextField(max_length=long_length)
+    created_at = models.DateTimeField(auto_now_add=True)
 
-        if not self.id:
-            prev_scene = Scene.objects.filter(
-                story=self.story
-            ).order_by('-order').first()
-            if prev_scene:
-                self.order = prev_scene.order + 1
-        super().save(*args, **kwargs)
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self):
+        """Override the string method for the SceneNote object."""
+        return self.text
 
 
 class Plot(models.Model):
@@ -154,8 +321,17 @@ class PlotPoint(models.Model):
     # Relationships: One plot
     plot = models.ForeignKey(Plot, on_delete=models.CASCADE, default=None)
 
-    # Order in display list
-    order = models.SmallIntegerField(default=1, blank=True)
+    # Sparse sort key in the display list, see app/ordering.py
+    order = models.IntegerField(default=1, blank=True)
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(
+                fields=['plot', 'order'],
+                name='plot_plotpoint_order_constraint'
+            )
+        ]
+        ordering = ['order']
 
     def __str__(self):
         """Override the string method for the PlotPoint object."""
@@ -165,12 +341,181 @@ class PlotPoint(models.Model):
         """Override the save method for the plot point model."""
 
         if not self.id:
-            prev_point = PlotPoint.objects.filter(
-                plot=self.plot
-            ).order_by('-order').first()
-            if prev_point:
-                self.order = prev_point.order + 1
-        super().save(*args, **kwargs)
+            save_appended(self, PlotPoint.objects.filter(plot=self.plot), super().save, *args, **kwargs)
+        else:
+            super().save(*args, **kwargs)
+
+
+class WordCountEvent(models.Model):
+    """One word count update of a story, appended and never changed.
+
+    Raw events are kept for `WORD_COUNT_RAW_DAYS` days; the daily rollups
+    written with them are what the stats read.
+    """
+
+    story = models.ForeignKey(Story, on_delete=models.CASCADE, related_name='word_count_events')
+    recorded_at = models.DateTimeField(default=timezone.now)
+    word_count = models.PositiveIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['story', 'recorded_at'], name='wordcount_story_time_idx'),
+            models.Index(fields=['recorded_at'], name='wordcount_time_idx'),
+        ]
+
+
+class WordCountRollup(models.Model):
+    """The net words written on a story in one day or one week, and its word count at the end of it."""
+
+    DAY = 'day'
+    WEEK = 'week'
+    period_choices = [(DAY, 'Day'), (WEEK, 'Week')]
+
+    story = models.ForeignKey(Story, on_delete=models.CASCADE, related_name='word_count_rollups')
+    period = models.CharField(max_length=4, choices=period_choices)
+    # The day, or the Monday of the week
+    start = models.DateField()
+    words = models.IntegerField(default=0)
+    updates = models.PositiveIntegerField(default=0)
+    word_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(
+                fields=['story', 'period', 'start'],
+                name='story_period_start_constraint'
+            )
+        ]
+
+
+class Revision(models.Model):
+    """One saved version of a story, scene or character, see app/revisions.py.
+
+    A snapshot holds the whole text of the object; any other revision holds
+    the change from the revision before it. `base` is the number of the
+    snapshot its chain of changes starts from, and equals `number` for a
+    snapshot.
+    """
+
+    STORY = 1
+    SCENE = 2
+    CHARACTER = 3
+    kind_choices = [(STORY, 'Story'), (SCENE, 'Scene'), (CHARACTER, 'Character')]
+
+    story = models.ForeignKey(Story, on_delete=models.CASCADE, related_name='revisions')
+    kind = models.PositiveSmallIntegerField(choices=kind_choices)
+    object_id = models.PositiveIntegerField()
+    number = models.PositiveIntegerField()
+    base = models.PositiveIntegerField()
+    # zlib-compressed JSON, the full fields of a snapshot or the change of a delta
+    data = models.BinaryField()
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(
+                fields=['kind', 'object_id', 'number'],
+                name='revision_object_number_constraint'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['created_at'], name='revision_time_idx'),
+        ]
+
+    def __str__(self):
+        """Override the string method for the Revision object."""
+        return f"{self.get_kind_display()} {self.object_id} revision {self.number}"
+
+    @property
+    def is_snapshot(self) -> bool:
+        return self.base == self.number
+
+
+class PendingPatch(models.Model):
+    """The autosaved fields of a scene or character one editor has sent but that are not written yet, see app/autosave.py."""
+
+    SCENE = 2
+    CHARACTER = 3
+    kind_choices = [(SCENE, 'Scene'), (CHARACTER, 'Character')]
+
+    story = models.ForeignKey(Story, on_delete=models.CASCADE, related_name='pending_patches')
+    kind = models.PositiveSmallIntegerField(choices=kind_choices)
+    object_id = models.PositiveIntegerField()
+    # The editor's session key, or user ID without a session
+    editor = models.CharField(max_length=short_length)
+    # Form field values by field name
+    patch = models.JSONField(default=dict)
+    # Unix time the editor's patches to the object were last written, 0 if never
+    written_at = models.FloatField(default=0)
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(
+                fields=['kind', 'object_id', 'editor'],
+                name='pending_patch_object_editor_constraint'
+            )
+        ]
+
+    def __str__(self):
+        """Override the string method for the PendingPatch object."""
+        return f"{self.get_kind_display()} {self.object_id} pending for {self.editor}"
+
+
+class Relationship(models.Model):
+    """A relationship between two characters of the same story, see app/graph.py.
+
+    The graph queries walk relationships both ways; `source` and `target`
+    only keep the direction of kinds that have one, such as a mentor.
+    """
+
+    kind_choices = [
+        ('family', 'Family'),
+        ('friend', 'Friend'),
+        ('ally', 'Ally'),
+        ('rival', 'Rival'),
+        ('enemy', 'Enemy'),
+        ('romance', 'Romance'),
+        ('mentor', 'Mentor'),
+        ('colleague', 'Colleague'),
+        ('other', 'Other'),
+    ]
+
+    story = models.ForeignKey(Story, on_delete=models.CASCADE, related_name='relationships')
+    source = models.ForeignKey(Character, on_delete=models.CASCADE, related_name='relationships_from')
+    target = models.ForeignKey(Character, on_delete=models.CASCADE, related_name='relationships_to')
+    kind = models.CharField(max_length=tiny_length, choices=kind_choices)
+    description = models.CharField(max_length=mid_length, blank=True, default='')
+
+    class Meta:
+        constraints = [
+            # Relationships are walked both ways, so the reverse pair counts as the same relationship
+            UniqueConstraint(
+                Least('source', 'target'), Greatest('source', 'target'), 'kind',
+                name='relationship_pair_kind_constraint',
+                violation_error_message='These characters already have this relationship.'
+            ),
+            CheckConstraint(
+                check=~Q(source=F('target')),
+                name='relationship_two_characters_constraint'
+            )
+        ]
+
+    def __str__(self):
+        """Override the string method for the Relationship object."""
+        return f"{self.source_id} {self.kind} {self.target_id}"
+
+    def clean(self):
+        """Require two different characters of the relationship's story."""
+        super().clean()
+
+        if self.source_id is None or self.target_id is None:
+            return
+        if self.source_id == self.target_id:
+            raise ValidationError('A character cannot be related to themselves.')
+
+        stories = set(Character.objects.filter(pk__in=[self.source_id, self.target_id]).values_list('story_id', flat=True))
+        if stories != {self.story_id}:
+            raise ValidationError('Both characters must belong to the story.')
 
 
 class World(models.Model):
@@ -0,0 +1,156 @@
+"""Sparse display ordering for scenes and plot points.
+
+The `order` column of a scene or plot point is a sort key, not a position.
+Keys are spaced `ORDER_GAP` apart so that an insert or a move only has to
+write the moved row, and a delete leaves its neighbours untouched. URLs keep
+using the dense 1..n position, which is resolved against the sort keys.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F, QuerySet
+
+# Distance between neighbouring sort keys after an append or a rebalance
+ORDER_GAP = 1024
+
+
+def next_order(siblings: QuerySet) -> int:
+    """Return the sort key for a new item appended after all of its siblings."""
+
+    last_order = siblings.order_by('-order').values_list('order', flat=True).first()
+    return (last_order or 0) + ORDER_GAP
+
+
+def save_appended(item, siblings: QuerySet, save, *args, **kwargs):
+    """Insert a new item after all of its siblings by calling `save`.
+
+    Two appends at once can both read the same last sort key. The one that
+    then collides with the unique order constraint retries once with a
+    fresh key, like `move_to_position` retries after a rebalance.
+    """
+
+    for attempt in range(2):
+        item.order = next_order(siblings)
+        try:
+            with transaction.atomic():
+                return save(*args, **kwargs)
+        except IntegrityError:
+            if attempt:
+                raise
+
+
+def order_between(before, after):
+    """Return a sort key strictly between two neighbours, or None if there is no room."""
+
+    low = before if before is not None else 0
+    if after is None:
+        return low + ORDER_GAP
+    if after - low < 2:
+        return None
+    return (low + after) // 2
+
+
+def get_at_position(siblings: QuerySet, position: int):
+    """Get the item at a 1-based display position, or None if there is no such item."""
+
+    if position < 1:
+        return None
+
+    item = siblings.order_by('order')[position - 1:position].first()
+    if item:
+        item.position = position
+    return item
+
+
+async def aget_at_position(siblings: QuerySet, position: int):
+    """Async version of `get_at_position`."""
+
+    if position < 1:
+        return None
+
+    item = await siblings.order_by('order')[position - 1:position].afirst()
+    if item:
+        item.position = position
+    return item
+
+
+def position_of(item, siblings: QuerySet) -> int:
+    """Return the 1-based display position of an item among its siblings."""
+
+    return siblings.filter(order__lt=item.order).count() + 1
+
+
+def move_to_position(item, siblings: QuerySet, position: int):
+    """Move an item to a 1-based display position, writing only that item.
+
+    The whole list is rebalanced only when the neighbouring keys have run
+    out of room between them.
+    """
+
+    others = siblings.exclude(pk=item.pk).order_by('order')
+
+    with transaction.atomic():
+        for attempt in range(2):
+            index = max(position - 1, 0)
+            neighbours = list(others.values_list('order', flat=True)[max(index - 1, 0):index + 1])
+
+            # Moving to the top has no item before it; past the end has none after it
+            if index == 0:
+                before, after = None, (neighbours[0] if neighbours else None)
+            else:
+                before = neighbours[0] if neighbours else None
+                after = neighbours[1] if len(neighbours) > 1 else None
+                if before is None:
+                    before = others.order_by('-order').values_list('order', flat=True).first()
+
+            # Already between its new neighbours
+            if (before is None or before < item.order) and (after is None or item.order < after):
+                return item
+
+            new_order = order_between(before, after)
+            if new_order is not None:
+                break
+            rebalance(siblings)
+            item.refresh_from_db(fields=['order'])
+
+        type(item).objects.filter(pk=item.pk).update(order=new_order)
+
+    item.order = new_order
+    return item
+
+
+def rebalance(siblings: QuerySet) -> int:
+    """Respace the sort keys of a list to `ORDER_GAP` intervals, keeping their order.
+
+    Returns the number of rows rewritten.
+    """
+
+    items = list(siblings.order_by('order').only('id', 'order'))
+    return apply_ordering(siblings, items)
+
+
+def apply_ordering(siblings: QuerySet, items: list) -> int:
+    """Give a full list of siblings evenly spaced sort keys in the given order.
+
+    `items` must hold every item in `siblings`. Returns the number of rows rewritten.
+    """
+
+    if not items:
+        return 0
+
+    model = type(items[0])
+    with transaction.atomic():
+        # Park the rows on negative keys so the unique order constraint can't collide
+        siblings.update(order=-F('order'))
+        for index, item in enumerate(items, start=1):
+            item.order = index * ORDER_GAP
+        model.objects.bulk_update(items, ['order'], batch_size=500)
+
+    return len(items)
+
+
+def smallest_gap(siblings: QuerySet):
+    """Return the smallest distance between neighbouring sort keys, or None for short lists."""
+
+    orders = list(siblings.order_by('order').values_list('order', flat=True))
+    if len(orders) < 2:
+        return None
+    return min(after - before for before, after in zip(orders, orders[1:]))
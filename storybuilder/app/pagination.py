@@ -0,0 +1,169 @@
+"""Keyset pagination for the list pages.
+
+A page is found from the sort key of the item next to it rather than from an
+offset, so any page costs one indexed range query however deep it is. The
+next and previous cursors are signed, and carry the key and 1-based position
+of the item at the page edge along with a version of the list. Numbered
+lists keep their numbers without counting rows as long as the version still
+matches; after a change the position is counted once.
+"""
+from functools import cached_property
+
+from django.core import signing
+from django.core.paginator import Paginator
+
+SALT = 'app.pagination'
+
+
+class KeysetPage:
+    """One page of a query set ordered by a unique key.
+
+    The page is read lazily, on first use of its items or cursors, so a page
+    inside a cached fragment costs nothing on a cache hit. Async views call
+    `aload()` first instead, as templates cannot query from the event loop.
+    """
+
+    def __init__(self, queryset, key: str, cursor: str = None, per_page: int = 50, version=None):
+        self.queryset = queryset
+        self.key = key
+        self.per_page = per_page
+        self.version = version
+        self.cursor = self.load(cursor)
+
+    @staticmethod
+    def load(cursor):
+        """Decode a cursor from a URL, or None if it is missing, tampered with or malformed."""
+
+        if not cursor:
+            return None
+        try:
+            data = signing.loads(cursor, salt=SALT)
+        except signing.BadSignature:
+            return None
+        if not isinstance(data, dict) or data.get('d') not in ('after', 'before') or 'k' not in data or not isinstance(data.get('p'), int):
+            return None
+        return data
+
+    def dump(self, direction: str, item, position: int) -> str:
+        return signing.dumps({'d': direction, 'k': getattr(item, self.key), 'p': position, 'v': self.version}, salt=SALT)
+
+    def cursor_rows(self):
+        """The rows on the cursor's side of it, nearest first, plus one to see if there are more."""
+
+        if self.cursor['d'] == 'after':
+            return self.queryset.filter(**{f"{self.key}__gt": self.cursor['k']}).order_by(self.key)[:self.per_page + 1]
+        return self.queryset.filter(**{f"{self.key}__lt": self.cursor['k']}).order_by(f"-{self.key}")[:self.per_page + 1]
+
+    def first_rows(self):
+        return self.queryset.order_by(self.key)[:self.per_page + 1]
+
+    def rows_before(self, item):
+        return self.queryset.filter(**{f"{self.key}__lt": getattr(item, self.key)})
+
+    def cursor_window(self, rows: list):
+        """Arrange the rows read from a cursor into (items, has_previous, has_next, start)."""
+
+        per_page = self.per_page
+        if self.cursor['d'] == 'after':
+            return rows[:per_page], True, len(rows) > per_page, self.cursor['p'] + 1
+        items = rows[:per_page][::-1]
+        return items, len(rows) > per_page, True, self.cursor['p'] - len(items)
+
+    def recount(self, start: int) -> bool:
+        """Whether the position carried by the cursor can no longer be trusted."""
+        return self.cursor.get('v') != self.version or start < 1
+
+    @cached_property
+    def window(self):
+        """Read the page: its items, whether there are pages before and after it, and its first position."""
+
+        if self.cursor is not None:
+            items, has_previous, has_next, start = self.cursor_window(list(self.cursor_rows()))
+            if items:
+                if self.recount(start):
+                    start = self.rows_before(items[0]).count() + 1
+                return items, has_previous, has_next, start
+
+        # No cursor, or nothing left on its side: start from the top
+        rows = list(self.first_rows())
+        return rows[:self.per_page], False, len(rows) > self.per_page, 1
+
+    async def aload(self):
+        """Read the page with the async ORM, so it can be used on the event loop without queries."""
+
+        if 'window' in self.__dict__:
+            return self
+
+        window = None
+        if self.cursor is not None:
+            items, has_previous, has_next, start = self.cursor_window([row async for row in self.cursor_rows()])
+            if items:
+                if self.recount(start):
+                    start = await self.rows_before(items[0]).acount() + 1
+                window = items, has_previous, has_next, start
+
+        if window is None:
+            rows = [row async for row in self.first_rows()]
+            window = rows[:self.per_page], False, len(rows) > self.per_page, 1
+
+        self.__dict__['window'] = window
+        return self
+
+    @property
+    def items(self) -> list:
+        return self.window[0]
+
+    @property
+    def has_previous(self) -> bool:
+        return self.window[1]
+
+    @property
+    def has_next(self) -> bool:
+        return self.window[2]
+
+    @property
+    def offset(self) -> int:
+        """The number of items before this page, for numbering its items."""
+        return self.window[3] - 1
+
+    @property
+    def start(self) -> int:
+        return self.offset + 1
+
+    @property
+    def end(self) -> int:
+        return self.offset + len(self.items)
+
+    @property
+    def previous_cursor(self):
+        if self.has_previous and self.items:
+            return self.dump('before', self.items[0], self.start)
+        return None
+
+    @property
+    def next_cursor(self):
+        if self.has_next and self.items:
+            return self.dump('after', self.items[-1], self.end)
+        return None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+
+async def aget_page(queryset, per_page: int, number):
+    """Read a page of a `Paginator` with the async ORM, returning a page that needs no queries.
+
+    Like `Paginator.get_page`, an out of range number gives the last page.
+    """
+
+    paginator = Paginator(queryset, per_page)
+    paginator.count = await queryset.acount()
+    page = paginator.get_page(number)
+    page.object_list = [item async for item in page.object_list]
+    return page
@@ -0,0 +1,156 @@
+"""Writing progress: a word count time series per story, with daily and weekly rollups.
+
+Every change to a story's word count, made by saving the prose of one of its
+scenes, appends a raw `WordCountEvent` and, in the same transaction, adds
+its words to the story's `WordCountRollup` for the day. The stats are read
+from the rollups alone. `compact` later drops raw events past
+`WORD_COUNT_RAW_DAYS` and folds daily rollups older than
+`WORD_COUNT_DAILY_DAYS` into weekly ones, so the tables stay small.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import Story, WordCountEvent, WordCountRollup, story_changed
+
+# Days shown by the stats unless asked otherwise
+STATS_DAYS = 30
+
+
+def week_start(day):
+    """The Monday of a day's week."""
+    return day - timedelta(days=day.weekday())
+
+
+def record_words(story_id: int, words: int, recorded_at=None, **changes) -> WordCountEvent:
+    """Add `words` (negative for cuts) to a story's word count and to its time series.
+
+    Extra column `changes` are applied to the story in the same update.
+    """
+
+    recorded_at = recorded_at or timezone.now()
+    day = timezone.localdate(recorded_at)
+    stories = Story.objects.filter(pk=story_id)
+
+    with transaction.atomic():
+        stories.update(word_count=F('word_count') + words, **changes, **story_changed())
+        word_count = stories.values_list('word_count', flat=True).get()
+
+        event = WordCountEvent.objects.create(story_id=story_id, recorded_at=recorded_at, word_count=word_count)
+        rollup_changes = {'words': F('words') + words, 'updates': F('updates') + 1, 'word_count': word_count}
+        if not WordCountRollup.objects.filter(story_id=story_id, period=WordCountRollup.DAY, start=day).update(**rollup_changes):
+            WordCountRollup.objects.create(
+                story_id=story_id, period=WordCountRollup.DAY, start=day,
+                words=words, updates=1, word_count=word_count
+            )
+
+    return event
+
+
+def compact(raw_days: int = None, daily_days: int = None, today=None) -> dict:
+    """Drop old raw events and fold old daily rollups into weekly ones.
+
+    Only whole weeks are folded, so a week is never split between daily and
+    weekly rows. Returns the number of events deleted and of daily rollups
+    folded.
+    """
+
+    raw_days = settings.WORD_COUNT_RAW_DAYS if raw_days is None else raw_days
+    daily_days = settings.WORD_COUNT_DAILY_DAYS if daily_days is None else daily_days
+    today = today or timezone.localdate()
+
+    with transaction.atomic():
+        raw_cutoff = timezone.now() - timedelta(days=raw_days)
+        events, _ = WordCountEvent.objects.filter(recorded_at__lt=raw_cutoff).delete()
+
+        daily = WordCountRollup.objects.filter(period=WordCountRollup.DAY, start__lt=week_start(today - timedelta(days=daily_days)))
+        weeks = {}
+        for rollup in daily.order_by('story_id', 'start').iterator():
+            week = weeks.setdefault((rollup.story_id, week_start(rollup.start)), [0, 0, 0])
+            week[0] += rollup.words
+            week[1] += rollup.updates
+            week[2] = rollup.word_count
+
+        existing = {
+            (rollup.story_id, rollup.start): rollup
+            for rollup in WordCountRollup.objects.filter(
+                period=WordCountRollup.WEEK,
+                story_id__in={story_id for story_id, _ in weeks},
+                start__in={start for _, start in weeks}
+            )
+        }
+        created, updated = [], []
+        for (story_id, start), (words, updates, word_count) in weeks.items():
+            rollup = existing.get((story_id, start))
+            if rollup:
+                rollup.words += words
+                rollup.updates += updates
+                rollup.word_count = word_count
+                updated.append(rollup)
+            else:
+                created.append(WordCountRollup(
+                    story_id=story_id, period=WordCountRollup.WEEK, start=start,
+                    words=words, updates=updates, word_count=word_count
+                ))
+        WordCountRollup.objects.bulk_create(created)
+        WordCountRollup.objects.bulk_update(updated, ['words', 'updates', 'word_count'])
+        folded, _ = daily.delete()
+
+    return {'events': events, 'daily': folded}
+
+
+def streaks(active_days: list, today) -> tuple:
+    """Return the current and longest runs of consecutive days in a sorted list of days.
+
+    The current streak still counts if nothing has been written yet today.
+    """
+
+    longest = run = 0
+    previous = None
+    for day in active_days:
+        run = run + 1 if previous and day - previous == timedelta(days=1) else 1
+        longest = max(longest, run)
+        previous = day
+
+    current = run if previous and today - previous <= timedelta(days=1) else 0
+    return current, longest
+
+
+def writing_stats(author_id: int, days: int = STATS_DAYS, today=None) -> dict:
+    """Summarize an author's writing across all of their stories from the rollups.
+
+    Returns the words written on each of the last `days` days, the current
+    and longest streaks of days with words written, and totals. Streaks only
+    reach back as far as the daily rollups do.
+    """
+
+    today = today or timezone.localdate()
+    rollups = WordCountRollup.objects.filter(story__author_id=author_id)
+
+    per_day = dict(
+        rollups.filter(period=WordCountRollup.DAY)
+        .values('start').annotate(total=Sum('words')).order_by('start')
+        .values_list('start', 'total')
+    )
+    weekly = rollups.filter(period=WordCountRollup.WEEK).aggregate(total=Sum('words'))['total'] or 0
+    word_count = Story.objects.filter(author_id=author_id).aggregate(total=Sum('word_count'))['total'] or 0
+
+    window = [today - timedelta(days=offset) for offset in range(days - 1, -1, -1)]
+    current, longest = streaks([day for day, words in per_day.items() if words > 0], today)
+    monday = week_start(today)
+
+    return {
+        'days': [{'date': day, 'words': per_day.get(day, 0)} for day in window],
+        'streak': {'current': current, 'longest': longest},
+        'totals': {
+            'today': per_day.get(today, 0),
+            'week': sum(words for day, words in per_day.items() if day >= monday),
+            'window': sum(per_day.get(day, 0) for day in window),
+            'all_time': sum(per_day.values()) + weekly,
+            'active_days': sum(1 for day in window if per_day.get(day, 0) > 0),
+            'word_count': word_count,
+        },
+    }
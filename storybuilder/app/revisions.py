@@ -0,0 +1,218 @@
+"""Revision history of stories, scenes and characters, as periodic snapshots and deltas.
+
+Each save that changes the text of a story, scene or character appends a
+`Revision`. Most revisions are deltas: for every changed text field, the
+span that differs from the revision before it and the text that replaced
+it, so a revision costs about as much as the edit did. Every
+`REVISION_SNAPSHOT_INTERVAL` revisions, or when a delta would be nearly as
+large as the text, a full snapshot starts a new chain. Showing any revision
+replays at most one snapshot and the deltas after it, all read in a single
+query.
+
+`compact` applies the retention policy: the latest `REVISION_KEEP`
+revisions of every object and everything newer than `REVISION_KEEP_DAYS`
+are kept, and the oldest kept revision is turned into a snapshot when the
+revisions its chain started from are deleted.
+"""
+import json
+import zlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from .export import CHARACTER_FIELDS
+from .models import Story, Scene, Character, Revision
+from .wordcount import common_prefix_length, common_suffix_length
+
+KINDS = {Story: Revision.STORY, Scene: Revision.SCENE, Character: Revision.CHARACTER}
+
+# Fields whose history is kept, per model
+TRACKED_FIELDS = {
+    Story: ['title', 'description', 'premise', 'genres'],
+    Scene: ['title', 'description', 'prose'],
+    Character: ['first_name', 'middle_name', 'last_name', 'full_name'] + [name for _, name in CHARACTER_FIELDS] + [
+        'description', 'personality_traits'
+    ],
+}
+
+# A delta at least this fraction of the full text is stored as a snapshot instead
+SNAPSHOT_RATIO = 0.5
+
+
+def dumps(value) -> str:
+    return json.dumps(value, separators=(',', ':'))
+
+
+def encode(value) -> bytes:
+    return zlib.compress(dumps(value).encode())
+
+
+def decode(data) -> dict:
+    return json.loads(zlib.decompress(bytes(data)))
+
+
+def fields_of(instance) -> dict:
+    """The tracked fields of a story, scene or character."""
+
+    return {field: getattr(instance, field) for field in TRACKED_FIELDS[type(instance)]}
+
+
+def diff(old: dict, new: dict) -> dict:
+    """Return the change from one set of fields to another.
+
+    A changed text field maps to [start, end, text]: the characters from
+    `start` to `end` of the old text were replaced by `text`. Any other
+    changed field maps to [value].
+    """
+
+    delta = {}
+    for field, value in new.items():
+        before = old.get(field)
+        if value == before:
+            continue
+        if isinstance(value, str) and isinstance(before, str):
+            start = common_prefix_length(before, value)
+            suffix = common_suffix_length(before, value, min(len(before), len(value)) - start)
+            delta[field] = [start, len(before) - suffix, value[start:len(value) - suffix]]
+        else:
+            delta[field] = [value]
+    return delta
+
+
+def patch(fields: dict, delta: dict) -> dict:
+    """Apply a change made by `diff` to a set of fields."""
+
+    fields = dict(fields)
+    for field, change in delta.items():
+        if len(change) == 3:
+            start, end, text = change
+            fields[field] = fields[field][:start] + text + fields[field][end:]
+        else:
+            fields[field] = change[0]
+    return fields
+
+
+def revisions_of(instance):
+    """The revisions of a story, scene or character."""
+
+    return Revision.objects.filter(kind=KINDS[type(instance)], object_id=instance.pk)
+
+
+def chain_to(revisions, number: int = None) -> list:
+    """Return the snapshot and deltas that rebuild a revision, oldest first, or [] if there is no such revision.
+
+    The chain is never longer than the snapshot interval, so it comes back
+    from one query unless the interval was shortened since it was written.
+    """
+
+    rows = revisions if number is None else revisions.filter(number__lte=number)
+    rows = list(rows.order_by('-number')[:settings.REVISION_SNAPSHOT_INTERVAL])
+    if not rows or (number is not None and rows[0].number != number):
+        return []
+
+    base = rows[0].base
+    if rows[-1].number > base:
+        rows = list(revisions.filter(number__gte=base, number__lte=rows[0].number).order_by('-number'))
+    return [row for row in reversed(rows) if row.number >= base]
+
+
+def replay(chain: list) -> dict:
+    """Rebuild the fields of the last revision in a chain."""
+
+    fields = decode(chain[0].data)
+    for revision in chain[1:]:
+        fields = patch(fields, decode(revision.data))
+    return fields
+
+
+def fields_at(revisions, number: int):
+    """Return the fields of a revision, or None if there is no such revision."""
+
+    chain = chain_to(revisions, number)
+    return replay(chain) if chain else None
+
+
+def record(instance, created_at=None):
+    """Add a revision for a saved story, scene or character, if its tracked fields changed.
+
+    Returns the new revision, or None if nothing changed.
+    """
+
+    revisions = revisions_of(instance)
+    fields = fields_of(instance)
+    story_id = instance.pk if isinstance(instance, Story) else instance.story_id
+
+    with transaction.atomic():
+        chain = chain_to(revisions)
+        if not chain:
+            number = base = 1
+            data = encode(fields)
+        else:
+            latest = chain[-1]
+            delta = diff(replay(chain), fields)
+            if not delta:
+                return None
+
+            number = latest.number + 1
+            delta_text, fields_text = dumps(delta), dumps(fields)
+            if number - latest.base >= settings.REVISION_SNAPSHOT_INTERVAL or len(delta_text) >= len(fields_text) * SNAPSHOT_RATIO:
+                base, data = number, zlib.compress(fields_text.encode())
+            else:
+                base, data = latest.base, zlib.compress(delta_text.encode())
+
+        return Revision.objects.create(
+            story_id=story_id, kind=KINDS[type(instance)], object_id=instance.pk,
+            number=number, base=base, data=data, created_at=created_at or timezone.now()
+        )
+
+
+def compact(keep: int = None, keep_days: int = None, now=None) -> dict:
+    """Delete revisions past the retention policy, rebasing chains that lose their snapshot.
+
+    A revision is kept if it is one of the latest `keep` of its object or
+    newer than `keep_days` days. Returns the number of revisions deleted and
+    of revisions turned into snapshots.
+    """
+
+    # The latest revision is always kept, so new revisions carry on from it
+    keep = max(settings.REVISION_KEEP if keep is None else keep, 1)
+    keep_days = settings.REVISION_KEEP_DAYS if keep_days is None else keep_days
+    cutoff_time = (now or timezone.now()) - timedelta(days=keep_days)
+
+    deleted = rebased = 0
+    objects = (
+        Revision.objects.values('kind', 'object_id')
+        .annotate(revisions=Count('pk'), latest=Max('number'))
+        .filter(revisions__gt=keep)
+        .order_by()
+    )
+    for item in list(objects):
+        revisions = Revision.objects.filter(kind=item['kind'], object_id=item['object_id'])
+        last_old = revisions.filter(
+            number__lte=item['latest'] - keep, created_at__lt=cutoff_time
+        ).aggregate(last=Max('number'))['last']
+        if last_old is None:
+            continue
+        first_kept = revisions.filter(number__gt=last_old).order_by('number').values_list('number', flat=True).first()
+
+        with transaction.atomic():
+            revision = revisions.get(number=first_kept)
+            if not revision.is_snapshot:
+                revision.data = encode(fields_at(revisions, first_kept))
+                revision.base = first_kept
+                revision.save(update_fields=['data', 'base'])
+                revisions.filter(number__gt=first_kept, base__lt=first_kept).update(base=first_kept)
+                rebased += 1
+            count, _ = revisions.filter(number__lt=first_kept).delete()
+            deleted += count
+
+    return {'deleted': deleted, 'rebased': rebased}
+
+
+def forget(instance):
+    """Delete the revisions of a deleted scene or character."""
+
+    revisions_of(instance).delete()
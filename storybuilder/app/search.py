@@ -0,0 +1,301 @@
+"""Full-text search over stories, scenes, scene notes and characters with an SQLite FTS5 index.
+
+Every indexed object is one row of the `app_search` virtual table. The
+author is stored as an indexed token (``a<id>``), so scoping a query to
+one author is part of the full-text match rather than a scan. Row ids encode
+the object, ``id * 4 + kind``, so keeping the index in sync on save and
+delete touches exactly one row. Notes are rows of their own, written
+straight from the note table, so adding a note never reads its scene.
+Other database backends have no index and searches return nothing.
+"""
+import re
+
+from django.db import connection, transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.urls import reverse
+from django.utils.html import escape
+
+from .models import Story, Scene, SceneNote, Character
+
+TABLE = 'app_search'
+KINDS = {SceneNote: 0, Story: 1, Scene: 2, Character: 3}
+KIND_NAMES = {0: 'note', 1: 'story', 2: 'scene', 3: 'character'}
+
+# Column weights for bm25(): author, title, body
+WEIGHTS = (0.0, 10.0, 1.0)
+
+# Highlight markers, swapped for <mark> tags after escaping the snippet
+MARK_START, MARK_END = '\x02', '\x03'
+
+INSERT_SQL = f"INSERT INTO {TABLE} (rowid, author, title, body, kind, object_id, story_id) VALUES (%s, %s, %s, %s, %s, %s, %s)"
+DELETE_SQL = f"DELETE FROM {TABLE} WHERE rowid = %s"
+
+# Note rows take the scene's ID as their object, so hits link to the scene page
+NOTE_INSERT_SQL = f"""
+    INSERT INTO {TABLE} (rowid, author, title, body, kind, object_id, story_id)
+    SELECT %s * 4, 'a' || app_story.author_id, '', %s, 0, app_scene.id, app_scene.story_id
+    FROM app_scene JOIN app_story ON app_story.id = app_scene.story_id
+    WHERE app_scene.id = %s
+"""
+
+
+def available() -> bool:
+    """Check whether the database supports the search index."""
+    return connection.vendor == 'sqlite'
+
+
+def row_id(kind: int, object_id: int) -> int:
+    return object_id * 4 + kind
+
+
+def author_token(author_id: int) -> str:
+    return f"a{author_id}"
+
+
+def story_row(story_id, author_id, title, description):
+    return (row_id(1, story_id), author_token(author_id), title, description or '', 1, story_id, story_id)
+
+
+def scene_row(scene_id, story_id, author_id, title, description, prose):
+    # The prose follows the description in the body, so a snippet can come from either
+    body = '\n\n'.join(text for text in (description, prose) if text)
+    return (row_id(2, scene_id), author_token(author_id), title, body, 2, scene_id, story_id)
+
+
+def note_row(note_id, scene_id, story_id, author_id, text):
+    return (row_id(0, note_id), author_token(author_id), '', text, 0, scene_id, story_id)
+
+
+def character_row(character_id, story_id, author_id, full_name, description):
+    return (row_id(3, character_id), author_token(author_id), full_name or '', description or '', 3, character_id, story_id)
+
+
+def write_rows(rows: list):
+    """Insert or replace index rows."""
+
+    with connection.cursor() as cursor:
+        cursor.executemany(DELETE_SQL, [(row[0],) for row in rows])
+        cursor.executemany(INSERT_SQL, rows)
+
+
+def index(instance, created: bool = False):
+    """Add or refresh the index row of a story, scene, scene note or character."""
+
+    if not available():
+        return
+
+    if isinstance(instance, SceneNote):
+        with connection.cursor() as cursor:
+            if not created:
+                cursor.execute(DELETE_SQL, [row_id(0, instance.id)])
+            cursor.execute(NOTE_INSERT_SQL, [instance.id, instance.text, instance.scene_id])
+        return
+
+    if isinstance(instance, Story):
+        row = story_row(instance.id, instance.author_id, instance.title, instance.description)
+    else:
+        if instance._meta.get_field('story').is_cached(instance):
+            author_id = instance.story.author_id
+        else:
+            author_id = Story.objects.filter(pk=instance.story_id).values_list('author_id', flat=True).first()
+        if isinstance(instance, Scene):
+            row = scene_row(instance.id, instance.story_id, author_id, instance.title, instance.description, instance.prose)
+        else:
+            row = character_row(instance.id, instance.story_id, author_id, instance.full_name, instance.description)
+    write_rows([row])
+
+
+def unindex(instance):
+    """Remove the index row of a story, scene, scene note or character."""
+
+    if available():
+        with connection.cursor() as cursor:
+            cursor.execute(DELETE_SQL, [row_id(KINDS[type(instance)], instance.id)])
+
+
+def match_expression(query: str):
+    """Turn free text into an FTS5 expression of quoted terms, or None if it has no words.
+
+    A trailing * on a word makes it a prefix search. All other FTS5 syntax in
+    the input is treated as plain text.
+    """
+
+    terms = re.findall(r'\w+\*?', query)
+    if not terms:
+        return None
+    return ' '.join(
+        f'"{term[:-1]}"*' if term.endswith('*') else f'"{term}"'
+        for term in terms
+    )
+
+
+def search(author_id: int, query: str, limit: int = 20, offset: int = 0) -> list:
+    """Rank an author's stories, scenes, scene notes and characters against a query.
+
+    Returns dicts with the kind, title, an HTML snippet with <mark> tags
+    around matched words, the story title and a deep link to the object.
+    """
+
+    expression = match_expression(query)
+    if not available() or not expression:
+        return []
+
+    sql = f"""
+        SELECT kind, object_id, story_id,
+               highlight({TABLE}, 1, %s, %s),
+               snippet({TABLE}, 2, %s, %s, '…', 16)
+        FROM {TABLE}
+        WHERE {TABLE} MATCH %s
+        ORDER BY bm25({TABLE}, {', '.join(str(weight) for weight in WEIGHTS)})
+        LIMIT %s OFFSET %s
+    """
+    # The terms match the title and body only, so a word like "a12" cannot hit the author column
+    match = f'author : "{author_token(author_id)}" AND {{title body}} : ({expression})'
+    params = [MARK_START, MARK_END, MARK_START, MARK_END, match, limit, offset]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        hits = cursor.fetchall()
+
+    # Resolve the URL parts of every hit with one query per kind
+    story_ids = {hit[2] for hit in hits}
+    scene_ids = [hit[1] for hit in hits if hit[0] in (0, 2)]
+    character_ids = [hit[1] for hit in hits if hit[0] == 3]
+
+    stories = {
+        story_id: (slug, title)
+        for story_id, slug, title in Story.objects.filter(pk__in=story_ids, author_id=author_id).values_list('id', 'slug', 'title')
+    }
+    scenes = {
+        scene_id: (position, title)
+        for scene_id, position, title in Scene.objects.filter(pk__in=scene_ids).annotate(
+            position=Subquery(
+                Scene.objects.filter(story_id=OuterRef('story_id'), order__lte=OuterRef('order'))
+                .order_by().values('story_id').annotate(total=Count('pk')).values('total')
+            )
+        ).values_list('id', 'position', 'title')
+    } if scene_ids else {}
+    character_slugs = dict(
+        Character.objects.filter(pk__in=character_ids).values_list('id', 'slug')
+    ) if character_ids else {}
+
+    results = []
+    for kind, object_id, story_id, title, snippet in hits:
+        if story_id not in stories:
+            continue
+        story_slug, story_title = stories[story_id]
+
+        if kind == 1:
+            url = reverse('story_detail', kwargs={'story_slug': story_slug})
+        elif kind in (0, 2):
+            if object_id not in scenes:
+                continue
+            position, scene_title = scenes[object_id]
+            url = reverse('scene_detail', kwargs={'story_slug': story_slug, 'scene_order': position})
+
+            # Notes have no title of their own, so show their scene's
+            if kind == 0:
+                title = scene_title
+        else:
+            if object_id not in character_slugs:
+                continue
+            url = reverse('character_detail', kwargs={'story_slug': story_slug, 'character_slug': character_slugs[object_id]})
+
+        results.append({
+            'kind': KIND_NAMES[kind],
+            'title': marked(title),
+            'snippet': marked(snippet),
+            'story': story_title,
+            'url': url,
+        })
+
+    return results
+
+
+def marked(text: str) -> str:
+    """Escape indexed text and turn the highlight markers into <mark> tags."""
+    return escape(text).replace(MARK_START, '<mark>').replace(MARK_END, '</mark>')
+
+
+def rebuild(batch_size: int = 2000, author_id=None, log=None) -> int:
+    """Recreate the index rows of every story, scene, scene note and character, or one author's, in batches.
+
+    Each batch is written in its own transaction so a large backfill never
+    holds the write lock for long. Returns the number of indexed objects.
+    """
+
+    if not available():
+        return 0
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        if author_id is None:
+            cursor.execute(f"DELETE FROM {TABLE}")
+        else:
+            cursor.execute(f"DELETE FROM {TABLE} WHERE {TABLE} MATCH %s", [f'author : "{author_token(author_id)}"'])
+
+    stories = Story.objects.all()
+    scenes = Scene.objects.all()
+    notes = SceneNote.objects.all()
+    characters = Character.objects.all()
+    if author_id is not None:
+        stories = stories.filter(author_id=author_id)
+        scenes = scenes.filter(story__author_id=author_id)
+        notes = notes.filter(scene__story__author_id=author_id)
+        characters = characters.filter(story__author_id=author_id)
+
+    total = index_querysets(stories, scenes, notes, characters, batch_size, log)
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {TABLE} ({TABLE}) VALUES ('optimize')")
+
+    return total
+
+
+def index_story(story_id: int, batch_size: int = 2000) -> int:
+    """Index a story and all of its scenes, scene notes and characters.
+
+    For stories whose rows were written around the signals, such as by a
+    bulk import. Returns the number of indexed objects.
+    """
+
+    if not available():
+        return 0
+
+    return index_querysets(
+        Story.objects.filter(pk=story_id),
+        Scene.objects.filter(story_id=story_id),
+        SceneNote.objects.filter(scene__story_id=story_id),
+        Character.objects.filter(story_id=story_id),
+        batch_size
+    )
+
+
+def index_querysets(stories, scenes, notes, characters, batch_size: int, log=None) -> int:
+    """Write the index rows of the given objects in batches, one transaction per batch."""
+
+    sources = [
+        (stories.values_list('id', 'author_id', 'title', 'description'), story_row),
+        (scenes.values_list('id', 'story_id', 'story__author_id', 'title', 'description', 'prose'), scene_row),
+        (notes.values_list('id', 'scene_id', 'scene__story_id', 'scene__story__author_id', 'text'), note_row),
+        (characters.values_list('id', 'story_id', 'story__author_id', 'full_name', 'description'), character_row),
+    ]
+
+    total = 0
+    for rows, make_row in sources:
+        batch = []
+        for values in rows.order_by('id').iterator(chunk_size=batch_size):
+            batch.append(make_row(*values))
+            if len(batch) >= batch_size:
+                with transaction.atomic():
+                    write_rows(batch)
+                total += len(batch)
+                batch = []
+                if log:
+                    log(total)
+        if batch:
+            with transaction.atomic():
+                write_rows(batch)
+            total += len(batch)
+            if log:
+                log(total)
+
+    return total
@@ -0,0 +1,177 @@
+"""Deterministic synthetic data for load testing and benchmarks."""
+import random
+
+from django.db import connection, transaction
+from django.utils.text import slugify
+
+from accounts.models import CustomUser, UserProfile
+
+from .constants import genre_choices
+from .models import Story, Scene, SceneNote, Character, Plot, PlotPoint
+from .ordering import ORDER_GAP
+
+first_names = ['Ada', 'Bram', 'Cleo', 'Dov', 'Esme', 'Finn', 'Gia', 'Hugo', 'Iris', 'Jude', 'Kai', 'Lena', 'Milo', 'Nia', 'Otto', 'Pia']
+last_names = ['Ashby', 'Brook', 'Crane', 'Dale', 'Ellis', 'Frost', 'Grey', 'Hale', 'Ives', 'Joss', 'Knox', 'Lake', 'Moss', 'North']
+title_words = ['Silent', 'Broken', 'Hollow', 'Crimson', 'Last', 'Winter', 'River', 'Crown', 'Glass', 'Ember', 'Tide', 'Orchard']
+prose_words = ['the', 'storm', 'gathered', 'over', 'a', 'quiet', 'harbor', 'while', 'she', 'waited', 'for', 'news', 'and', 'he', 'ran']
+
+
+def insert_scene_characters(links: list, batch_size: int = 1000):
+    """Insert (scene id, character id) pairs straight into the scene characters table.
+
+    This skips building through model instances and the m2m_changed signal,
+    so callers keep the story version and search index up to date themselves.
+    """
+
+    through = Scene.characters.through._meta
+    sql = 'INSERT INTO {} ({}, {}) VALUES (%s, %s)'.format(
+        connection.ops.quote_name(through.db_table),
+        connection.ops.quote_name(through.get_field('scene').column),
+        connection.ops.quote_name(through.get_field('character').column)
+    )
+    with connection.cursor() as cursor:
+        for start in range(0, len(links), batch_size):
+            cursor.executemany(sql, links[start:start + batch_size])
+
+
+class StorySeeder:
+    """Generate authors with stories, plots, plot points, characters, scenes, notes and scene characters.
+
+    Rows are written with `bulk_create`, including the scene character
+    through table, and each batch of authors is committed in its own
+    transaction. The same seed always produces the same data.
+    """
+
+    def __init__(self, *, stories=10, scenes=100, characters=50, plotpoints=20, notes=2, links=3, seed=0, batch_size=1000):
+        self.stories = stories
+        self.scenes = scenes
+        self.characters = characters
+        self.plotpoints = plotpoints
+        self.notes = notes
+        self.links = min(links, characters)
+        self.random = random.Random(seed)
+        self.batch_size = batch_size
+
+    def sentence(self, words: int) -> str:
+        return ' '.join(self.random.choices(prose_words, k=words)).capitalize() + '.'
+
+    def seed_authors(self, usernames: list) -> list:
+        """Create one author per username, with all of their stories, in one transaction."""
+
+        with transaction.atomic():
+            authors = CustomUser.objects.bulk_create([
+                CustomUser(
+                    username=username,
+                    email=f"{username}@example.com",
+                    first_name=self.random.choice(first_names),
+                    last_name=self.random.choice(last_names),
+                    password='!'
+                )
+                for username in usernames
+            ], batch_size=self.batch_size)
+            UserProfile.objects.bulk_create(
+                [UserProfile(user=author) for author in authors],
+                batch_size=self.batch_size
+            )
+            self.seed_stories(authors)
+
+        return authors
+
+    def seed_stories(self, authors: list) -> list:
+        """Create the configured number of stories, with all of their children, for each author."""
+
+        genres = [choice for choice, _ in genre_choices if choice != 'Other']
+
+        stories = []
+        for author in authors:
+            for number in range(1, self.stories + 1):
+                title = f"The {self.random.choice(title_words)} {self.random.choice(title_words)} {number}"
+                stories.append(Story(
+                    title=title,
+                    slug=slugify(title),
+                    description=self.sentence(20),
+                    premise=self.sentence(10),
+                    genres=self.random.sample(genres, 2),
+                    author=author,
+                    scene_count=self.scenes,
+                    character_count=self.characters,
+                    plotpoint_count=self.plotpoints
+                ))
+        stories = Story.objects.bulk_create(stories, batch_size=self.batch_size)
+
+        plots = Plot.objects.bulk_create([
+            Plot(name=f"Plot for {story.title}", description=self.sentence(15), story=story)
+            for story in stories
+        ], batch_size=self.batch_size)
+
+        plotpoints = PlotPoint.objects.bulk_create([
+            PlotPoint(name=f"Plot point {index}", description=self.sentence(12), plot=plot, order=index * ORDER_GAP)
+            for plot in plots
+            for index in range(1, self.plotpoints + 1)
+        ], batch_size=self.batch_size)
+
+        characters = Character.objects.bulk_create([
+            character
+            for story in stories
+            for character in self.story_characters(story)
+        ], batch_size=self.batch_size)
+
+        # Scenes point at a random plot point of their own story, if it has any
+        scenes = []
+        for index, story in enumerate(stories):
+            story_plotpoints = plotpoints[index * self.plotpoints:(index + 1) * self.plotpoints]
+            for position in range(1, self.scenes + 1):
+                scenes.append(Scene(
+                    title=f"Scene {position}",
+                    description=self.sentence(25),
+                    story=story,
+                    plotpoint=self.random.choice(story_plotpoints) if story_plotpoints else None,
+                    order=position * ORDER_GAP
+                ))
+        scenes = Scene.objects.bulk_create(scenes, batch_size=self.batch_size)
+
+        SceneNote.objects.bulk_create([
+            SceneNote(scene=scene, text=self.sentence(8))
+            for scene in scenes
+            for _ in range(self.notes)
+        ], batch_size=self.batch_size)
+
+        # Scene characters are plain id pairs, so they skip the ORM and go
+        # straight into the many-to-many through table
+        links = []
+        for index in range(len(stories)):
+            story_characters = characters[index * self.characters:(index + 1) * self.characters]
+            for scene in scenes[index * self.scenes:(index + 1) * self.scenes]:
+                for character in self.random.sample(story_characters, self.links):
+                    links.append((scene.id, character.id))
+        insert_scene_characters(links, self.batch_size)
+
+        return stories
+
+    def story_characters(self, story: Story) -> list:
+        """Build unsaved characters for a story, with slugs unique within the story."""
+
+        characters = []
+        slugs = set()
+        for _ in range(self.characters):
+            first_name = self.random.choice(first_names)
+            last_name = self.random.choice(last_names)
+            full_name = f"{first_name} {last_name}"
+
+            slug = base_slug = slugify(full_name)
+            suffix = 2
+            while slug in slugs:
+                slug = f"{base_slug}-{suffix}"
+                suffix += 1
+            slugs.add(slug)
+
+            characters.append(Character(
+                first_name=first_name,
+                last_name=last_name,
+                full_name=full_name,
+                age=self.random.randint(8, 90),
+                description=self.sentence(15),
+                story=story,
+                slug=slug
+            ))
+        return characters
@@ -0,0 +1,170 @@
+"""Signal receivers that keep the denormalized story counts, word counts, cache and graph versions, search index and revisions exact."""
+from django.db.models import F, QuerySet
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from accounts.models import CustomUser
+
+from . import autosave, revisions, search
+from .progress import record_words
+from .models import Story, Scene, SceneNote, Character, Plot, PlotPoint, Relationship, story_changed
+
+
+def deleted_with_story(origin, *parents) -> bool:
+    """Check whether a delete was started by removing the whole story, its author, or one of `parents`."""
+
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return model in (Story, CustomUser, *parents)
+
+
+def adjust_count(stories: QuerySet, field: str, delta: int):
+    """Add `delta` to one of the story count columns and mark the story changed, without reading the story."""
+
+    stories.update(**{field: F(field) + delta}, **story_changed())
+
+
+@receiver(post_save, sender=Scene)
+@receiver(post_save, sender=Character)
+def story_child_saved(sender, instance, created, raw=False, **kwargs):
+    """Count a new scene or character on its story, or bump the story version for a change.
+
+    A scene whose prose gained or lost words adds the difference to the story's word count.
+    """
+
+    if raw:
+        return
+    field = 'scene_count' if sender is Scene else 'character_count'
+    changes = {field: F(field) + 1} if created else {}
+    words = getattr(instance, 'word_count_change', 0)
+    if words:
+        record_words(instance.story_id, words, **changes)
+        return
+
+    stories = Story.objects.filter(pk=instance.story_id)
+    if created:
+        adjust_count(stories, field, 1)
+    else:
+        stories.bump_version()
+
+
+@receiver(post_delete, sender=Scene)
+@receiver(post_delete, sender=Character)
+def story_child_deleted(sender, instance, origin=None, **kwargs):
+    """Uncount a deleted scene or character and a scene's words, unless its story is going too."""
+
+    if deleted_with_story(origin):
+        return
+    field = 'scene_count' if sender is Scene else 'character_count'
+    words = getattr(instance, 'word_count', 0) if sender is Scene else 0
+    if words:
+        record_words(instance.story_id, -words, **{field: F(field) - 1})
+    else:
+        adjust_count(Story.objects.filter(pk=instance.story_id), field, -1)
+
+
+@receiver(post_save, sender=PlotPoint)
+def plotpoint_saved(sender, instance, created, raw=False, **kwargs):
+    """Count a new plot point on the story of its plot, or bump the story version for a change."""
+
+    if raw:
+        return
+    stories = Story.objects.filter(plot__id=instance.plot_id)
+    if created:
+        adjust_count(stories, 'plotpoint_count', 1)
+    else:
+        stories.bump_version()
+
+
+@receiver(post_delete, sender=PlotPoint)
+def plotpoint_deleted(sender, instance, origin=None, **kwargs):
+    """Uncount a deleted plot point, including plot points removed with their plot."""
+
+    if not deleted_with_story(origin):
+        adjust_count(Story.objects.filter(plot__id=instance.plot_id), 'plotpoint_count', -1)
+
+
+@receiver(post_save, sender=Plot)
+@receiver(post_delete, sender=Plot)
+def plot_changed(sender, instance, raw=False, origin=None, **kwargs):
+    """Bump the story version when its plot is saved or removed on its own."""
+
+    if not raw and not deleted_with_story(origin):
+        Story.objects.filter(pk=instance.story_id).bump_version()
+
+
+@receiver(m2m_changed, sender=Scene.characters.through)
+def scene_characters_changed(sender, instance, action, **kwargs):
+    """Bump the story version when characters are added to or removed from a scene."""
+
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        Story.objects.filter(pk=instance.story_id).bump_version()
+
+
+@receiver(post_save, sender=SceneNote)
+@receiver(post_delete, sender=SceneNote)
+def scene_note_changed(sender, instance, raw=False, origin=None, **kwargs):
+    """Bump the story version when a note is added or removed, without reading the scene."""
+
+    if not raw and not deleted_with_story(origin, Scene):
+        Story.objects.filter(scene__id=instance.scene_id).bump_version()
+
+
+@receiver(post_save, sender=Relationship)
+@receiver(post_delete, sender=Relationship)
+def relationship_changed(sender, instance, raw=False, origin=None, **kwargs):
+    """Bump the story's graph version, along with its cache version, when a relationship is saved or removed.
+
+    Relationships removed with one of their characters count too.
+    """
+
+    if not raw and not deleted_with_story(origin):
+        Story.objects.filter(pk=instance.story_id).update(graph_version=F('graph_version') + 1, **story_changed())
+
+
+@receiver(post_save, sender=Story)
+@receiver(post_save, sender=Scene)
+@receiver(post_save, sender=SceneNote)
+@receiver(post_save, sender=Character)
+def index_for_search(sender, instance, created=False, raw=False, **kwargs):
+    """Add or refresh the search index row of a saved story, scene, scene note or character."""
+
+    if not raw:
+        search.index(instance, created=created)
+
+
+@receiver(post_delete, sender=Story)
+@receiver(post_delete, sender=Scene)
+@receiver(post_delete, sender=SceneNote)
+@receiver(post_delete, sender=Character)
+def unindex_for_search(sender, instance, **kwargs):
+    """Drop the search index row of a deleted story, scene, scene note or character."""
+
+    search.unindex(instance)
+
+
+@receiver(post_save, sender=Story)
+@receiver(post_save, sender=Scene)
+@receiver(post_save, sender=Character)
+def record_revision(sender, instance, raw=False, **kwargs):
+    """Add a revision for a saved story, scene or character whose text changed."""
+
+    if not raw:
+        revisions.record(instance)
+
+
+@receiver(post_delete, sender=Scene)
+@receiver(post_delete, sender=Character)
+def forget_revisions(sender, instance, origin=None, **kwargs):
+    """Drop the revisions of a deleted scene or character, unless its story is going too."""
+
+    if not deleted_with_story(origin):
+        revisions.forget(instance)
+
+
+@receiver(post_delete, sender=Scene)
+@receiver(post_delete, sender=Character)
+def forget_pending_patches(sender, instance, origin=None, **kwargs):
+    """Drop the unwritten autosave patches of a deleted scene or character, unless its story is going too."""
+
+    if not deleted_with_story(origin):
+        autosave.forget(instance)
@@ -0,0 +1,68 @@
+// Autosave the scene and character update forms
+const autosaveForm = document.querySelector('form[data-autosave]');
+
+if (autosaveForm) {
+    const autosaveFields = autosaveForm.dataset.autosaveFields.split(' ');
+    const csrfToken = autosaveForm.querySelector('[name=csrfmiddlewaretoken]').value;
+    let autosaveUrl = new URL(autosaveForm.dataset.autosave, window.location.href);
+    let sentValues = formValues();
+    let autosaveTimer = null;
+    let submitted = false;
+
+    // Current values of the fields that can be autosaved
+    function formValues() {
+        const data = new FormData(autosaveForm);
+        return Object.fromEntries(autosaveFields.map(name => [name, data.get(name) ?? '']));
+    }
+
+    // Send only the fields changed since the last patch; the server writes at most one patch per interval
+    function sendPatch(flush) {
+        const values = formValues();
+        const patch = Object.fromEntries(Object.entries(values).filter(([name, value]) => value !== sentValues[name]));
+        if (!flush && !Object.keys(patch).length) {
+            return;
+        }
+        sentValues = values;
+
+        fetch(autosaveUrl + (flush ? '?flush=1' : ''), {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json', 'X-CSRFToken': csrfToken},
+            body: JSON.stringify(patch),
+            keepalive: flush
+        })
+            .then(response => response.json())
+            .then(ack => {
+                // Pending fields are written by a flush once the interval has passed
+                if (ack.retry_after) {
+                    clearTimeout(autosaveTimer);
+                    autosaveTimer = setTimeout(() => sendPatch(true), ack.retry_after * 1000);
+                }
+                // A renamed character has moved to a new URL
+                if (ack.slug) {
+                    const path = window.location.pathname.replace(/[^/]+\/update\/$/, `${ack.slug}/update/`);
+                    window.history.replaceState(null, '', path);
+                    autosaveUrl = new URL(autosaveForm.dataset.autosave, window.location.href);
+                }
+            })
+            .catch(() => {
+                sentValues = {};
+            });
+    }
+
+    autosaveForm.addEventListener('input', () => {
+        clearTimeout(autosaveTimer);
+        autosaveTimer = setTimeout(() => sendPatch(false), 1000);
+    });
+
+    autosaveForm.addEventListener('submit', () => {
+        submitted = true;
+        clearTimeout(autosaveTimer);
+    });
+
+    // Write whatever is still pending when the editor is left
+    window.addEventListener('pagehide', () => {
+        if (!submitted) {
+            sendPatch(true);
+        }
+    });
+}
@@ -0,0 +1,55 @@
+"""Template tag for caching page fragments per story version."""
+from django import template
+
+from app.fragments import get_or_render
+
+register = template.Library()
+
+
+class StoryCacheNode(template.Node):
+
+    def __init__(self, nodelist, name, story, vary_on):
+        self.nodelist = nodelist
+        self.name = name
+        self.story = story
+        self.vary_on = vary_on
+
+    def render(self, context):
+        story = self.story.resolve(context)
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        fetched = context.get('fragments')
+        return get_or_render(self.name, story, lambda: self.nodelist.render(context), vary_on, fetched)
+
+
+@register.tag
+def storycache(parser, token):
+    """Cache the enclosed fragment until the story changes.
+
+    Usage::
+
+        {% load story_cache %}
+        {% storycache 'scene_detail' story scene.pk %}
+            ...
+        {% endstorycache %}
+
+    The fragment name is followed by the story and, optionally, any values
+    the fragment also depends on. Keep forms with a CSRF token outside.
+    Async views pass the fragments they read ahead as ``fragments``.
+    """
+
+    bits = token.split_contents()
+    if len(bits) < 3:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' tag requires a fragment name and a story.")
+
+    name = bits[1]
+    if name[0] == name[-1] and name[0] in ('"', "'"):
+        name = name[1:-1]
+
+    nodelist = parser.parse(('endstorycache',))
+    parser.delete_first_token()
+    return StoryCacheNode(
+        nodelist,
+        name,
+        parser.compile_filter(bits[2]),
+        [parser.compile_filter(bit) for bit in bits[3:]]
+    )
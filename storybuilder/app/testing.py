@@ -0,0 +1,46 @@
+"""Test helpers for the Story Builder."""
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.urls import reverse
+
+
+class QueryBudgetMixin:
+    """TestCase mixin that fails a request running more queries than its URL's budget.
+
+    Budgets are read from the same `QUERY_BUDGETS` setting that the query
+    budget middleware enforces, so a test and production agree on the limit.
+    Queries are counted on every database alias, the way the middleware
+    counts them, so reads sent to the read-only alias count too.
+    """
+
+    def assertWithinQueryBudget(self, url_name: str, method: str = 'get', data=None, **url_kwargs):
+        """Request a URL by name and fail if it exceeds its declared query budget."""
+
+        budgets = getattr(settings, 'QUERY_BUDGETS', {})
+        if url_name not in budgets:
+            self.fail(f"No query budget is declared for {url_name} in QUERY_BUDGETS.")
+        budget = budgets[url_name]
+
+        queries = []
+
+        def record(execute, sql, params, many, context):
+            queries.append(f"  [{context['connection'].alias}] {sql}")
+            return execute(sql, params, many, context)
+
+        # Wrapping, unlike CaptureQueriesContext, leaves aliases the test may not use unopened
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(record))
+            response = getattr(self.client, method)(reverse(url_name, kwargs=url_kwargs), data=data)
+
+            # A streamed body runs its queries as it is read, so they count against the budget too
+            if response.streaming:
+                response.streaming_content = [b''.join(response.streaming_content)]
+
+        if len(queries) > budget:
+            statements = '\n'.join(queries)
+            self.fail(f"{url_name} ran {len(queries)} queries, over its budget of {budget}:\n{statements}")
+
+        return response
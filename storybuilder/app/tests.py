@@ -1,10 +1,46 @@
-from django.test import TestCase
+import contextvars
+import json
+from datetime import timedelta
+import logging
+import logging.handlers
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from asgiref.sync import iscoroutinefunction
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.conf import settings
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
 from django.urls import reverse
-from django.db.utils import IntegrityError
+from django.utils import timezone
+from django.core.cache import cache
+from django.db import connection, connections, router, transaction
+from django.db.models import F
+from django.db.utils import IntegrityError, OperationalError
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test.utils import CaptureQueriesContext
 
-from accounts.models import CustomUser
+from accounts.models import CustomUser, UserProfile
 
-from .models import Story, Scene, Character, Plot, PlotPoint
+from .database import primary_pinned
+from .export import MarkdownExporter
+from .fragments import fragment_stats, get_or_render, reset_fragment_stats
+from .graph import get_graph
+from .importing import OutlineError, import_outline
+from .log import RequestIDFilter, SafeContext
+from .middleware import QueryBudgetMiddleware, ReadAfterWriteMiddleware
+from .models import Story, Scene, SceneNote, Character, Plot, PlotPoint, PendingPatch, Relationship, WordCountEvent, WordCountRollup
+from .ordering import ORDER_GAP, get_at_position, move_to_position, smallest_gap
+from .testing import QueryBudgetMixin
+from .pagination import KeysetPage, aget_page
+from .progress import compact, record_words
+from .autosave import PatchError, pending_patches, save_patch
+from .revisions import compact as compact_revisions, fields_at, revisions_of
+from .utils import aget_plotpoint, aget_scene, aget_story_by_slug
+from .wordcount import count_words
+from .views import NOTES_PER_PAGE
 from.forms import *
 
 # Create your tests here.
@@ -129,3 +165,2227 @@ class StoryTestCase(TestCase):
         self.story1.delete()
         self.author1.delete()
         return super().tearDown()
+
+
+class LookupConstraintTestCase(TestCase):
+    """Test case for the unique slug and order constraints behind the lookup helpers."""
+
+    def setUp(self):
+
+        # Create new user, story, and plot objects
+        self.author1 = CustomUser.objects.create(
+            username='author1',
+            email='author1@exampleemail.com',
+            password='ILoveBooks123!',
+            first_name='Alice',
+            last_name='Writer'
+        )
+        self.story1 = Story.objects.create(
+            title='Story 1',
+            description='Description for Story 1.',
+            author_id=self.author1.id
+        )
+        self.plot1 = Plot.objects.create(name='Plot 1', story=self.story1)
+
+        return super().setUp()
+
+    def test_duplicate_character_names_get_unique_slugs(self):
+        """Characters with the same name in one story get distinct slugs."""
+
+        first = Character.objects.create(first_name='Sam', full_name='Sam', story=self.story1)
+        second = Character.objects.create(first_name='Sam', full_name='Sam', story=self.story1)
+
+        self.assertEqual(first.slug, 'sam')
+        self.assertEqual(second.slug, 'sam-2')
+
+        # Re-saving a character keeps its own slug
+        second.save()
+        self.assertEqual(second.slug, 'sam-2')
+
+    def test_duplicate_scene_order_is_rejected(self):
+        """Two scenes in one story cannot share an order."""
+
+        scene = Scene.objects.create(title='Scene 1', story=self.story1)
+        with self.assertRaises(IntegrityError):
+            Scene.objects.bulk_create([Scene(title='Scene 2', story=self.story1, order=scene.order)])
+
+    def test_story_form_rejects_colliding_slug(self):
+        """A title that slugifies to an existing story's slug is a form error."""
+
+        form = StoryForm(
+            data={'title': 'Story-1', 'description': 'Another story.'},
+            author_id=self.author1.id
+        )
+        self.assertFalse(form.is_valid())
+
+    def test_reorder_and_delete_keep_positions_dense(self):
+        """Moving and deleting scenes keeps a dense 1..n position sequence in URLs."""
+
+        self.client.force_login(self.author1)
+        for number in range(1, 5):
+            Scene.objects.create(title=f"Scene {number}", story=self.story1)
+
+        self.client.get(reverse('move_up', kwargs={'story_slug': self.story1.slug, 'scene_order': 3}))
+        self.client.get(reverse('delete_scene', kwargs={'story_slug': self.story1.slug, 'scene_order': 1}))
+
+        titles = list(Scene.objects.filter(story=self.story1).values_list('title', flat=True))
+        self.assertListEqual(titles, ['Scene 3', 'Scene 2', 'Scene 4'])
+
+        response = self.client.get(reverse('scene_detail', kwargs={'story_slug': self.story1.slug, 'scene_order': 3}))
+        self.assertContains(response, 'Scene 4')
+
+
+class SparseOrderTestCase(TestCase):
+    """Test case for the gap-based scene and plot point sort keys."""
+
+    def setUp(self):
+
+        # Create new user and story objects with a few scenes
+        self.author1 = CustomUser.objects.create(
+            username='author1',
+            email='author1@exampleemail.com',
+            password='ILoveBooks123!',
+            first_name='Alice',
+            last_name='Writer'
+        )
+        self.story1 = Story.objects.create(
+            title='Story 1',
+            description='Description for Story 1.',
+            author_id=self.author1.id
+        )
+        self.scenes = [
+            Scene.objects.create(title=f"Scene {number}", story=self.story1)
+            for number in range(1, 6)
+        ]
+        self.siblings = Scene.objects.filter(story=self.story1)
+
+        return super().setUp()
+
+    def titles(self):
+        return list(self.siblings.values_list('title', flat=True))
+
+    def test_new_scenes_are_spaced_apart(self):
+        """Appended scenes get sort keys ORDER_GAP apart."""
+
+        orders = list(self.siblings.values_list('order', flat=True))
+        self.assertListEqual(orders, [ORDER_GAP * number for number in range(1, 6)])
+
+    def test_move_writes_only_the_moved_scene(self):
+        """Moving a scene is one read of its neighbours and one update."""
+
+        with self.assertNumQueries(4):
+            move_to_position(self.scenes[4], self.siblings, 2)
+
+        self.assertListEqual(self.titles(), ['Scene 1', 'Scene 5', 'Scene 2', 'Scene 3', 'Scene 4'])
+        self.assertEqual(get_at_position(self.siblings, 2).title, 'Scene 5')
+
+    def test_move_to_ends(self):
+        """Scenes can be moved to the first and past the last position."""
+
+        move_to_position(self.scenes[2], self.siblings, 1)
+        move_to_position(self.scenes[0], self.siblings, 99)
+
+        self.assertListEqual(self.titles(), ['Scene 3', 'Scene 2', 'Scene 4', 'Scene 5', 'Scene 1'])
+
+    def test_exhausted_gap_rebalances(self):
+        """Repeated inserts into the same gap fall back to a rebalance."""
+
+        for _ in range(20):
+            move_to_position(self.siblings.last(), self.siblings, 2)
+
+        self.assertEqual(self.siblings.count(), 5)
+        self.assertEqual(self.titles()[0], 'Scene 1')
+        self.assertGreaterEqual(smallest_gap(self.siblings), 1)
+
+    def test_concurrent_append_retries_with_a_fresh_key(self):
+        """An append that lost its sort key to another append retries once instead of failing."""
+
+        # The first read returns the key another append has just taken
+        with mock.patch('app.ordering.next_order', side_effect=[ORDER_GAP * 5, ORDER_GAP * 6]):
+            scene = Scene.objects.create(title='Scene 6', story=self.story1)
+
+        self.assertEqual(scene.order, ORDER_GAP * 6)
+        self.assertEqual(self.titles()[-1], 'Scene 6')
+        self.assertEqual(Story.objects.get(pk=self.story1.pk).scene_count, 6)
+
+
+class ReorderViewTestCase(TestCase):
+    """Test case for the bulk reorder endpoint."""
+
+    def setUp(self):
+
+        # Create new user, story, and plot objects with scenes and plot points
+        self.author1 = CustomUser.objects.create(
+            username='author1',
+            email='author1@exampleemail.com',
+            password='ILoveBooks123!',
+            first_name='Alice',
+            last_name='Writer'
+        )
+        self.story1 = Story.objects.create(
+            title='Story 1',
+            description='Description for Story 1.',
+            author_id=self.author1.id
+        )
+        self.plot1 = Plot.objects.create(name='Plot 1', story=self.story1)
+        for number in range(1, 6):
+            Scene.objects.create(title=f"Scene {number}", story=self.story1)
+            PlotPoint.objects.create(name=f"Point {number}", plot=self.plot1)
+
+        self.url = reverse('reorder', kwargs={'story_slug': self.story1.slug})
+        self.client.force_login(self.author1)
+
+        return super().setUp()
+
+    def post(self, data):
+        return self.client.post(self.url, data=data, content_type='application/json')
+
+    def test_move_to_position(self):
+        """A single scene can jump straight to a target position."""
+
+        response = self.post({'kind': 'scenes', 'position': 5, 'target': 2})
+
+        self.assertEqual(response.status_code, 200)
+        titles = [item['title'] for item in response.json()['order']]
+        self.assertListEqual(titles, ['Scene 1', 'Scene 5', 'Scene 2', 'Scene 3', 'Scene 4'])
+
+    def test_full_permutation(self):
+        """A full new order of plot points is applied in one request."""
+
+        response = self.post({'kind': 'plotpoints', 'order': [5, 4, 3, 2, 1]})
+
+        self.assertEqual(response.status_code, 200)
+        names = list(PlotPoint.objects.filter(plot=self.plot1).values_list('name', flat=True))
+        self.assertListEqual(names, ['Point 5', 'Point 4', 'Point 3', 'Point 2', 'Point 1'])
+
+    def test_invalid_requests(self):
+        """Incomplete permutations, unknown positions, and GET requests are rejected."""
+
+        self.assertEqual(self.post({'kind': 'scenes', 'order': [1, 2, 2, 4, 5]}).status_code, 400)
+        response = self.post({'kind': 'scenes', 'order': [True, False]})
+        self.assertEqual(response.json(), {'errors': {'__all__': ['The order must be a list of positions.']}})
+        self.assertEqual(self.post({'kind': 'scenes', 'position': 9, 'target': 1}).status_code, 404)
+        self.assertEqual(self.post({'kind': 'scenes'}).status_code, 400)
+        self.assertEqual(self.post([1, 2]).json(), {'error': 'The request body must be a JSON object.'})
+        self.assertEqual(self.post('"scenes"').status_code, 400)
+        self.assertEqual(self.client.get(self.url).status_code, 405)
+
+
+class StoryCountTestCase(TestCase):
+    """Test case for the denormalized child counts on stories."""
+
+    def setUp(self):
+
+        # Create new user, story, and plot objects
+        self.author1 = CustomUser.objects.create(
+            username='author1',
+            email='author1@exampleemail.com',
+            password='ILoveBooks123!',
+            first_name='Alice',
+            last_name='Writer'
+        )
+        self.story1 = Story.objects.create(
+            title='Story 1',
+            description='Description for Story 1.',
+            author_id=self.author1.id
+        )
+        self.plot1 = Plot.objects.create(name='Plot 1', story=self.story1)
+
+        return super().setUp()
+
+    def counts(self):
+        self.story1.refresh_from_db()
+        return (self.story1.scene_count, self.story1.character_count, self.story1.plotpoint_count)
+
+    def test_counts_follow_creates_and_deletes(self):
+        """Creating and deleting children keeps the counts exact."""
+
+        scene = Scene.objects.create(title='Scene 1', story=self.story1)
+        Scene.objects.create(title='Scene 2', story=self.story1)
+        character = Character.objects.create(first_name='Sam', full_name='Sam', story=self.story1)
+        PlotPoint.objects.create(name='Point 1', plot=self.plot1)
+        self.assertEqual(self.counts(), (2, 1, 1))
+
+        scene.delete()
+        character.delete()
+        self.assertEqual(self.counts(), (1, 0, 1))
+
+        # Cascades from the plot are counted too
+        self.plot1.delete()
+        self.assertEqual(self.counts(), (1, 0, 0))
+
+    def test_stale_story_save_keeps_counts(self):
+        """Saving a story loaded before a child was added doesn't reset its counts."""
+
+        stale_story = Story.objects.get(pk=self.story1.pk)
+        Scene.objects.create(title='Scene 1', story=self.story1)
+
+        stale_story.premise = 'A premise.'
+        stale_story.save()
+        self.assertEqual(self.counts(), (1, 0, 0))
+
+    def test_recount_command_repairs_drift(self):
+        """The recount command fixes counts written around the signals."""
+
+        Scene.objects.bulk_create([Scene(title='Scene 1', story=self.story1, order=1)])
+        self.assertEqual(self.counts(), (0, 0, 0))
+
+        call_command('recount_stories', stdout=StringIO())
+        self.assertEqual(self.counts(), (1, 0, 0))
+
+    def test_recount_keeps_the_word_count_offset(self):
+        """A word count carried over from before scene prose stays under the scene sum."""
+
+        Story.objects.filter(pk=self.story1.pk).update(word_count=1200, word_count_offset=1200)
+        Scene.objects.create(title='Scene 1', prose='Three more words.', story=self.story1)
+        self.assertEqual(Story.objects.get(pk=self.story1.pk).word_count, 1203)
+
+        Story.objects.filter(pk=self.story1.pk).update(word_count=0)
+        call_command('recount_stories', stdout=StringIO())
+        self.assertEqual(Story.objects.get(pk=self.story1.pk).word_count, 1203)
+
+    def test_pages_do_not_count_children(self):
+        """The story list and detail pages read the counts without COUNT queries."""
+
+        self.client.force_login(self.author1)
+        for url in (reverse('stories'), reverse('story_detail', kwargs={'story_slug': self.story1.slug})):
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(url)
+            self.assertFalse([query for query in queries if 'COUNT(' in query['sql']], url)
+
+
+class ResolveStoryTestCase(TestCase):
+    """Test case for the request-scoped story resolver."""
+
+    def setUp(self):
+
+        # Create new user, story, and plot objects with a scene, character, and plot point
+        self.author1 = CustomUser.objects.create(
+            username='author1',
+            email='author1@exampleemail.com',
+            password='ILoveBooks123!',
+            first_name='Alice',
+            last_name='Writer'
+        )
+        self.story1 = Story.objects.create(
+            title='Story 1',
+            description='Description for Story 1.',
+            author_id=self.author1.id
+        )
+        self.plot1 = Plot.objects.create(name='Plot 1', story=self.story1)
+        Scene.objects.create(title='Scene 1', story=self.story1)
+        Character.objects.create(first_name='Sam', full_name='Sam', story=self.story1)
+        PlotPoint.objects.create(name='Point 1', plot=self.plot1)
+
+        self.client.force_login(self.author1)
+
+        return super().setUp()
+
+    def test_plotpoint_detail_resolves_once(self):
+        """A plot point page costs the session and user lookups plus two queries."""
+
+        url = reverse('plotpoint_detail', kwargs={'story_slug': self.story1.slug, 'plotpoint_order': 1})
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+
+        self.assertContains(response, 'Point 1')
+
+    def test_missing_objects_render_404(self):
+        """Unknown stories, scenes, characters, and plot points are 404s."""
+
+        urls = [
+            reverse('story_detail', kwargs={'story_slug': 'missing'}),
+            reverse('scene_detail', kwargs={'story_slug': self.story1.slug, 'scene_order': 2}),
+            reverse('character_detail', kwargs={'story_slug': self.story1.slug, 'character_slug': 'missing'}),
+            reverse('plotpoint_detail', kwargs={'story_slug': self.story1.slug, 'plotpoint_order': 2}),
+        ]
+        for url in urls:
+            self.assertEqual(self.client.get(url).status_code, 404, url)
+
+    def test_other_authors_story_is_404(self):
+        """The resolver only finds stories of the logged in author."""
+
+        author2 = CustomUser.objects.create(
+            username='author2',
+            email='author2@exampleemail.com',
+            first_name='Bob',
+            last_name='Writer'
+        )
+        self.client.force_login(author2)
+
+        response = self.client.get(reverse('scene_detail', kwargs={'story_slug': self.story1.slug, 'scene_order': 1}))
+        self.assertEqual(response.status_code, 404)
+
+
+class QueryBudgetTestCase(QueryBudgetMixin, TestCase):
+    """Test case that holds every page to its declared query budget on a seeded story."""
+
+    def setUp(self):
+
+        # Create new user and profile objects
+        self.author1 = CustomUser.objects.create(
+            username='author1',
+            email='author1@exampleemail.com',
+            password='ILoveBooks123!',
+            first_name='Alice',
+            last_name='Writer'
+        )
+        UserProfile.objects.create(user=self.author1)
+
+        # Seed stories with scenes, characters, plot points, and scene characters
+        for number in range(1, 4):
+            story = Story.objects.create(
+                title=f"Story {number}",
+                description=f"Description for Story {number}.",
+                author_id=self.author1.id
+            )
+            plot = Plot.objects.create(name=f"Plot {number}", story=story)
+            characters = [
+                Character.objects.create(first_name=f"Person{index}", full_name=f"Person{index}", story=story)
+                for index in range(1, 11)
+            ]
+            for source, target in zip(characters, characters[1:]):
+                Relationship.objects.create(story=story, source=source, target=target, kind='friend')
+            for index in range(1, 11):
+                scene = Scene.objects.create(title=f"Scene {index}", description='A scene.', story=story)
+                SceneNote.objects.create(scene=scene, text='A note.')
+                scene.characters.set(characters)
+                PlotPoint.objects.create(name=f"Point {index}", description='A plot point.', plot=plot)
+
+        self.client.force_login(self.author1)
+
+        return super().setUp()
+
+    def test_pages_stay_within_query_budgets(self):
+        """Every page renders within the query budget declared in settings."""
+
+        story = {'story_slug': 'story-1'}
+        pages = {
+            'home': {},
+            'stories': {},
+            'new_story': {},
+            'story_detail': story,
+            'update_story': story,
+            'scenes': story,
+            'new_scene': story,
+            'scene_detail': {**story, 'scene_order': 1},
+            'update_scene': {**story, 'scene_order': 1},
+            'add_scene_character': {**story, 'scene_order': 1},
+            'characters': story,
+            'new_character': story,
+            'character_detail': {**story, 'character_slug': 'person1'},
+            'update_character': {**story, 'character_slug': 'person1'},
+            'plot_detail': story,
+            'update_plot': story,
+            'new_plotpoint': story,
+            'plotpoint_detail': {**story, 'plotpoint_order': 1},
+            'update_plotpoint': {**story, 'plotpoint_order': 1},
+            'story_revisions': story,
+            'story_revision': {**story, 'number': 1},
+            'scene_revisions': {**story, 'scene_order': 1},
+            'scene_revision': {**story, 'scene_order': 1, 'number': 1},
+            'character_revisions': {**story, 'character_slug': 'person1'},
+            'character_revision': {**story, 'character_slug': 'person1', 'number': 1},
+            'relationships': story,
+            'character_neighbors': {**story, 'character_slug': 'person1'},
+            'relationship_groups': story,
+            'character_cooccurrence': story,
+            'profile': {},
+            'update_profile': {},
+        }
+
+        for url_name, url_kwargs in pages.items():
+            with self.subTest(url_name=url_name):
+                response = self.assertWithinQueryBudget(url_name, **url_kwargs)
+                self.assertEqual(response.status_code, 200)
+
+        response = self.assertWithinQueryBudget('relationship_path', data={'from': 'person1', 'to': 'person10'}, **story)
+        self.assertEqual(response.json()['length'], 9)
+        response = self.assertWithinQueryBudget('search', data={'q': 'scene'})
+        self.assertEqual(len(response.json()['results']), 20)
+        for url_name in ('export_story', 'story_graph'):
+            with self.subTest(url_name=url_name):
+                self.assertEqual(self.assertWithinQueryBudget(url_name, **story).status_code, 200)
+
+        # Moves and reorders write, so they go last
+        response = self.assertWithinQueryBudget('reorder', method='post', data={'kind': 'scenes', 'position': 3, 'target': 2}, **story)
+        self.assertEqual(response.status_code, 200)
+        for url_name in ('move_up', 'move_down'):
+            for position in ({'scene_order': 2}, {'plotpoint_order': 2}):
+                with self.subTest(url_name=url_name, **position):
+                    self.assertEqual(self.assertWithinQueryBudget(url_name, **story, **position).status_code, 302)
+
+    @override_settings(DEBUG=True)
+    def test_middleware_reports_query_counts(self):
+        """The middleware exposes counts in headers and logs requests over budget."""
+
+        with self.modify_settings(MIDDLEWARE={'prepend': 'app.middleware.QueryBudgetMiddleware'}):
+            with self.settings(QUERY_BUDGETS={'stories': 1}):
+                with self.assertLogs('app.middleware', level='WARNING'):
+                    response = self.client.get(reverse('stories'))
+
+        self.assertEqual(response['X-Query-Budget'], '1')
+        self.assertGreater(int(response['X-Query-Count']), 1)
+
+    @override_settings(DEBUG=True)
+    async def test_middleware_counts_async_views_natively(self):
+        """Under ASGI the middleware is a coroutine, so async views are not pushed onto a thread."""
+
+        async def get_response(request):
+            return None
+
+        self.assertTrue(iscoroutinefunction(QueryBudgetMiddleware(get_response)))
+
+        await self.async_client.aforce_login(self.author1)
+        with self.modify_settings(MIDDLEWARE={'prepend': 'app.middleware.QueryBudgetMiddleware'}):
+            response = await self.async_client.get(reverse('stories'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(int(response['X-Query-Count']), 1)
+
+
+class SeedStoriesTestCase(TestCase):
+    """Test case for the synthetic data generator."""
+
+    def seed(self, prefix: str, seed: int = 0):
+        call_command(
+            'seed_stories', authors=2, stories=2, scenes=5, characters=4, plotpoints=3, notes=2, links=2,
+            seed=seed, prefix=prefix, authors_per_transaction=1, stdout=StringIO()
+        )
+        return Story.objects.filter(author__username__startswith=f"{prefix}-").order_by('id')
+
+    def test_seeded_rows_are_consistent(self):
+        """Seeded stories have the configured children, exact counts and valid sort keys."""
+
+        stories = self.seed('a')
+        self.assertEqual(stories.count(), 4)
+        self.assertEqual(Scene.characters.through.objects.count(), 4 * 5 * 2)
+
+        story = stories.first()
+        self.assertEqual((story.scene_count, story.character_count, story.plotpoint_count), (5, 4, 3))
+        self.assertEqual(get_at_position(Scene.objects.filter(story=story), 1).scenenote_set.count(), 2)
+        self.assertEqual(smallest_gap(Scene.objects.filter(story=story)), ORDER_GAP)
+
+        # The counts are written directly, so a recount must not change them
+        call_command('recount_stories', stdout=StringIO())
+        story.refresh_from_db()
+        self.assertEqual((story.scene_count, story.character_count, story.plotpoint_count), (5, 4, 3))
+
+    def test_same_seed_gives_same_data(self):
+        """Two runs with the same seed generate identical content."""
+
+        def content(stories):
+            return [
+                (story.title, list(story.character_set.order_by('id').values_list('slug', flat=True)))
+                for story in stories
+            ]
+
+        first = content(self.seed('a'))
+        self.assertEqual(first, content(self.seed('b')))
+        self.assertNotEqual(first, content(self.seed('c', seed=1)))
+
+    def test_existing_prefix_is_refused(self):
+        """Seeding twice with the same username prefix is an error."""
+
+        self.seed('a')
+        with self.assertRaises(CommandError):
+            self.seed('a')
+
+
+class BenchCommandTestCase(TestCase):
+    """Test case for the route benchmark command."""
+
+    def setUp(self):
+
+        # The command builds its own test databases; here it runs on the test case's database
+        for name in ('setup_test_environment', 'teardown_test_environment', 'setup_databases', 'teardown_databases'):
+            patcher = mock.patch(f"app.management.commands.bench.{name}")
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.baseline = os.path.join(directory.name, 'baseline.json')
+
+        return super().setUp()
+
+    def bench(self, routes=('stories', 'story_detail'), **options):
+        # Each run seeds its author afresh, as it would on a new database
+        CustomUser.objects.filter(username='bench').delete()
+        output = StringIO()
+        call_command('bench', stories=1, scenes=2, iterations=1, routes=list(routes), stdout=output, **options)
+        return output.getvalue()
+
+    def test_baseline_is_saved_and_regressions_are_flagged(self):
+        """A run writes its JSON baseline, and a later run over the threshold fails with the route marked."""
+
+        self.bench(save=self.baseline)
+
+        with open(self.baseline) as baseline_file:
+            report = json.load(baseline_file)
+        self.assertEqual(report['iterations'], 1)
+        self.assertEqual(set(report['routes']), {'stories', 'story_detail'})
+        self.assertEqual(report['routes']['stories']['status'], 200)
+
+        # Pretend the baseline was much faster and leaner for one route, and far slower for the other
+        report['routes']['stories'].update(p50_ms=0.001, queries=0)
+        report['routes']['story_detail'].update(p50_ms=1000000)
+        with open(self.baseline, 'w') as baseline_file:
+            json.dump(report, baseline_file)
+
+        with self.assertRaisesMessage(CommandError, '1 route(s) regressed'):
+            self.bench(compare=self.baseline, threshold=0.2)
+
+    def test_routes_must_answer_with_their_views(self):
+        """Every route needs a success status, or the redirect of a move, and an error page fails the run unsaved."""
+
+        routes = ['story_revision', 'scene_revision', 'relationship_path', 'autosave_scene', 'autosave_character', 'move_up']
+        output = self.bench(routes=routes, save=self.baseline)
+        with open(self.baseline) as baseline_file:
+            self.assertEqual(json.load(baseline_file)['routes']['move_up:scene']['status'], 302)
+        self.assertIn('autosave_scene', output)
+        os.remove(self.baseline)
+
+        # Without the seeded revisions the revision routes answer 404
+        with mock.patch('app.management.commands.bench.revisions.record'):
+            with self.assertRaisesMessage(CommandError, '1 route(s) did not answer as expected: story_revision.'):
+                self.bench(routes=['story_revision', 'stories'], save=self.baseline)
+        self.assertFalse(os.path.exists(self.baseline))
+
+
+class FragmentCacheTestCase(TestCase):
+    """Test case for the per-story versioned fragment cache."""
+
+    def setUp(self):
+
+        # Create new user, story, plot, scene and character objects
+        self.author1 = CustomUser.objects.create(
+            username='author1',
+            email='author1@exampleemail.com',
+            password='ILoveBooks123!',
+            first_name='Alice',
+            last_name='Writer'
+        )
+        self.story1 = Story.objects.create(
+            title='Story 1',
+            description='Description for Story 1.',
+            author_id=self.author1.id
+        )
+        self.plot1 = Plot.objects.create(name='Plot 1', story=self.story1)
+        self.scene1 = Scene.objects.create(title='Scene 1', story=self.story1)
+        self.scene2 = Scene.objects.create(title='Scene 2', story=self.story1)
+        self.character1 = Character.objects.create(first_name='Sam', full_name='Sam', story=self.story1)
+        self.story_kwargs = {'story_slug': self.story1.slug}
+
+        self.client.force_login(self.author1)
+        cache.clear()
+        reset_fragment_stats()
+
+        return super().setUp()
+
+    def version(self):
+        return Story.objects.values_list('version', flat=True).get(pk=self.story1.pk)
+
+    def test_repeat_visits_hit_the_cache(self):
+        """A second visit is served from the cache, with fewer queries, and counted."""
+
+        url = reverse('scenes', kwargs=self.story_kwargs)
+        with CaptureQueriesContext(connection) as first:
+            self.client.get(url)
+        with CaptureQueriesContext(connection) as second:
+            response = self.client.get(url)
+
+        self.assertContains(response, 'Scene 2')
+        self.assertLess(len(second), len(first))
+        self.assertEqual(fragment_stats()['scenes'], {'hits': 1, 'misses': 1})
+
+    def test_model_writes_bump_the_version(self):
+        """Saving the story or any of its children changes the story version."""
+
+        writes = [
+            lambda: self.story1.save(),
+            lambda: self.scene1.save(),
+            lambda: self.character1.save(),
+            lambda: self.plot1.save(),
+            lambda: PlotPoint.objects.create(name='Point 1', plot=self.plot1),
+            lambda: self.scene1.characters.add(self.character1),
+            lambda: self.scene2.delete(),
+        ]
+        for write in writes:
+            before = self.version()
+            write()
+            self.assertGreater(self.version(), before)
+
+    def test_writes_through_views_refresh_fragments(self):
+        """Pages show changes made through the update and move views right away."""
+
+        scenes_url = reverse('scenes', kwargs=self.story_kwargs)
+        self.client.get(scenes_url)
+
+        self.client.post(
+            reverse('update_scene', kwargs={**self.story_kwargs, 'scene_order': 1}),
+            data={'title': 'Renamed Scene', 'description': 'A scene.'}
+        )
+        self.assertContains(self.client.get(scenes_url), 'Renamed Scene')
+
+        self.client.get(reverse('move_up', kwargs={**self.story_kwargs, 'scene_order': 2}))
+        content = self.client.get(scenes_url).content.decode()
+        self.assertLess(content.index('Scene 2'), content.index('Renamed Scene'))
+
+    def test_story_detail_reads_its_fragment_ahead(self):
+        """The story page fetches its cached fragment before rendering, so rendering never asks the cache."""
+
+        url = reverse('story_detail', kwargs=self.story_kwargs)
+        self.client.get(url)
+
+        with mock.patch('app.templatetags.story_cache.get_or_render', wraps=get_or_render) as render:
+            response = self.client.get(url)
+
+        # The tag is handed what was read ahead, so it has no cache lookup of its own to make
+        self.assertContains(response, 'Description for Story 1.')
+        self.assertIn('story_detail', render.call_args.args[4])
+        self.assertEqual(fragment_stats()['story_detail'], {'hits': 1, 'misses': 1})
+
+    def test_scene_fragments_vary_by_scene(self):
+        """Each scene page caches its own fragment."""
+
+        for scene_order, title in ((1, 'Scene 1'), (2, 'Scene 2')):
+            url = reverse('scene_detail', kwargs={**self.story_kwargs, 'scene_order': scene_order})
+            self.client.get(url)
+            self.assertContains(self.client.get(url), f"<h1>{title}</h1>")
+
+
+class LoggingTestCase(TestCase):
+    """Test case for the logging layer, which must never touch the database."""
+
+    def setUp(self):
+
+        # Create new user, story, plot, scene and character objects
+        self.author1 = CustomUser.objects.create(
+            username='author1',
+            email='author1@exampleemail.com',
+            password='ILoveBooks123!',
+            first_name='Alice',
+            last_name='Writer'
+        )
+        self.story1 = Story.objects.create(
+            title='Story 1',
+            description='Description for Story 1.',
+            author_id=self.author1.id
+        )
+        Plot.objects.create(name='Plot 1', story=self.story1)
+        Scene.objects.create(title='Scene 1', story=self.story1)
+        Character.objects.create(first_name='Sam', full_name='Sam', story=self.story1)
+
+        self.client.force_login(self.author1)
+        cache.clear()
+
+        return super().setUp()
+
+    def queries_for(self, request, debug: bool) -> int:
+        """Run a request with app logging silenced or at DEBUG, returning its query count."""
+
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            if debug:
+                with self.assertLogs('app', level='DEBUG'):
+                    request()
+            else:
+                request()
+        return len(queries)
+
+    def test_debug_logging_runs_no_extra_queries(self):
+        """Turning on debug logging adds no queries to any page, including the story form."""
+
+        story = {'story_slug': self.story1.slug}
+        urls = [
+            reverse('stories'),
+            reverse('story_detail', kwargs=story),
+            reverse('scenes', kwargs=story),
+            reverse('scene_detail', kwargs={**story, 'scene_order': 1}),
+            reverse('characters', kwargs=story),
+            reverse('character_detail', kwargs={**story, 'character_slug': 'sam'}),
+            reverse('plot_detail', kwargs=story),
+            reverse('update_plot', kwargs=story),
+            reverse('update_story', kwargs=story),
+        ]
+        requests = [(url, lambda url=url: self.client.get(url)) for url in urls]
+        requests.append(('new_story', lambda: self.client.post(reverse('new_story'), data={'title': 'Story 1'})))
+
+        for name, request in requests:
+            with self.subTest(request=name):
+                quiet = self.queries_for(request, debug=False)
+                self.assertEqual(self.queries_for(request, debug=True), quiet)
+
+    def test_context_querysets_are_not_evaluated(self):
+        """Pages no longer run the LIMIT 21 query that printing a queryset's repr used to cost."""
+
+        story = {'story_slug': self.story1.slug}
+        urls = [
+            reverse('stories'),
+            reverse('story_detail', kwargs=story),
+            reverse('scenes', kwargs=story),
+            reverse('scene_detail', kwargs={**story, 'scene_order': 1}),
+            reverse('characters', kwargs=story),
+            reverse('plot_detail', kwargs=story),
+        ]
+        for url in urls:
+            with self.subTest(url=url), CaptureQueriesContext(connection) as queries:
+                self.client.get(url)
+            self.assertFalse([
+                query['sql'] for query in queries
+                if '"app_' in query['sql'] and query['sql'].endswith('LIMIT 21')
+            ])
+
+    def test_records_carry_the_request_id(self):
+        """Log records written during a request carry its ID, which is echoed in a header."""
+
+        handler = logging.handlers.BufferingHandler(capacity=100)
+        handler.addFilter(RequestIDFilter())
+        app_logger = logging.getLogger('app')
+        old_level = app_logger.level
+        app_logger.setLevel(logging.DEBUG)
+        try:
+            with mock.patch.object(app_logger, 'handlers', [handler]):
+                response = self.client.get(reverse('stories'), headers={'X-Request-ID': 'trace-123'})
+        finally:
+            app_logger.setLevel(old_level)
+
+        self.assertEqual(response['X-Request-ID'], 'trace-123')
+        self.assertTrue(handler.buffer)
+        self.assertEqual({record.request_id for record in handler.buffer}, {'trace-123'})
+
+    def test_safe_context_describes_without_queries(self):
+        """Context summaries name querysets and models without evaluating them."""
+
+        context = {'stories': Story.objects.all(), 'story': self.story1, 'title': 'Story 1'}
+        with self.assertNumQueries(0):
+            summary = str(SafeContext(context))
+        self.assertIn('<QuerySet Story unevaluated>', summary)
+        self.assertIn(f"<Story pk={self.story1.pk}>", summary)
+
+
+class SearchTestCase(TestCase):
+    """Test case for the full-text search index and endpoint."""
+
+    def setUp(self):
+
+        # Create two authors with a story each
+        self.author1 = CustomUser.objects.create(
+            username='author1',
+            email='author1@exampleemail.com',
+            password='ILoveBooks123!',
+            first_name='Alice',
+            last_name='Writer'
+        )
+        self.author2 = CustomUser.objects.create(
+            username='author2',
+            email='author2@exampleemail.com',
+            password='ILoveBooks123!',
+            first_name='Bob',
+            last_name='Writer'
+        )
+        self.story1 = Story.objects.create(
+            title='Story 1',
+            description='A lighthouse keeper waits for the storm.',
+            author_id=self.author1.id
+        )
+        self.story2 = Story.objects.create(title='Story 2', description='Another storm.', author_id=self.author2.id)
+
+        Scene.objects.create(title='Scene 1', description='Morning at the harbor.', story=self.story1)
+        self.scene2 = Scene.objects.create(title='The Storm', description='Waves break over the rocks.', story=self.story1)
+        SceneNote.objects.create(scene=self.scene2, text='Thunder <b>rolls</b>.')
+        self.character1 = Character.objects.create(first_name='Mara', full_name='Mara Flint', description='Fears storms.', story=self.story1)
+
+        self.client.force_login(self.author1)
+
+        return super().setUp()
+
+    def search(self, query):
+        return self.client.get(reverse('search'), {'q': query}).json()['results']
+
+    def test_results_are_ranked_linked_and_scoped(self):
+        """Matches from the author's own objects come back ranked, with deep links."""
+
+        results = self.search('storm')
+        urls = [result['url'] for result in results]
+
+        # The title match ranks first, and the other author's story never shows up
+        self.assertEqual(results[0]['kind'], 'scene')
+        self.assertEqual(urls[0], reverse('scene_detail', kwargs={'story_slug': 'story-1', 'scene_order': 2}))
+        self.assertCountEqual(urls, [
+            reverse('scene_detail', kwargs={'story_slug': 'story-1', 'scene_order': 2}),
+            reverse('story_detail', kwargs={'story_slug': 'story-1'}),
+            reverse('character_detail', kwargs={'story_slug': 'story-1', 'character_slug': 'mara-flint'}),
+        ])
+        self.assertIn('<mark>Storm</mark>', results[0]['title'])
+
+        # The author token is only for scoping, never a match for the search terms
+        self.assertEqual(self.search(f"a{self.author1.id}"), [])
+        self.assertEqual(self.search(f"a{self.author1.id} storm"), [])
+
+    def test_snippets_are_escaped(self):
+        """Indexed text is escaped in snippets, apart from the <mark> tags."""
+
+        snippet = self.search('thunder')[0]['snippet']
+        self.assertIn('<mark>Thunder</mark>', snippet)
+        self.assertIn('&lt;b&gt;', snippet)
+
+    def test_index_follows_saves_and_deletes(self):
+        """Edits and deletes show up in the next search."""
+
+        self.character1.description = 'Loves calm seas.'
+        self.character1.save()
+        self.assertNotIn('character', [result['kind'] for result in self.search('storm')])
+
+        self.scene2.delete()
+        self.assertEqual(self.search('thunder'), [])
+
+        self.story1.delete()
+        self.assertEqual(self.search('lighthouse'), [])
+
+    def test_scene_prose_is_searchable(self):
+        """A word found only in a scene's prose finds the scene, when saved and when rebuilt."""
+
+        self.scene2.prose = 'The keeper lit the brass lantern at dusk.'
+        self.scene2.save()
+
+        results = self.search('lantern')
+        self.assertEqual([result['kind'] for result in results], ['scene'])
+        self.assertIn('<mark>lantern</mark>', results[0]['snippet'])
+
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(len(self.search('lantern')), 1)
+
+    def test_query_syntax_is_plain_text(self):
+        """FTS5 operators in the query are searched as words rather than raising errors."""
+
+        self.assertEqual(self.search('NEAR(" OR'), [])
+        self.assertEqual(self.search('   '), [])
+        self.assertEqual(len(self.search('harb*')), 1)
+
+    def test_rebuild_command_backfills(self):
+        """The rebuild command indexes rows written around the signals."""
+
+        Scene.objects.bulk_create([Scene(title='Lantern', description='Bulk loaded.', story=self.story1, order=99999)])
+        self.assertEqual(self.search('lantern'), [])
+
+        call_command('rebuild_search_index', batch_size=2, stdout=StringIO())
+        self.assertEqual(len(self.search('lantern')), 1)
+        self.assertEqual(len(self.search('storm')), 3)
+
+
+class SceneNoteTestCase(TestCase):
+    """Test case for appending and paginating scene notes."""
+
+    def setUp(self):
+
+        # Create new user, story and scene objects
+        self.author1 = CustomUser.objects.create(
+            username='author1',
+            email='author1@exampleemail.com',
+            password='ILoveBooks123!',
+            first_name='Alice',
+            last_name='Writer'
+        )
+        self.story1 = Story.objects.create(title='Story 1', author_id=self.author1.id)
+        self.scene1 = Scene.objects.create(title='Scene 1', story=self.story1)
+        self.url = reverse('scene_detail', kwargs={'story_slug': self.story1.slug, 'scene_order': 1})
+
+        self.client.force_login(self.author1)
+        cache.clear()
+
+        return super().setUp()
+
+    def test_adding_a_note_is_one_insert(self):
+        """Posting a note inserts a row without reading or rewriting the scene."""
+
+        with CaptureQueriesContext(connection) as queries:
+            SceneNote.objects.create(scene_id=self.scene1.id, text='First note.')
+
+        self.assertFalse([query for query in queries if query['sql'].startswith('UPDATE "app_scene"')])
+        self.assertEqual(self.scene1.scenenote_set.count(), 1)
+
+        self.client.post(self.url, data={'note': 'Second note.'})
+        self.assertEqual(self.scene1.scenenote_set.count(), 2)
+        self.assertContains(self.client.get(self.url), 'Second note.')
+
+    def test_notes_are_paginated_newest_first(self):
+        """Scene pages show the newest notes, with older ones on later pages."""
+
+        SceneNote.objects.bulk_create([
+            SceneNote(scene=self.scene1, text=f"Note {number}.")
+            for number in range(1, NOTES_PER_PAGE + 6)
+        ])
+        Story.objects.filter(pk=self.story1.pk).bump_version()
+
+        first = self.client.get(self.url)
+        self.assertContains(first, f"Note {NOTES_PER_PAGE + 5}.")
+        self.assertNotContains(first, 'Note 1.')
+
+        second = self.client.get(self.url, {'notes': 2})
+        self.assertContains(second, 'Note 1.')
+        self.assertNotContains(second, f"Note {NOTES_PER_PAGE + 5}.")
+
+
+class ExportTestCase(TestCase):
+    """Test case for the streaming story outline export."""
+
+    def setUp(self):
+
+        # Create new user, story, plot, plot point, scene and character objects
+        self.author1 = CustomUser.objects.create(
+            username='author1',
+            email='author1@exampleemail.com',
+            password='ILoveBooks123!',
+            first_name='Alice',
+            last_name='Writer'
+        )
+        self.story1 = Story.objects.create(
+            title='Story 1',
+            description='A <b>bold</b> tale.',
+            author_id=self.author1.id
+        )
+        self.plot1 = Plot.objects.create(name='Plot 1', story=self.story1)
+        self.plotpoint1 = PlotPoint.objects.create(name='Inciting Incident', plot=self.plot1)
+        self.character1 = Character.objects.create(first_name='Sam', full_name='Sam', occupation='Sailor', story=self.story1)
+        self.scene1 = Scene.objects.create(title='Opening', story=self.story1, plotpoint=self.plotpoint1)
+        self.scene2 = Scene.objects.create(title='Closing', story=self.story1)
+        self.scene1.characters.add(self.character1)
+        SceneNote.objects.create(scene=self.scene1, text='Set the mood.')
+        self.url = reverse('export_story', kwargs={'story_slug': self.story1.slug})
+
+        self.client.force_login(self.author1)
+
+        return super().setUp()
+
+    def export(self, **params):
+        response = self.client.get(self.url, params)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_markdown_export(self):
+        """The default export is a Markdown download with every part of the outline in order."""
+
+        response, content = self.export()
+
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/markdown; charset=utf-8')
+        self.assertIn('filename="story-1.md"', response['Content-Disposition'])
+        self.assertTrue(content.startswith('# Story 1\n'))
+        for text in ('## Plot: Plot 1', '### 1. Inciting Incident', '### 1. Opening', '### 2. Closing',
+                     '- **Characters:** Sam', '- Set the mood.', '- **Occupation:** Sailor'):
+            self.assertIn(text, content)
+        self.assertLess(content.index('Opening'), content.index('Closing'))
+
+    def test_html_export_is_escaped(self):
+        """The HTML export is a standalone document with story text escaped."""
+
+        response, content = self.export(format='html')
+
+        self.assertEqual(response['Content-Type'], 'text/html; charset=utf-8')
+        self.assertIn('<p>A &lt;b&gt;bold&lt;/b&gt; tale.</p>', content)
+        self.assertTrue(content.rstrip().endswith('</html>'))
+
+    def test_query_count_does_not_grow_with_the_story(self):
+        """Adding scenes, characters and notes does not add queries to the export."""
+
+        with CaptureQueriesContext(connection) as small:
+            self.export(format='txt')
+
+        for number in range(10):
+            scene = Scene.objects.create(title=f"Extra {number}", story=self.story1)
+            scene.characters.add(self.character1)
+            SceneNote.objects.create(scene=scene, text='More.')
+            Character.objects.create(first_name=f"Extra {number}", full_name=f"Extra {number}", story=self.story1)
+
+        with CaptureQueriesContext(connection) as large:
+            _, content = self.export(format='txt')
+
+        self.assertIn('Extra 9', content)
+        self.assertEqual(len(large), len(small))
+
+    def test_unknown_format_and_other_authors(self):
+        """Unknown formats and other authors' stories are not found."""
+
+        self.assertEqual(self.client.get(self.url, {'format': 'pdf'}).status_code, 404)
+
+        author2 = CustomUser.objects.create(username='author2', email='author2@exampleemail.com', first_name='Bob', last_name='Writer')
+        self.client.force_login(author2)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+
+class ImportTestCase(TestCase):
+    """Test case for bulk story imports from JSON and Markdown outlines."""
+
+    def setUp(self):
+
+        # Create new user object
+        self.author1 = CustomUser.objects.create(
+            username='author1',
+            email='author1@exampleemail.com',
+            password='ILoveBooks123!',
+            first_name='Alice',
+            last_name='Writer'
+        )
+        self.outline = {
+            'title': 'Imported Story',
+            'description': 'Brought over from another tool.',
+            'genres': ['Fantasy'],
+            'plot': {'name': 'The Quest', 'description': 'Find the crown.'},
+            'plot_points': [{'name': 'Call'}, {'name': 'Return'}],
+            'characters': [{'first_name': 'Sam', 'last_name': 'Grey', 'age': 30}, {'first_name': 'Ada'}],
+            'scenes': [
+                {'title': 'Harbor', 'plot_point': 'Call', 'characters': ['Sam Grey', 'Ada'], 'notes': ['Fog.', 'Bells.']},
+                {'title': 'Crown', 'plot_point': 2, 'characters': ['Ada']},
+            ]
+        }
+
+        self.client.force_login(self.author1)
+
+        return super().setUp()
+
+    def import_json(self, outline):
+        return import_outline(self.author1, [json.dumps(outline)], 'json')
+
+    def test_json_import_creates_the_whole_story(self):
+        """A JSON outline creates the story and all of its children, with exact counts."""
+
+        story = self.import_json(self.outline)
+
+        self.assertEqual((story.scene_count, story.character_count, story.plotpoint_count), (2, 2, 2))
+        self.assertEqual(story.plot.name, 'The Quest')
+        harbor, crown = Scene.objects.filter(story=story).order_by('order')
+        self.assertEqual((harbor.title, crown.title), ('Harbor', 'Crown'))
+        self.assertEqual(harbor.plotpoint.name, 'Call')
+        self.assertEqual(crown.plotpoint.name, 'Return')
+        self.assertEqual(sorted(str(character) for character in harbor.characters.all()), ['Ada', 'Sam Grey'])
+        self.assertEqual(list(harbor.scenenote_set.values_list('text', flat=True)), ['Fog.', 'Bells.'])
+        self.assertEqual(Character.objects.get(story=story, slug='sam-grey').age, 30)
+
+    def test_markdown_export_imports_again(self):
+        """A story's Markdown export imports as an equal story."""
+
+        story = self.import_json(self.outline)
+        markdown = ''.join(MarkdownExporter(story, story.plot).stream())
+        story.delete()
+
+        copy = import_outline(self.author1, markdown.splitlines(keepends=True), 'md')
+
+        self.assertEqual(copy.title, 'Imported Story')
+        self.assertEqual(copy.description, 'Brought over from another tool.')
+        self.assertEqual(copy.genres, ['Fantasy'])
+        self.assertEqual(list(copy.plot.plotpoint_set.values_list('name', flat=True)), ['Call', 'Return'])
+        harbor = Scene.objects.filter(story=copy).order_by('order').first()
+        self.assertEqual(harbor.plotpoint.name, 'Call')
+        self.assertEqual(harbor.characters.count(), 2)
+        self.assertEqual(list(harbor.scenenote_set.values_list('text', flat=True)), ['Fog.', 'Bells.'])
+
+    def test_problems_are_reported_per_row_and_nothing_is_written(self):
+        """Every invalid row is reported with its location, and an invalid outline creates nothing."""
+
+        self.outline['scenes'].append({'title': 'x' * 200, 'plot_point': 'Missing', 'characters': ['Ghost']})
+        self.outline['characters'].append({'first_name': 'Old', 'age': 'ancient'})
+
+        with self.assertRaises(OutlineError) as raised:
+            self.import_json(self.outline)
+
+        errors = raised.exception.errors
+        self.assertEqual(len([error for error in errors if error.startswith('scene 3:')]), 3)
+        self.assertTrue(any(error.startswith('character 3: age:') for error in errors))
+        self.assertFalse(Story.objects.exists())
+
+    def test_values_of_the_wrong_type_are_reported(self):
+        """Text fields need text and list fields lists of text, and each mistyped value is reported where it is."""
+
+        self.outline.update(title=['T9'], genres='Fantasy')
+        self.outline['characters'][0].update(personality_traits='brave', age=True)
+        self.outline['characters'].append({'name': 7})
+        self.outline['scenes'][0].update(prose=5, notes=[None])
+        self.outline['scenes'][1].update(characters='Ada')
+
+        with self.assertRaises(OutlineError) as raised:
+            self.import_json(self.outline)
+
+        self.assertEqual(raised.exception.errors, [
+            'story: title: Expected text.',
+            'story: genres: Expected a list of text.',
+            'character 1: age: Expected a number.',
+            'character 1: personality traits: Expected a list of text.',
+            'character 3: name: Expected text.',
+            'scene 1: prose: Expected text.',
+            'scene 1: notes: Expected a list of text.',
+            'scene 2: characters: Expected a list of text.',
+        ])
+        self.assertFalse(Story.objects.exists())
+
+    def test_duplicate_titles_are_refused(self):
+        """Importing a story with the title of an existing story of the author is an error."""
+
+        self.import_json(self.outline)
+        with self.assertRaises(OutlineError) as raised:
+            self.import_json(self.outline)
+
+        self.assertEqual(raised.exception.errors, ['story: You already have a story with this title.'])
+        self.assertEqual(Story.objects.count(), 1)
+
+    def test_import_view(self):
+        """Uploading an outline creates the story, and a bad outline lists its problems."""
+
+        url = reverse('import_story')
+        upload = SimpleUploadedFile('story.json', json.dumps(self.outline).encode())
+        response = self.client.post(url, {'outline': upload})
+        self.assertRedirects(response, reverse('story_detail', kwargs={'story_slug': 'imported-story'}))
+
+        upload = SimpleUploadedFile('story.json', b'{"title": ')
+        response = self.client.post(url, {'outline': upload})
+        self.assertContains(response, 'This is not valid JSON')
+
+
+class StoryGraphTestCase(TestCase):
+    """Test case for the JSON story graph endpoint."""
+
+    def setUp(self):
+
+        # Create new user, story, plot, plot point, scene and character objects
+        self.author1 = CustomUser.objects.create(
+            username='author1',
+            email='author1@exampleemail.com',
+            password='ILoveBooks123!',
+            first_name='Alice',
+            last_name='Writer'
+        )
+        self.story1 = Story.objects.create(title='Story 1', author_id=self.author1.id)
+        self.plot1 = Plot.objects.create(name='Plot 1', story=self.story1)
+        self.plotpoint1 = PlotPoint.objects.create(name='Point 1', plot=self.plot1)
+        self.character1 = Character.objects.create(first_name='Sam', full_name='Sam', story=self.story1)
+        self.scene1 = Scene.objects.create(title='Scene 1', story=self.story1, plotpoint=self.plotpoint1)
+        self.scene1.characters.add(self.character1)
+        self.url = reverse('story_graph', kwargs={'story_slug': self.story1.slug})
+
+        self.client.force_login(self.author1)
+
+        return super().setUp()
+
+    def graph(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        return json.loads(b''.join(response.streaming_content))
+
+    def test_graph_holds_the_story_structure(self):
+        """The graph lists plot points, scenes and characters, linked by ID."""
+
+        graph = self.graph()
+
+        self.assertEqual(graph['story']['title'], 'Story 1')
+        self.assertEqual(graph['plot']['name'], 'Plot 1')
+        self.assertEqual(graph['plot_points'], [{'id': self.plotpoint1.id, 'position': 1, 'name': 'Point 1', 'description': None}])
+        scene = graph['scenes'][0]
+        self.assertEqual((scene['position'], scene['plot_point'], scene['characters']), (1, self.plotpoint1.id, [self.character1.id]))
+        self.assertEqual(graph['characters'][0]['slug'], 'sam')
+
+    def test_query_count_is_fixed(self):
+        """A bigger story is read in the same number of queries."""
+
+        with CaptureQueriesContext(connection) as small:
+            self.graph()
+
+        for number in range(10):
+            character = Character.objects.create(first_name=f"Extra {number}", full_name=f"Extra {number}", story=self.story1)
+            scene = Scene.objects.create(title=f"Extra {number}", story=self.story1)
+            scene.characters.add(character, self.character1)
+            PlotPoint.objects.create(name=f"Extra {number}", plot=self.plot1)
+
+        with CaptureQueriesContext(connection) as large:
+            graph = self.graph()
+
+        self.assertEqual(len(graph['scenes']), 11)
+        self.assertEqual(len(large), len(small))
+
+    def test_missing_story_is_a_json_404(self):
+        """Unknown stories get a JSON error."""
+
+        response = self.client.get(reverse('story_graph', kwargs={'story_slug': 'missing'}))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json(), {'error': 'Story not found.'})
+
+
+class ConditionalGetTestCase(TestCase):
+    """Test case for ETag and Last-Modified validation of story pages."""
+
+    def setUp(self):
+
+        # Create new user, story, plot, scene and character objects
+        self.author1 = CustomUser.objects.create(
+            username='author1',
+            email='author1@exampleemail.com',
+            password='ILoveBooks123!',
+            first_name='Alice',
+            last_name='Writer'
+        )
+        self.story1 = Story.objects.create(title='Story 1', author_id=self.author1.id)
+        self.plot1 = Plot.objects.create(name='Plot 1', story=self.story1)
+        self.scene1 = Scene.objects.create(title='Scene 1', story=self.story1)
+        self.character1 = Character.objects.create(first_name='Sam', full_name='Sam', story=self.story1)
+        self.story_kwargs = {'story_slug': self.story1.slug}
+
+        self.client.force_login(self.author1)
+
+        return super().setUp()
+
+    def revalidate(self, url):
+        """Fetch a page, then ask for it again with its ETag."""
+
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        return first, self.client.get(url, headers={'If-None-Match': first['ETag']})
+
+    def test_unchanged_pages_are_not_modified(self):
+        """Story pages answer a matching ETag with 304 without loading child rows or rendering."""
+
+        urls = [
+            reverse('story_detail', kwargs=self.story_kwargs),
+            reverse('scenes', kwargs=self.story_kwargs),
+            reverse('scene_detail', kwargs={**self.story_kwargs, 'scene_order': 1}),
+            reverse('characters', kwargs=self.story_kwargs),
+            reverse('character_detail', kwargs={**self.story_kwargs, 'character_slug': 'sam'}),
+            reverse('plot_detail', kwargs=self.story_kwargs),
+        ]
+
+        # The scene page's note form sets the CSRF cookie, which is part of the ETag
+        self.client.get(urls[2])
+
+        for url in urls:
+            first = self.client.get(url)
+            self.assertIn('Last-Modified', first)
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url, headers={'If-None-Match': first['ETag']})
+
+            self.assertEqual(response.status_code, 304, url)
+            self.assertEqual(response['ETag'], first['ETag'])
+            self.assertFalse(response.templates, url)
+            tables = ' '.join(query['sql'] for query in queries)
+            self.assertNotIn('"app_scene"', tables, url)
+            self.assertNotIn('"app_character"', tables, url)
+
+    def test_child_changes_change_the_etag(self):
+        """Changing a scene or adding a note makes the story pages current again."""
+
+        url = reverse('scene_detail', kwargs={**self.story_kwargs, 'scene_order': 1})
+        first, _ = self.revalidate(url)
+        before = Story.objects.get(pk=self.story1.pk).date_last_saved
+
+        SceneNote.objects.create(scene=self.scene1, text='A new note.')
+
+        response = self.client.get(url, headers={'If-None-Match': first['ETag']})
+        self.assertContains(response, 'A new note.')
+        self.assertNotEqual(response['ETag'], first['ETag'])
+        self.assertGreater(Story.objects.get(pk=self.story1.pk).date_last_saved, before)
+
+    def test_story_list_follows_the_authors_stories(self):
+        """The story list is not modified until one of the author's stories changes or goes."""
+
+        url = reverse('stories')
+        first, second = self.revalidate(url)
+        self.assertEqual(second.status_code, 304)
+
+        Story.objects.create(title='Story 2', author_id=self.author1.id).delete()
+        self.assertEqual(self.client.get(url, headers={'If-None-Match': first['ETag']}).status_code, 304)
+
+        self.scene1.delete()
+        self.assertEqual(self.client.get(url, headers={'If-None-Match': first['ETag']}).status_code, 200)
+
+    def test_etags_follow_the_csrf_cookie(self):
+        """A page tagged under an old CSRF cookie is sent again, so its forms carry a valid token."""
+
+        url = reverse('story_detail', kwargs=self.story_kwargs)
+        first = self.client.get(url)
+
+        self.client.logout()
+        self.client.force_login(self.author1)
+        self.client.cookies['csrftoken'] = 'x' * 32
+        self.assertEqual(self.client.get(url, headers={'If-None-Match': first['ETag']}).status_code, 200)
+
+
+@mock.patch('app.views.ITEMS_PER_PAGE', 3)
+class KeysetPaginationTestCase(TestCase):
+    """Test case for cursor pagination of the story, scene and character lists."""
+
+    def setUp(self):
+
+        # Create new user and story objects, with seven scenes
+        self.author1 = CustomUser.objects.create(
+            username='author1',
+            email='author1@exampleemail.com',
+            password='ILoveBooks123!',
+            first_name='Alice',
+            last_name='Writer'
+        )
+        self.story1 = Story.objects.create(title='Story 1', author_id=self.author1.id)
+        for number in range(1, 8):
+            Scene.objects.create(title=f"Scene {number}", story=self.story1)
+        self.url = reverse('scenes', kwargs={'story_slug': self.story1.slug})
+
+        self.client.force_login(self.author1)
+        cache.clear()
+
+        return super().setUp()
+
+    def test_pages_follow_the_cursors(self):
+        """Next and previous cursors walk the list, and links keep their positions."""
+
+        first = self.client.get(self.url)
+        self.assertContains(first, 'href="3/update/"')
+        self.assertNotContains(first, 'Scene 4<')
+
+        second = self.client.get(self.url, {'cursor': first.context['scenes'].next_cursor})
+        self.assertContains(second, '<a href=4>Scene 4</a>')
+        self.assertContains(second, 'href="6/update/"')
+
+        last = self.client.get(self.url, {'cursor': second.context['scenes'].next_cursor})
+        self.assertEqual([scene.title for scene in last.context['scenes']], ['Scene 7'])
+        self.assertIsNone(last.context['scenes'].next_cursor)
+
+        back = self.client.get(self.url, {'cursor': last.context['scenes'].previous_cursor})
+        self.assertEqual([scene.title for scene in back.context['scenes']], ['Scene 4', 'Scene 5', 'Scene 6'])
+        self.assertEqual(back.context['scenes'].start, 4)
+
+    def test_deep_pages_cost_the_same(self):
+        """A later page runs no more queries than the first, and counts nothing while the story is unchanged."""
+
+        with CaptureQueriesContext(connection) as first:
+            response = self.client.get(self.url)
+        with CaptureQueriesContext(connection) as later:
+            self.client.get(self.url, {'cursor': response.context['scenes'].next_cursor})
+
+        self.assertEqual(len(later), len(first))
+        self.assertFalse([query for query in later if 'COUNT(' in query['sql']])
+
+    def test_positions_are_recounted_after_changes(self):
+        """A cursor from before an insert still numbers the page correctly."""
+
+        cursor = self.client.get(self.url).context['scenes'].next_cursor
+        first_scene = Scene.objects.filter(story=self.story1).order_by('order').first()
+        Scene.objects.bulk_create([Scene(title='Prologue', story=self.story1, order=first_scene.order - 1)])
+        Story.objects.filter(pk=self.story1.pk).bump_version()
+
+        page = self.client.get(self.url, {'cursor': cursor}).context['scenes']
+        self.assertEqual(page.items[0].title, 'Scene 4')
+        self.assertEqual(page.start, 5)
+
+    def test_bad_cursors_show_the_first_page(self):
+        """Tampered or malformed cursors fall back to the first page."""
+
+        cursor = self.client.get(self.url).context['scenes'].next_cursor
+        for bad in (cursor[:-2] + 'xx', 'nonsense'):
+            page = self.client.get(self.url, {'cursor': bad}).context['scenes']
+            self.assertEqual(page.start, 1)
+            self.assertEqual(page.items[0].title, 'Scene 1')
+
+    def test_story_and_character_lists_paginate(self):
+        """The story and character lists page by ID."""
+
+        for number in range(4):
+            Character.objects.create(first_name=f"Char{number}", full_name=f"Char{number}", story=self.story1)
+        page = KeysetPage(Character.objects.filter(story=self.story1), 'id', per_page=3)
+        self.assertEqual(len(page), 3)
+        rest = KeysetPage(Character.objects.filter(story=self.story1), 'id', page.next_cursor, per_page=3)
+        self.assertEqual([character.full_name for character in rest], ['Char3'])
+
+        for number in range(2, 6):
+            Story.objects.create(title=f"Story {number}", author_id=self.author1.id)
+        response = self.client.get(reverse('stories'))
+        self.assertEqual(len(response.context['stories']), 3)
+        self.assertContains(response, '?cursor=')
+
+
+class AsyncViewTestCase(TestCase):
+    """Test case for the async read-only views under ASGI."""
+
+    def setUp(self):
+
+        # Create new user objects, and a story with a scene, character and plot point
+        self.author1 = CustomUser.objects.create(
+            username='author1',
+            email='author1@exampleemail.com',
+            password='ILoveBooks123!',
+            first_name='Alice',
+            last_name='Writer'
+        )
+        self.author2 = CustomUser.objects.create(
+            username='author2',
+            email='author2@exampleemail.com',
+            password='ILoveBooks123!',
+            first_name='Bob',
+            last_name='Writer'
+        )
+        self.story1 = Story.objects.create(title='Story 1', author_id=self.author1.id)
+        self.plot1 = Plot.objects.create(name='Plot 1', story=self.story1)
+        self.plotpoint1 = PlotPoint.objects.create(name='Point 1', plot=self.plot1)
+        self.character1 = Character.objects.create(first_name='Ann', full_name='Ann', story=self.story1)
+        self.scene1 = Scene.objects.create(title='Scene 1', story=self.story1)
+        self.scene1.characters.add(self.character1)
+        SceneNote.objects.create(scene=self.scene1, text='First note')
+
+        slug = {'story_slug': self.story1.slug}
+        self.pages = {
+            reverse('stories'): 'Story 1',
+            reverse('story_detail', kwargs=slug): '(author1)',
+            reverse('scenes', kwargs=slug): 'Scene 1',
+            reverse('scene_detail', kwargs={**slug, 'scene_order': 1}): 'First note',
+            reverse('characters', kwargs=slug): 'Ann',
+            reverse('character_detail', kwargs={**slug, 'character_slug': self.character1.slug}): 'Ann',
+            reverse('plot_detail', kwargs=slug): 'Point 1',
+            reverse('plotpoint_detail', kwargs={**slug, 'plotpoint_order': 1}): 'Point 1',
+        }
+        cache.clear()
+
+        return super().setUp()
+
+    async def test_read_pages_render_under_asgi(self):
+        """Every read-only page renders through the ASGI handler, on a cold and a warm cache."""
+
+        await self.async_client.aforce_login(self.author1)
+        for url, text in self.pages.items():
+            for _ in range(2):
+                response = await self.async_client.get(url)
+                self.assertContains(response, text)
+
+    async def test_readers_must_log_in(self):
+        """Anonymous readers are sent to the login page, and other authors' stories are not found."""
+
+        for url in self.pages:
+            response = await self.async_client.get(url)
+            self.assertEqual(response.status_code, 302)
+            self.assertTrue(response['Location'].startswith('/accounts/login/?next='))
+
+        await self.async_client.aforce_login(self.author2)
+        response = await self.async_client.get(reverse('story_detail', kwargs={'story_slug': self.story1.slug}))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_conditional_and_post_requests(self):
+        """Unchanged pages answer 304, and the note form still saves."""
+
+        await self.async_client.aforce_login(self.author1)
+        url = reverse('story_detail', kwargs={'story_slug': self.story1.slug})
+        await self.async_client.get(url)
+        etag = (await self.async_client.get(url))['ETag']
+        response = await self.async_client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+
+        url = reverse('scene_detail', kwargs={'story_slug': self.story1.slug, 'scene_order': 1})
+        await self.async_client.post(url, {'note': 'Second note'})
+        self.assertContains(await self.async_client.get(url), 'Second note')
+
+    def test_cached_fragments_skip_loading(self):
+        """A warm fragment cache skips reading the scene list and the scene's notes."""
+
+        self.client.force_login(self.author1)
+        for url in (reverse('scenes', kwargs={'story_slug': self.story1.slug}), reverse('scene_detail', kwargs={'story_slug': self.story1.slug, 'scene_order': 1})):
+            self.client.get(url)
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(url)
+            self.assertFalse([query for query in queries if 'app_scenenote' in query['sql'] or 'ORDER BY "app_scene"."order" ASC LIMIT 51' in query['sql']])
+
+    async def test_async_loading_matches_sync(self):
+        """Pages and lookups read with the async ORM match their sync versions."""
+
+        for number in range(2, 5):
+            await Scene.objects.acreate(title=f"Scene {number}", story_id=self.story1.id)
+        scenes = Scene.objects.filter(story_id=self.story1.id)
+
+        page = await KeysetPage(scenes, 'order', per_page=3).aload()
+        rest = await KeysetPage(scenes, 'order', page.next_cursor, per_page=3).aload()
+        self.assertEqual([scene.title for scene in page], ['Scene 1', 'Scene 2', 'Scene 3'])
+        self.assertEqual([scene.title for scene in rest], ['Scene 4'])
+        self.assertEqual(rest.start, 4)
+
+        notes = await aget_page(SceneNote.objects.filter(scene_id=self.scene1.id), 20, 5)
+        self.assertEqual([note.text for note in notes], ['First note'])
+        self.assertEqual(notes.number, 1)
+
+        self.assertEqual((await aget_scene(self.story1.id, 4)).title, 'Scene 4')
+        self.assertIsNone(await aget_scene(self.story1.id, 5))
+        self.assertIsNone(await aget_story_by_slug(self.story1.slug, self.author2.id))
+        self.assertEqual((await aget_plotpoint(self.story1.slug, 1, self.author1.id)).name, 'Point 1')
+
+
+class DatabaseRoutingTestCase(TransactionTestCase):
+    """Test case for the SQLite pragmas and the routing of reads to the read-only connection."""
+
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+
+        # Start unpinned, as a new request would
+        self.pinned = primary_pinned.set(False)
+
+        # Create new user and story objects
+        self.author1 = CustomUser.objects.create(
+            username='author1',
+            email='author1@exampleemail.com',
+            password='ILoveBooks123!',
+            first_name='Alice',
+            last_name='Writer'
+        )
+        self.story1 = Story.objects.create(title='Story 1', author_id=self.author1.id)
+        Plot.objects.create(name='Plot 1', story=self.story1)
+        Scene.objects.create(title='Scene 1', story=self.story1)
+        self.url = reverse('story_detail', kwargs={'story_slug': self.story1.slug})
+        self.client.force_login(self.author1)
+        cache.clear()
+
+        return super().setUp()
+
+    def tearDown(self):
+        primary_pinned.reset(self.pinned)
+        return super().tearDown()
+
+    def test_pragmas_are_applied(self):
+        """Every connection gets the configured pragmas, and the read-only one refuses writes."""
+
+        for alias in ('default', 'replica'):
+            with connections[alias].cursor() as cursor:
+                cursor.execute('PRAGMA busy_timeout')
+                self.assertEqual(cursor.fetchone()[0], settings.SQLITE_PRAGMAS['busy_timeout'])
+                cursor.execute('PRAGMA cache_size')
+                self.assertEqual(cursor.fetchone()[0], settings.SQLITE_PRAGMAS['cache_size'])
+
+        with self.assertRaises(OperationalError):
+            with connections['replica'].cursor() as cursor:
+                cursor.execute('UPDATE app_story SET word_count = 1')
+
+    def test_reads_go_to_the_replica_until_a_write(self):
+        """Reads use the read-only connection, and the primary after a write or inside a transaction."""
+
+        def route():
+            primary_pinned.set(False)
+            reads = [router.db_for_read(Story)]
+            with transaction.atomic():
+                reads.append(router.db_for_read(Story))
+            Story.objects.filter(pk=self.story1.pk).update(word_count=10)
+            reads.append(router.db_for_read(Story))
+            return reads
+
+        self.assertEqual(contextvars.copy_context().run(route), ['replica', 'default', 'default'])
+        self.assertFalse(router.allow_migrate('replica', 'app'))
+
+    def test_requests_read_their_own_writes(self):
+        """Page views read from the replica, and form posts stay on the primary throughout."""
+
+        with CaptureQueriesContext(connections['default']) as primary, CaptureQueriesContext(connections['replica']) as replica:
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.assertEqual(len(primary), 0)
+        self.assertGreater(len(replica), 0)
+
+        url = reverse('update_scene', kwargs={'story_slug': self.story1.slug, 'scene_order': 1})
+        with CaptureQueriesContext(connections['replica']) as replica:
+            self.client.post(url, {'title': 'Scene 1', 'description': 'A scene', 'prose': 'Three words here'})
+        self.assertEqual(len(replica), 0)
+        self.assertEqual(Story.objects.get(pk=self.story1.pk).word_count, 3)
+
+
+class ReadAfterWriteTestCase(QueryBudgetMixin, TransactionTestCase):
+    """Test case for reads following a request's own writes, outside of any test transaction."""
+
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+
+        # Create new user and story objects
+        self.author1 = CustomUser.objects.create(
+            username='author1',
+            email='author1@exampleemail.com',
+            password='ILoveBooks123!',
+            first_name='Alice',
+            last_name='Writer'
+        )
+        self.story1 = Story.objects.create(title='Story 1', author_id=self.author1.id)
+        Plot.objects.create(name='Plot 1', story=self.story1)
+        self.client.force_login(self.author1)
+        cache.clear()
+
+        return super().setUp()
+
+    def queries_of(self, request_method: str) -> list:
+        """Run a request through the middleware to a view that reads, writes and reads again.
+
+        Returns the alias of each query and whether it was a read.
+        """
+
+        queries = []
+
+        def record(execute, sql, params, many, context):
+            queries.append((context['connection'].alias, sql.startswith('SELECT')))
+            return execute(sql, params, many, context)
+
+        def view(request):
+            Story.objects.get(pk=self.story1.pk)
+            Story.objects.filter(pk=self.story1.pk).update(word_count=5)
+            Story.objects.get(pk=self.story1.pk)
+
+        request = getattr(RequestFactory(), request_method)('/')
+        with connections['default'].execute_wrapper(record), connections['replica'].execute_wrapper(record):
+            contextvars.copy_context().run(ReadAfterWriteMiddleware(view), request)
+        return queries
+
+    def test_get_reads_from_the_replica(self):
+        """A plain page view reads only from the read-only connection, and its budget counts those reads."""
+
+        url = reverse('story_detail', kwargs={'story_slug': self.story1.slug})
+        with CaptureQueriesContext(connections['default']) as primary, CaptureQueriesContext(connections['replica']) as replica:
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+        self.assertEqual(len(primary), 0)
+        self.assertGreater(len(replica), 0)
+
+        # Budgets count the replica's reads as well
+        cache.clear()
+        with self.settings(QUERY_BUDGETS={'story_detail': len(replica) - 1}):
+            with self.assertRaises(AssertionError):
+                self.assertWithinQueryBudget('story_detail', story_slug=self.story1.slug)
+
+    def test_reads_after_a_write_stay_on_the_primary(self):
+        """A GET reads from the replica until it writes; a POST reads from the primary throughout."""
+
+        self.assertEqual(self.queries_of('get'), [('replica', True), ('default', False), ('default', True)])
+        self.assertEqual(self.queries_of('post'), [('default', True), ('default', False), ('default', True)])
+
+
+class WritingProgressTestCase(TestCase):
+    """Test case for the word count time series, its rollups and the writing stats."""
+
+    def setUp(self):
+
+        # Create new user and story objects
+        self.author1 = CustomUser.objects.create(
+            username='author1',
+            email='author1@exampleemail.com',
+            password='ILoveBooks123!',
+            first_name='Alice',
+            last_name='Writer'
+        )
+        self.story1 = Story.objects.create(title='Story 1', author_id=self.author1.id)
+        self.story2 = Story.objects.create(title='Story 2', author_id=self.author1.id)
+        Plot.objects.create(name='Plot 1', story=self.story1)
+        self.client.force_login(self.author1)
+        self.today = timezone.localdate()
+
+        return super().setUp()
+
+    def days_ago(self, days: int):
+        return timezone.now() - timedelta(days=days)
+
+    def test_updates_are_recorded(self):
+        """Each prose save that changes the words appends an event and adds its words to the day's rollup."""
+
+        scene = Scene.objects.create(title='Scene 1', story=self.story1, prose='one two three')
+        scene.prose = 'one two three four five'
+        scene.save()
+        scene.save()
+
+        self.assertEqual(Story.objects.get(pk=self.story1.pk).word_count, 5)
+        self.assertEqual(list(WordCountEvent.objects.values_list('word_count', flat=True).order_by('id')), [3, 5])
+        rollup = WordCountRollup.objects.get()
+        self.assertEqual((rollup.period, rollup.start, rollup.words, rollup.updates, rollup.word_count), ('day', self.today, 5, 2, 5))
+
+    def test_stats_come_from_the_rollups(self):
+        """The stats give words per day, streaks and totals across stories without reading raw events."""
+
+        for days, story, words in [(6, self.story1, 100), (5, self.story1, 200), (4, self.story2, 300), (1, self.story1, 50), (0, self.story2, 400), (0, self.story1, -20)]:
+            record_words(story.pk, words, recorded_at=self.days_ago(days))
+
+        with CaptureQueriesContext(connection) as queries:
+            stats = self.client.get(reverse('writing_stats'), {'days': 7}).json()
+        self.assertFalse([query for query in queries if 'app_wordcountevent' in query['sql']])
+
+        self.assertEqual([day['words'] for day in stats['days']], [100, 200, 300, 0, 0, 50, 380])
+        self.assertEqual(stats['days'][-1]['date'], self.today.isoformat())
+        self.assertEqual(stats['streak'], {'current': 2, 'longest': 3})
+        self.assertEqual(stats['totals']['today'], 380)
+        self.assertEqual(stats['totals']['all_time'], 1030)
+        self.assertEqual(stats['totals']['word_count'], 1030)
+
+    def test_compaction_keeps_the_totals(self):
+        """Old raw events are dropped and old days fold into weeks without changing the totals."""
+
+        record_words(self.story1.pk, 700, recorded_at=self.days_ago(60))
+        record_words(self.story1.pk, 200, recorded_at=self.days_ago(59))
+        record_words(self.story1.pk, 100)
+        before = self.client.get(reverse('writing_stats')).json()['totals']
+
+        result = compact(raw_days=30, daily_days=14)
+        self.assertEqual(result, {'events': 2, 'daily': 2})
+        self.assertEqual(WordCountEvent.objects.count(), 1)
+        weeks = WordCountRollup.objects.filter(period=WordCountRollup.WEEK)
+        self.assertEqual(sum(week.words for week in weeks), 900)
+        self.assertTrue(all(week.start.weekday() == 0 for week in weeks))
+
+        self.assertEqual(self.client.get(reverse('writing_stats')).json()['totals'], before)
+
+
+class SceneProseTestCase(TestCase):
+    """Test case for scene prose and the word counts kept from each save's changes."""
+
+    def setUp(self):
+
+        # Create new user and story objects
+        self.author1 = CustomUser.objects.create(
+            username='author1',
+            email='author1@exampleemail.com',
+            password='ILoveBooks123!',
+            first_name='Alice',
+            last_name='Writer'
+        )
+        self.story1 = Story.objects.create(title='Story 1', author_id=self.author1.id)
+        self.scene1 = Scene.objects.create(title='Scene 1', story=self.story1, prose='The fog came in over the harbor.')
+        self.scene2 = Scene.objects.create(title='Scene 2', story=self.story1, prose='Bells rang.')
+
+        return super().setUp()
+
+    def word_count(self):
+        return Story.objects.get(pk=self.story1.pk).word_count
+
+    def test_story_count_is_the_sum_of_the_scenes(self):
+        """Creating, editing and deleting scenes keeps the story's word count equal to the sum of its scenes."""
+
+        self.assertEqual((self.scene1.word_count, self.scene2.word_count, self.word_count()), (7, 2, 9))
+
+        scene = Scene.objects.get(pk=self.scene1.pk)
+        scene.prose = 'The thick fog came in slowly over the old harbor.'
+        scene.save()
+        self.assertEqual(Scene.objects.get(pk=self.scene1.pk).word_count, 10)
+        self.assertEqual(self.word_count(), 12)
+
+        scene.prose = 'Fog.'
+        scene.save(update_fields=['prose'])
+        self.assertEqual(Scene.objects.get(pk=self.scene1.pk).word_count, 1)
+        self.assertEqual(self.word_count(), 3)
+
+        self.scene2.delete()
+        self.assertEqual(self.word_count(), 1)
+
+    def test_edits_count_only_the_changed_words(self):
+        """The count of an edit matches a full count, and the save never reads other scenes or recounts the text."""
+
+        words = [f"word{number}" for number in range(5000)]
+        scene = Scene.objects.get(pk=self.scene1.pk)
+        scene.prose = ' '.join(words)
+        scene.save()
+
+        words[2500:2501] = ['two', 'new words']
+        scene.prose = ' '.join(words)
+        with mock.patch('app.wordcount.count_words', wraps=count_words) as counter:
+            with CaptureQueriesContext(connection) as queries:
+                scene.save()
+
+        self.assertLess(max(len(call.args[0]) for call in counter.call_args_list), 100)
+        self.assertFalse([query for query in queries if query['sql'].startswith('SELECT') and '"app_scene"' in query['sql']])
+        self.assertEqual(Scene.objects.get(pk=self.scene1.pk).word_count, 5002)
+        self.assertEqual(self.word_count(), 5004)
+
+    def test_scene_form_saves_prose(self):
+        """The scene form saves the prose and the scene page shows it with its word count."""
+
+        self.client.force_login(self.author1)
+        kwargs = {'story_slug': self.story1.slug, 'scene_order': 2}
+        self.client.post(reverse('update_scene', kwargs=kwargs), {'title': 'Scene 2', 'description': 'Noon', 'prose': 'Bells rang out at noon.'})
+
+        self.assertEqual(self.word_count(), 12)
+        self.assertContains(self.client.get(reverse('scene_detail', kwargs=kwargs)), '5 words')
+
+    def test_imports_and_recounts_use_the_prose(self):
+        """Imported scenes are counted from their prose, and the recount command repairs drifted counts."""
+
+        story = import_outline(self.author1, [json.dumps({
+            'title': 'Imported Story', 'word_count': 999,
+            'scenes': [{'title': 'Harbor', 'prose': 'Fog over the water.'}, {'title': 'Crown'}]
+        })], 'json')
+        self.assertEqual(story.word_count, 4)
+
+        Scene.objects.filter(pk=self.scene1.pk).update(word_count=0)
+        Story.objects.filter(pk=self.story1.pk).update(word_count=0)
+        call_command('recount_stories', prose=True, stdout=StringIO())
+        self.assertEqual(self.word_count(), 9)
+
+
+class RevisionTestCase(TestCase):
+    """Test case for the revision history of stories, scenes and characters."""
+
+    def setUp(self):
+
+        # Create new user and story objects
+        self.author1 = CustomUser.objects.create(
+            username='author1',
+            email='author1@exampleemail.com',
+            password='ILoveBooks123!',
+            first_name='Alice',
+            last_name='Writer'
+        )
+        self.story1 = Story.objects.create(title='Story 1', description='A story.', author_id=self.author1.id)
+        self.opening = ' '.join(f"Line {number} of chapter one." for number in range(2000))
+        self.scene1 = Scene.objects.create(title='Scene 1', story=self.story1, prose=self.opening)
+        self.client.force_login(self.author1)
+
+        return super().setUp()
+
+    def edit(self, times: int):
+        """Save the scene `times` times, appending a sentence each time, and return every version of its prose."""
+
+        versions = [self.scene1.prose]
+        for number in range(times):
+            self.scene1.prose += f" Sentence {number}."
+            self.scene1.save()
+            versions.append(self.scene1.prose)
+        return versions
+
+    @override_settings(REVISION_SNAPSHOT_INTERVAL=5)
+    def test_every_revision_rebuilds_from_a_bounded_chain(self):
+        """Revisions are small deltas between snapshots, and each one rebuilds its exact text."""
+
+        versions = self.edit(11)
+        revisions = revisions_of(self.scene1)
+
+        self.assertEqual(list(revisions.filter(base=F('number')).values_list('number', flat=True)), [1, 6, 11])
+        snapshot = revisions.get(number=1)
+        self.assertTrue(all(len(delta.data) < len(snapshot.data) / 10 for delta in revisions.exclude(base=F('number'))))
+
+        for number, prose in enumerate(versions, start=1):
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(fields_at(revisions, number)['prose'], prose)
+            self.assertEqual(len(queries), 1)
+
+        self.scene1.save()
+        self.assertEqual(revisions.count(), 12)
+
+    def test_revision_views(self):
+        """The revision list and revision pages show the history of a scene, character and story."""
+
+        self.edit(2)
+        scene_kwargs = {'story_slug': self.story1.slug, 'scene_order': 1}
+        listing = self.client.get(reverse('scene_revisions', kwargs=scene_kwargs)).json()
+        self.assertEqual([row['number'] for row in listing['revisions']], [3, 2, 1])
+        self.assertIsNone(listing['before'])
+
+        first = self.client.get(reverse('scene_revision', kwargs={**scene_kwargs, 'number': 1})).json()
+        self.assertEqual(first['fields']['prose'], self.opening)
+        self.assertEqual(self.client.get(reverse('scene_revision', kwargs={**scene_kwargs, 'number': 4})).status_code, 404)
+
+        character = Character.objects.create(first_name='Sam', full_name='Sam', story=self.story1)
+        character.age = 30
+        character.save()
+        character_kwargs = {'story_slug': self.story1.slug, 'character_slug': 'sam'}
+        self.assertEqual(self.client.get(reverse('character_revision', kwargs={**character_kwargs, 'number': 2})).json()['fields']['age'], 30)
+
+        self.client.post(reverse('update_story', kwargs={'story_slug': self.story1.slug}), {'title': 'Story 1', 'description': 'A longer story.'})
+        story_fields = self.client.get(reverse('story_revision', kwargs={'story_slug': self.story1.slug, 'number': 2})).json()['fields']
+        self.assertEqual(story_fields['description'], 'A longer story.')
+
+    @override_settings(REVISION_SNAPSHOT_INTERVAL=4)
+    def test_compaction_rebases_the_kept_revisions(self):
+        """Compaction deletes revisions past the retention policy and keeps the rest rebuildable."""
+
+        versions = self.edit(9)
+        revisions = revisions_of(self.scene1)
+        revisions.filter(number__lte=7).update(created_at=timezone.now() - timedelta(days=100))
+
+        result = compact_revisions(keep=4, keep_days=90)
+        self.assertEqual(result, {'deleted': 6, 'rebased': 1})
+        self.assertEqual(list(revisions.values_list('number', flat=True).order_by('number')), [7, 8, 9, 10])
+        self.assertTrue(revisions.get(number=7).is_snapshot)
+        for number in range(7, 11):
+            self.assertEqual(fields_at(revisions, number)['prose'], versions[number - 1])
+
+        self.scene1.delete()
+        self.assertFalse(revisions.exists())
+
+
+class AutosaveTestCase(TestCase):
+    """Test case for autosaving partial patches of scenes and characters."""
+
+    def setUp(self):
+
+        # Create new user and story objects
+        self.author1 = CustomUser.objects.create(
+            username='author1',
+            email='author1@exampleemail.com',
+            password='ILoveBooks123!',
+            first_name='Alice',
+            last_name='Writer'
+        )
+        self.story1 = Story.objects.create(title='Story 1', author_id=self.author1.id)
+        self.scene1 = Scene.objects.create(title='Scene 1', description='A scene.', story=self.story1)
+        self.character1 = Character.objects.create(first_name='Sam', full_name='Sam', story=self.story1)
+        self.scene_url = reverse('autosave_scene', kwargs={'story_slug': self.story1.slug, 'scene_order': 1})
+        self.client.force_login(self.author1)
+        cache.clear()
+
+        return super().setUp()
+
+    def patch(self, url, patch, flush=False):
+        return self.client.post(url + ('?flush=1' if flush else ''), json.dumps(patch), content_type='application/json')
+
+    def test_patch_writes_only_the_sent_fields(self):
+        """A patch is validated and written on its own, and only its columns are updated."""
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.patch(self.scene_url, {'prose': 'The fog came in.'})
+
+        self.assertEqual(response.json(), {'saved': ['prose'], 'pending': []})
+        update = next(query['sql'] for query in queries if query['sql'].startswith('UPDATE "app_scene"'))
+        self.assertIn('"prose"', update)
+        self.assertNotIn('"title"', update)
+        scene = Scene.objects.get(pk=self.scene1.pk)
+        self.assertEqual((scene.title, scene.prose, scene.word_count), ('Scene 1', 'The fog came in.', 4))
+        self.assertEqual(Story.objects.get(pk=self.story1.pk).word_count, 4)
+
+        response = self.patch(self.scene_url, {'title': ''}, flush=True)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('title', response.json()['errors'])
+        self.assertEqual(self.patch(self.scene_url, {'story': 2}).status_code, 400)
+
+    def test_patches_within_the_interval_are_coalesced(self):
+        """Patches inside the interval are buffered and written together, once per interval or on a flush."""
+
+        self.patch(self.scene_url, {'prose': 'One.'})
+        with CaptureQueriesContext(connection) as queries:
+            first = self.patch(self.scene_url, {'prose': 'One two.'}).json()
+            second = self.patch(self.scene_url, {'title': 'Harbor'}).json()
+        self.assertFalse([query for query in queries if query['sql'].startswith('UPDATE "app_scene"')])
+        self.assertEqual(first['pending'], ['prose'])
+        self.assertEqual(second['pending'], ['prose', 'title'])
+        self.assertGreater(second['retry_after'], 0)
+        self.assertEqual(Scene.objects.get(pk=self.scene1.pk).prose, 'One.')
+
+        self.assertEqual(self.patch(self.scene_url, {}, flush=True).json(), {'saved': ['prose', 'title'], 'pending': []})
+        scene = Scene.objects.get(pk=self.scene1.pk)
+        self.assertEqual((scene.title, scene.prose, scene.word_count), ('Harbor', 'One two.', 2))
+
+        # The next patch after the interval is written straight away
+        pending_patches(scene, self.client.session.session_key).update(written_at=0)
+        self.assertEqual(self.patch(self.scene_url, {'prose': 'One two three.'}).json()['saved'], ['prose'])
+
+    def test_pending_patches_are_shared_between_workers(self):
+        """Patches buffered by one worker are written by the flush another worker handles, the newest value of a field winning."""
+
+        scene = Scene.objects.get(pk=self.scene1.pk)
+        self.assertEqual(save_patch(scene, {'title': 'Harbor'}, 'editor')['saved'], ['title'])
+        self.assertEqual(save_patch(scene, {'title': 'Quay'}, 'editor')['pending'], ['title'])
+
+        # Nothing pending lives in the worker's own memory
+        cache.clear()
+        scene = Scene.objects.get(pk=self.scene1.pk)
+        self.assertEqual(save_patch(scene, {'prose': 'The fog came in.'}, 'editor')['pending'], ['prose', 'title'])
+        self.assertEqual(save_patch(scene, {}, 'editor', flush=True), {'saved': ['prose', 'title'], 'pending': []})
+
+        scene = Scene.objects.get(pk=self.scene1.pk)
+        self.assertEqual((scene.title, scene.prose), ('Quay', 'The fog came in.'))
+        self.assertEqual(pending_patches(scene, 'editor').get().patch, {})
+
+        # A later flush has nothing stale left to write over newer text
+        Scene.objects.filter(pk=scene.pk).update(title='Pier')
+        self.assertEqual(save_patch(Scene.objects.get(pk=scene.pk), {}, 'editor', flush=True)['saved'], [])
+        self.assertEqual(Scene.objects.get(pk=scene.pk).title, 'Pier')
+
+    def test_invalid_pending_field_keeps_the_others(self):
+        """A pending field that no longer validates is reported and dropped, and the other pending fields are written next."""
+
+        PendingPatch.objects.create(
+            story=self.story1, kind=PendingPatch.SCENE, object_id=self.scene1.pk, editor='editor',
+            patch={'title': '', 'prose': 'The fog came in.'}, written_at=timezone.now().timestamp()
+        )
+
+        with self.assertRaises(PatchError) as raised:
+            save_patch(Scene.objects.get(pk=self.scene1.pk), {}, 'editor', flush=True)
+        self.assertEqual(list(raised.exception.errors), ['title'])
+        self.assertEqual(pending_patches(self.scene1, 'editor').get().patch, {'prose': 'The fog came in.'})
+
+        self.assertEqual(save_patch(Scene.objects.get(pk=self.scene1.pk), {}, 'editor', flush=True)['saved'], ['prose'])
+        self.assertEqual(Scene.objects.get(pk=self.scene1.pk).prose, 'The fog came in.')
+
+    def test_deleting_a_scene_drops_its_pending_patch(self):
+        """The unwritten patches of a deleted scene are deleted with it."""
+
+        save_patch(self.scene1, {'prose': 'One.'}, 'editor')
+        save_patch(self.scene1, {'prose': 'One two.'}, 'editor')
+        self.scene1.delete()
+        self.assertFalse(PendingPatch.objects.exists())
+
+    def test_character_patch(self):
+        """A character patch converts JSON values and moves a renamed character to its new slug."""
+
+        url = reverse('autosave_character', kwargs={'story_slug': self.story1.slug, 'character_slug': 'sam'})
+        response = self.patch(url, {'last_name': 'Grey', 'age': 30, 'personality_traits': ['brave']}).json()
+
+        self.assertEqual(response['slug'], 'sam-grey')
+        character = Character.objects.get(pk=self.character1.pk)
+        self.assertEqual((character.full_name, character.slug, character.age, character.personality_traits), ('Sam Grey', 'sam-grey', 30, ['brave']))
+
+
+class RelationshipGraphTestCase(TestCase):
+    """Test case for character relationships and the graph queries over them."""
+
+    def setUp(self):
+
+        # Create new user, story and character objects
+        self.author1 = CustomUser.objects.create(
+            username='author1',
+            email='author1@exampleemail.com',
+            password='ILoveBooks123!',
+            first_name='Alice',
+            last_name='Writer'
+        )
+        self.story1 = Story.objects.create(title='Story 1', author_id=self.author1.id)
+        self.characters = {
+            name: Character.objects.create(first_name=name, full_name=name, story=self.story1)
+            for name in ['Ann', 'Ben', 'Cal', 'Dee', 'Eve']
+        }
+        self.story_kwargs = {'story_slug': self.story1.slug}
+        self.client.force_login(self.author1)
+
+        return super().setUp()
+
+    def relate(self, source, target, kind='friend'):
+        data = {'source': source, 'target': target, 'kind': kind}
+        return self.client.post(reverse('relationships', kwargs=self.story_kwargs), json.dumps(data), content_type='application/json')
+
+    def test_relationships_are_validated(self):
+        """Relationships need two characters of the story, once per kind and pair in either direction."""
+
+        other_story = Story.objects.create(title='Story 2', author_id=self.author1.id)
+        Character.objects.create(first_name='Zed', full_name='Zed', story=other_story)
+
+        self.assertEqual(self.relate('ann', 'ben').status_code, 201)
+        self.assertEqual(self.relate('ben', 'ann', 'rival').status_code, 201)
+        self.assertEqual(self.relate('ben', 'ann').json(), {'errors': {'__all__': ['These characters already have this relationship.']}})
+        self.assertEqual(self.relate('ann', 'ann').status_code, 400)
+        self.assertIn('target', self.relate('ann', 'zed').json()['errors'])
+        self.assertEqual(self.relate('ann', 'cal', 'nemesis').status_code, 400)
+        response = self.client.post(reverse('relationships', kwargs=self.story_kwargs), '["ann", "ben"]', content_type='application/json')
+        self.assertEqual(response.json(), {'error': 'The request body must be a JSON object.'})
+
+        listing = self.client.get(reverse('relationships', kwargs=self.story_kwargs)).json()
+        self.assertEqual([(row['source'], row['target'], row['kind']) for row in listing['relationships']], [
+            ('ann', 'ben', 'friend'), ('ben', 'ann', 'rival')
+        ])
+
+    def test_reverse_pair_is_unique_in_the_database(self):
+        """The database refuses the reverse of an existing pair of the same kind, even past form validation."""
+
+        ann, ben = self.characters['Ann'], self.characters['Ben']
+        Relationship.objects.create(story=self.story1, source=ann, target=ben, kind='friend')
+        Relationship.objects.create(story=self.story1, source=ben, target=ann, kind='rival')
+
+        with transaction.atomic(), self.assertRaises(IntegrityError):
+            Relationship.objects.create(story=self.story1, source=ben, target=ann, kind='friend')
+
+        # A request that loses the race to a concurrent one gets the form error
+        with mock.patch.object(Relationship, 'validate_constraints'):
+            response = self.relate('ben', 'ann')
+        self.assertEqual(response.json(), {'errors': {'__all__': ['These characters already have this relationship.']}})
+
+    def test_graph_queries(self):
+        """Neighbors, shortest paths and groups are answered from the story's relationships."""
+
+        self.relate('ann', 'ben', 'family')
+        self.relate('ben', 'cal')
+        self.relate('cal', 'ann', 'rival')
+        self.relate('cal', 'dee')
+
+        neighbors = self.client.get(
+            reverse('character_neighbors', kwargs={**self.story_kwargs, 'character_slug': 'ann'}), {'depth': 2}
+        ).json()['neighbors']
+        self.assertEqual([(item['slug'], item['distance'], item['via']) for item in neighbors], [
+            ('ben', 1, 'ann'), ('cal', 1, 'ann'), ('dee', 2, 'cal')
+        ])
+        self.assertEqual([edge['kind'] for edge in neighbors[1]['relationships']], ['rival'])
+
+        url = reverse('relationship_path', kwargs=self.story_kwargs)
+        path = self.client.get(url, {'from': 'ann', 'to': 'dee'}).json()
+        self.assertEqual((path['length'], [item['slug'] for item in path['path']]), (2, ['ann', 'cal', 'dee']))
+        path = self.client.get(url, {'from': 'ann', 'to': 'dee', 'kind': ['family', 'friend']}).json()
+        self.assertEqual([item['slug'] for item in path['path']], ['ann', 'ben', 'cal', 'dee'])
+        self.assertIsNone(self.client.get(url, {'from': 'ann', 'to': 'eve'}).json()['path'])
+        self.assertEqual(self.client.get(url, {'from': 'ann', 'to': 'nobody'}).status_code, 404)
+
+        groups = self.client.get(reverse('relationship_groups', kwargs=self.story_kwargs), {'kind': 'family'}).json()['groups']
+        self.assertEqual([[item['slug'] for item in group] for group in groups], [['ann', 'ben']])
+
+    def test_graph_is_rebuilt_only_when_relationships_change(self):
+        """Other writes to the story keep the cached graph; adding or removing a relationship replaces it."""
+
+        self.relate('ann', 'ben')
+        graph = get_graph(Story.objects.get(pk=self.story1.pk))
+
+        self.characters['Cal'].description = 'Tall.'
+        self.characters['Cal'].save()
+        Scene.objects.create(title='Scene 1', story=self.story1)
+        with self.assertNumQueries(1):
+            self.assertIs(get_graph(Story.objects.get(pk=self.story1.pk)), graph)
+
+        self.relate('ben', 'cal')
+        graph = get_graph(Story.objects.get(pk=self.story1.pk))
+        self.assertEqual(graph.shortest_path(self.characters['Ann'].id, self.characters['Cal'].id), [
+            self.characters[name].id for name in ['Ann', 'Ben', 'Cal']
+        ])
+
+        # Deleting a character removes its relationships from the graph
+        self.characters['Ben'].delete()
+        graph = get_graph(Story.objects.get(pk=self.story1.pk))
+        self.assertEqual((graph.edges, graph.groups()), ({}, []))
+
+
+class CooccurrenceTestCase(TestCase):
+    """Test case for the character co-occurrence analytics."""
+
+    def setUp(self):
+
+        # Create new user, story, character and scene objects
+        self.author1 = CustomUser.objects.create(
+            username='author1',
+            email='author1@exampleemail.com',
+            password='ILoveBooks123!',
+            first_name='Alice',
+            last_name='Writer'
+        )
+        self.story1 = Story.objects.create(title='Story 1', author_id=self.author1.id)
+        ann, ben, cal = [
+            Character.objects.create(first_name=name, full_name=name, story=self.story1) for name in ['Ann', 'Ben', 'Cal']
+        ]
+        Character.objects.create(first_name='Dee', full_name='Dee', story=self.story1)
+        for cast in [[ann, ben], [ann, ben, cal], [], [cal]]:
+            scene = Scene.objects.create(title='Scene', description='A scene.', story=self.story1)
+            scene.characters.set(cast)
+        self.url = reverse('character_cooccurrence', kwargs={'story_slug': self.story1.slug})
+        self.client.force_login(self.author1)
+        cache.clear()
+
+        return super().setUp()
+
+    def test_matrices_follow_scene_membership(self):
+        """Shared scenes, presence per segment and first and last scenes come from the scene characters."""
+
+        summary = self.client.get(self.url, {'segments': 2}).json()
+
+        self.assertEqual(summary['scene_count'], 4)
+        self.assertEqual(
+            [(item['slug'], item['scenes'], item['first'], item['last']) for item in summary['characters']],
+            [('ann', 2, 1, 2), ('ben', 2, 1, 2), ('cal', 2, 2, 4), ('dee', 0, None, None)]
+        )
+        self.assertEqual(summary['cooccurrence'], [[2, 2, 1, 0], [2, 2, 1, 0], [1, 1, 2, 0], [0, 0, 0, 0]])
+        self.assertEqual(summary['segments'], [{'start': 1, 'end': 2}, {'start': 3, 'end': 4}])
+        self.assertEqual(summary['presence'], [[1.0, 0.0], [1.0, 0.0], [0.5, 0.5], [0.0, 0.0]])
+        self.assertEqual(summary['pairs'][0], {'characters': ['ann', 'ben'], 'scenes': 2, 'jaccard': 1.0})
+
+    def test_results_are_cached_by_story_version(self):
+        """A repeated request skips the membership queries until the story changes."""
+
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url, HTTP_IF_NONE_MATCH='"stale"')
+        self.assertFalse([query for query in queries if 'app_scene' in query['sql']])
+
+        Scene.objects.create(title='Scene', description='A scene.', story=self.story1).characters.add(
+            Character.objects.get(slug='dee')
+        )
+        summary = self.client.get(self.url).json()
+        self.assertEqual((summary['scene_count'], summary['characters'][3]['scenes']), (5, 1))
@@ -6,9 +6,17 @@ urlpatterns = [
     path('', views.home, name='home'),
     path('stories/', views.stories, name='stories'),
     path('stories/new/', views.create_or_update_story, name='new_story'),
+    path('stories/import/', views.import_story, name='import_story'),
+    path('stories/stats/', views.writing_stats, name='writing_stats'),
+    path('search/', views.search, name='search'),
     path('stories/<slug:story_slug>/', views.story_detail, name='story_detail'),
     path('stories/<slug:story_slug>/update/', views.create_or_update_story, name='update_story'),
     path('stories/<slug:story_slug>/delete/', views.delete_story, name='delete_story'),
+    path('stories/<slug:story_slug>/export/', views.export_story, name='export_story'),
+    path('stories/<slug:story_slug>/graph/', views.story_graph, name='story_graph'),
+    path('stories/<slug:story_slug>/reorder/', views.reorder, name='reorder'),
+    path('stories/<slug:story_slug>/revisions/', views.revisions, name='story_revisions'),
+    path('stories/<slug:story_slug>/revisions/<int:number>/', views.revision, name='story_revision'),
     path('stories/<slug:story_slug>/scenes/', views.scenes, name='scenes'),
     path('stories/<slug:story_slug>/scenes/new/', views.create_or_update_scene, name='new_scene'),
     path('stories/<slug:story_slug>/scenes/<int:scene_order>/', views.scene_detail, name='scene_detail'),
@@ -17,11 +25,23 @@ urlpatterns = [
     path('stories/<slug:story_slug>/scenes/<int:scene_order>/up/', views.move_up, name='move_up'),
     path('stories/<slug:story_slug>/scenes/<int:scene_order>/down/', views.move_down, name='move_down'),
     path('stories/<slug:story_slug>/scenes/<int:scene_order>/add-character/', views.add_scene_character, name='add_scene_character'),
+    path('stories/<slug:story_slug>/scenes/<int:scene_order>/autosave/', views.autosave, name='autosave_scene'),
+    path('stories/<slug:story_slug>/scenes/<int:scene_order>/revisions/', views.revisions, name='scene_revisions'),
+    path('stories/<slug:story_slug>/scenes/<int:scene_order>/revisions/<int:number>/', views.revision, name='scene_revision'),
     path('stories/<slug:story_slug>/characters/', views.characters, name='characters'),
     path('stories/<slug:story_slug>/characters/new/', views.create_or_update_character, name='new_character'),
     path('stories/<slug:story_slug>/characters/<slug:character_slug>/', views.character_detail, name='character_detail'),
     path('stories/<slug:story_slug>/characters/<slug:character_slug>/update/', views.create_or_update_character, name='update_character'),
     path('stories/<slug:story_slug>/characters/<slug:character_slug>/delete/', views.delete_character, name='delete_character'),
+    path('stories/<slug:story_slug>/characters/<slug:character_slug>/autosave/', views.autosave, name='autosave_character'),
+    path('stories/<slug:story_slug>/characters/<slug:character_slug>/revisions/', views.revisions, name='character_revisions'),
+    path('stories/<slug:story_slug>/characters/<slug:character_slug>/revisions/<int:number>/', views.revision, name='character_revision'),
+    path('stories/<slug:story_slug>/characters/<slug:character_slug>/neighbors/', views.character_neighbors, name='character_neighbors'),
+    path('stories/<slug:story_slug>/cooccurrence/', views.character_cooccurrence, name='character_cooccurrence'),
+    path('stories/<slug:story_slug>/relationships/', views.relationships, name='relationships'),
+    path('stories/<slug:story_slug>/relationships/path/', views.relationship_path, name='relationship_path'),
+    path('stories/<slug:story_slug>/relationships/groups/', views.relationship_groups, name='relationship_groups'),
+    path('stories/<slug:story_slug>/relationships/<int:relationship_id>/delete/', views.delete_relationship, name='delete_relationship'),
     path('stories/<slug:story_slug>/plot/', views.plot_detail, name='plot_detail'),
     path('stories/<slug:story_slug>/plot/update/', views.update_plot, name='update_plot'),
     path('stories/<slug:story_slug>/plot/new/', views.create_or_update_plotpoint, name='new_plotpoint'),
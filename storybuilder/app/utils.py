@@ -1,8 +1,13 @@
 """Utilities module for the Story Builder."""
-from django.shortcuts import get_object_or_404
+import logging
+
+from django.shortcuts import get_object_or_404, aget_object_or_404
 from django.http import Http404
 
 from .models import Story, Scene, Character, Plot, PlotPoint
+from .ordering import get_at_position, aget_at_position
+
+logger = logging.getLogger(__name__)
 
 
 def get_story_by_slug(story_slug: str, author_id: int):
@@ -11,27 +16,18 @@ def get_story_by_slug(story_slug: str, author_id: int):
     try:
         story = get_object_or_404(Story, slug=story_slug, author_id=author_id)
         return story
-    except Http404 as error:
-        print(f"HTTP404 Error while getting Story object {story_slug}.")
-        print(error)
+    except Http404:
+        logger.debug("Story %s not found for author %s", story_slug, author_id)
         return None
 
 
 def get_scene(story_id: int, scene_order: int):
-    """Get a scene object by story ID and scene order."""
-
-    try:
-        scene = get_object_or_404(
-            Scene,
-            story_id=story_id,
-            order=scene_order
-        )
-        return scene
+    """Get a scene object by story ID and its 1-based position in the scene list."""
 
-    except Http404 as error:
-        print(f"HTTP404 Error while getting Scene object {scene_order}.")
-        print(error)
-        return None
+    scene = get_at_position(Scene.objects.filter(story_id=story_id), scene_order)
+    if not scene:
+        logger.debug("Scene %s not found in story %s", scene_order, story_id)
+    return scene
 
 
 def get_character(story_id: int, character_slug: str):
@@ -45,9 +41,8 @@ def get_character(story_id: int, character_slug: str):
         )
         return character
 
-    except Http404 as error:
-        print(f"HTTP404 Error while getting character object {character_slug}.")
-        print(error)
+    except Http404:
+        logger.debug("Character %s not found in story %s", character_slug, story_id)
         return None
 
 
@@ -58,29 +53,73 @@ def get_plot(story_id: int):
         plot = get_object_or_404(Plot, story_id=story_id)
         return plot
 
-    except Http404 as error:
-        print(f"HTTP404 Error while getting plot object for story ID {story_id}.")
-        print(error)
+    except Http404:
+        logger.debug("Plot not found for story %s", story_id)
         return None
 
 
 def get_plotpoint(story_slug: str, plotpoint_order: int, author_id: int):
-    """Get a plot point object by story ID and plot point order."""
+    """Get a plot point object by story slug and its 1-based position in the plot."""
 
     story = get_story_by_slug(story_slug, author_id)
     if not story:
         return None
 
+    plotpoint = get_at_position(PlotPoint.objects.filter(plot__story_id=story.id), plotpoint_order)
+    if not plotpoint:
+        logger.debug("Plot point %s not found in story %s", plotpoint_order, story.id)
+    return plotpoint
+
+
+### Async versions, for views running on the event loop
+
+async def aget_story_by_slug(story_slug: str, author_id: int):
+    """Async version of `get_story_by_slug`."""
+
     try:
-        plot_id = story.plot.id
-        plotpoint = get_object_or_404(
-            PlotPoint,
-            plot_id=plot_id,
-            order=plotpoint_order
-        )
-        return plotpoint
+        return await aget_object_or_404(Story, slug=story_slug, author_id=author_id)
+    except Http404:
+        logger.debug("Story %s not found for author %s", story_slug, author_id)
+        return None
+
+
+async def aget_scene(story_id: int, scene_order: int):
+    """Async version of `get_scene`."""
 
-    except Http404 as error:
-        print(f"HTTP404 Error while getting plot point object {plotpoint_order}.")
-        print(error)
+    scene = await aget_at_position(Scene.objects.filter(story_id=story_id), scene_order)
+    if not scene:
+        logger.debug("Scene %s not found in story %s", scene_order, story_id)
+    return scene
+
+
+async def aget_character(story_id: int, character_slug: str):
+    """Async version of `get_character`."""
+
+    try:
+        return await aget_object_or_404(Character, story_id=story_id, slug=character_slug)
+    except Http404:
+        logger.debug("Character %s not found in story %s", character_slug, story_id)
         return None
+
+
+async def aget_plot(story_id: int):
+    """Async version of `get_plot`."""
+
+    try:
+        return await aget_object_or_404(Plot, story_id=story_id)
+    except Http404:
+        logger.debug("Plot not found for story %s", story_id)
+        return None
+
+
+async def aget_plotpoint(story_slug: str, plotpoint_order: int, author_id: int):
+    """Async version of `get_plotpoint`."""
+
+    story = await aget_story_by_slug(story_slug, author_id)
+    if not story:
+        return None
+
+    plotpoint = await aget_at_position(PlotPoint.objects.filter(plot__story_id=story.id), plotpoint_order)
+    if not plotpoint:
+        logger.debug("Plot point %s not found in story %s", plotpoint_order, story.id)
+    return plotpoint
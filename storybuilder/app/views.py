@@ -1,18 +1,44 @@
+import json
+import logging
+
+from django.conf import settings
 from django.shortcuts import render, redirect
-from django.db.models import F
+from django.http import JsonResponse, StreamingHttpResponse
+from django.db import transaction
+from django.db.models import aprefetch_related_objects
 from django.db.utils import IntegrityError
-from django.contrib.auth.decorators import login_required
-
-from .forms import StoryForm, SceneForm, CharacterForm, PlotForm, PlotPointForm, WordCountForm, SceneNoteForm, SceneCharacterForm
-from .models import Story, Scene, Character, Plot, PlotPoint
-from .utils import get_story_by_slug, get_scene, get_character, get_plot, get_plotpoint
+from django.views.decorators.http import require_POST
+
+from .forms import StoryForm, StoryImportForm, SceneForm, CharacterForm, PlotForm, PlotPointForm, SceneNoteForm, SceneCharacterForm, RelationshipForm, ReorderForm
+from .models import Story, Scene, SceneNote, Character, Plot, PlotPoint, Relationship
+from .ordering import apply_ordering, move_to_position, position_of
+from .cooccurrence import MAX_SEGMENTS, SEGMENTS, cooccurrence_summary
+from .autosave import AUTOSAVE_FIELDS, PatchError, form_data, save_patch
+from .decorators import conditional_story_list, login_required, not_found, resolve_story
+from .export import EXPORTERS, buffered, story_graph as story_graph_json
+from .fragments import aget_fragments
+from .graph import MAX_DEPTH, get_graph
+from .importing import OutlineError, import_outline, read_lines
+from .log import SafeContext
+from .pagination import KeysetPage, aget_page
+from .progress import STATS_DAYS, writing_stats as writing_stats_summary
+from .revisions import chain_to, replay, revisions_of
+from .search import search as search_index
+from .utils import get_story_by_slug
+
+logger = logging.getLogger(__name__)
+
+# Scene notes shown per page on the scene detail page
+NOTES_PER_PAGE = 20
+
+# Rows shown per page on the story, scene and character lists
+ITEMS_PER_PAGE = 50
 
 # Create your views here.
 def home(request):
     """View function for rendering the home page."""
 
-    print("*****************************")
-    print("Home Page")
+    logger.debug("Home Page")
 
     return render(request, 'home.html')
 
@@ -20,65 +46,38 @@ def home(request):
 ### Story view functions
 
 @login_required
-def stories(request):
+@conditional_story_list
+async def stories(request):
     """View function for listing stories."""
 
-    print("**********************************")
-    print("Stories View")
+    logger.debug("Stories View")
 
     try:
         author_id = request.user.id
-        stories = Story.objects.filter(author_id=author_id)
+        stories = await KeysetPage(Story.objects.filter(author_id=author_id), 'id', request.GET.get('cursor'), ITEMS_PER_PAGE).aload()
         context = {
             'stories': stories
         }
         return render(request, 'stories.html', context=context)
     except Exception as error:
-        print("*********** Error while rendering story list ***********")
-        print(error)
+        logger.exception("Error while rendering story list")
         return render(request, '500.html')
 
 
 @login_required
-def story_detail(request, story_slug):
+@resolve_story(plot=True, conditional=True)
+async def story_detail(request, story, plot, story_slug):
     """View function for displaying story details."""
 
-    print("**************************************************")
-    print("Story Detail View")
-
-    author_id = request.user.id
-    story = get_story_by_slug(story_slug, author_id)
-    if not story:
-        context = {'model_name': 'Story'}
-        return render(request, '404.html', status=404, context=context)
-    
-    # Ordered scene list
-    scenes = story.scene_set.all().order_by('order')
-
-    # Get story plot
-    plot = get_plot(story.id)
-    if not plot:
-        context = {'model_name': 'Plot'}
-        return render(request, '404.html', status=404, context=context)
-
-    # Instantiate word count update form
-    if request.method == 'POST':
-        form = WordCountForm(request.POST)
-        if form.is_valid():
-            story.word_count = form.cleaned_data['word_count']
-            print(f"story.word_count: {story.word_count}")
-            story.save()
-            return redirect('story_detail', story_slug=story_slug)
-    else:
-        form = WordCountForm()
+    logger.debug("Story Detail View")
 
+    fragments = await aget_fragments(story, ('story_detail', [story.author]))
     context = {
         'story': story,
-        'scenes': scenes,
         'plot': plot,
-        'form': form
+        'fragments': fragments
     }
-    print(f"context: {context}")
+    logger.debug("Context: %s", SafeContext(context))
 
     return render(request, 'story_detail.html', context=context)
 
@@ -87,8 +86,7 @@ def story_detail(request, story_slug):
 def create_or_update_story(request, story_slug=None):
     """View function for creating a new story."""
 
-    print("**************************************************")
-    print("Create or Update Story View")
+    logger.debug("Create or Update Story View")
 
     template_name = ''
     context= {}
@@ -104,11 +102,18 @@ def create_or_update_story(request, story_slug=None):
                 return render(request, '404.html', status=404, context=context)
 
             if request.method == 'POST':
-                print(f"Updating Story object {story_slug} ...")
+                logger.debug("Updating story %s", story_slug)
                 form = StoryForm(request.POST, instance=story)
                 if form.is_valid():
-                    story = form.save()
-                    return redirect('story_detail', story_slug=story.slug)
+                    try:
+                        story = form.save()
+                        return redirect('story_detail', story_slug=story.slug)
+                    except IntegrityError:
+                        logger.info("Duplicate story title for author %s", author_id)
+                        form.add_error(
+                            None,
+                            'You already have a story with this title.'
+                        )
             else:
                 form = StoryForm(instance=story)
             template_name = 'update_story.html'
@@ -121,7 +126,7 @@ def create_or_update_story(request, story_slug=None):
         # Create story when no story slug is passed
         else:
             if request.method == 'POST':
-                print("Creating a new Story object ...")
+                logger.debug("Creating a new story")
                 form = StoryForm(request.POST, author_id=author_id)
                 if form.is_valid():
                     try:
@@ -131,10 +136,10 @@ def create_or_update_story(request, story_slug=None):
                             description=f"Briefly summarize the plot of your story here.",
                             story_id=new_story.id
                         )
-                        print(f"Successfully created new story {new_story.id} and plot {new_plot.id}.")
+                        logger.info("Created story %s and plot %s", new_story.id, new_plot.id)
                         return redirect('story_detail', story_slug=new_story.slug)
                     except IntegrityError:
-                        print("Duplicate story ...")
+                        logger.info("Duplicate story title for author %s", author_id)
                         form.add_error(
                             None,
                             'You already have a story with this title.'
@@ -150,136 +155,209 @@ def create_or_update_story(request, story_slug=None):
             }
 
     except Exception as error:
-        print("****** Error while creating or updating story ******")
-        print(error)
+        logger.exception("Error while creating or updating story")
         return render(request, '500.html')
 
     try:
-        print(f"context: {context}")
+        logger.debug("Context: %s", SafeContext(context))
         return render(request=request, template_name=template_name, context=context)
     except Exception as error:
-        print("*************** Error while rendering template ***************")
-        print(error)
+        logger.exception("Error while rendering template")
         return render(request, '500.html')
 
 
 @login_required
-def delete_story(request, story_slug):
-    """View function for deleting a story."""
+def import_story(request):
+    """View function for creating a whole story from an uploaded outline file.
 
-    print("*********************")
-    print("Delete Story")
+    Every problem in the outline is listed on the form, with the scene,
+    character or line it came from, and nothing is created until the whole
+    outline is valid.
+    """
 
-    author_id = request.user.id
-    story = get_story_by_slug(story_slug, author_id)
-    if not story:
-        context = {'model_name': 'Story'}
-        return render(request, '404.html', status=404, context=context)
+    logger.debug("Import Story View")
+
+    errors = []
+    if request.method == 'POST':
+        form = StoryImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            try:
+                story = import_outline(
+                    request.user,
+                    read_lines(form.cleaned_data['outline']),
+                    form.cleaned_data['format']
+                )
+                return redirect('story_detail', story_slug=story.slug)
+            except OutlineError as error:
+                logger.info("Rejected an outline with %d problems for author %s", len(error.errors), request.user.id)
+                errors = error.errors
+    else:
+        form = StoryImportForm()
+
+    context = {
+        'form': form,
+        'errors': errors
+    }
+    return render(request, 'import_story.html', context=context)
+
+
+@login_required
+@resolve_story
+def delete_story(request, story, story_slug):
+    """View function for deleting a story."""
+
+    logger.debug("Delete Story")
 
     try:
         story.delete()
     except Exception as error:
-        print("There was an error while deleting the story.")
-        print(error)
+        logger.exception("There was an error while deleting the story.")
 
     return redirect('stories')
 
 
+@login_required
+@resolve_story(plot=True)
+def export_story(request, story, plot, story_slug):
+    """View function for downloading a whole story outline.
+
+    The `format` parameter picks Markdown (`md`, the default), `html` or
+    plain text (`txt`). The outline is streamed as it is read, see
+    app/export.py.
+    """
+
+    logger.debug("Export Story")
+
+    exporter_class = EXPORTERS.get(request.GET.get('format', 'md'))
+    if not exporter_class:
+        return render(request, '404.html', status=404, context={'model_name': 'Export format'})
+
+    exporter = exporter_class(story, plot)
+    response = StreamingHttpResponse(exporter.stream(), content_type=exporter.content_type)
+    response['Content-Disposition'] = f'attachment; filename="{exporter.filename()}"'
+    return response
+
+
+@login_required
+@resolve_story(plot=True, as_json=True, conditional=True)
+def story_graph(request, story, plot, story_slug):
+    """View function for the read-only JSON structure of a whole story.
+
+    Responds with the story, plot, plot points, scenes and characters in a
+    fixed number of queries, streamed as it is encoded, see app/export.py.
+    """
+
+    logger.debug("Story Graph")
+
+    return StreamingHttpResponse(buffered(story_graph_json(story, plot)), content_type='application/json')
+
+
+@login_required
+def writing_stats(request):
+    """View function for the author's writing progress across all of their stories, as JSON.
+
+    Responds with the words written per day over the last `days` days, the
+    current and longest daily streaks, and totals, see app/progress.py.
+    """
+
+    logger.debug("Writing Stats View")
+
+    try:
+        days = int(request.GET.get('days', STATS_DAYS))
+    except ValueError:
+        days = STATS_DAYS
+    days = min(max(days, 1), settings.WORD_COUNT_DAILY_DAYS)
+
+    return JsonResponse(writing_stats_summary(request.user.id, days))
+
+
 ### Scene view functions
 
 @login_required
-def scenes(request, story_slug):
+@resolve_story(conditional=True)
+async def scenes(request, story, story_slug):
     """View function for listing scenes."""
 
-    print("**********************************")
-    print("Scenes View")
-
-    author_id = request.user.id
-    story = get_story_by_slug(story_slug, author_id)
-    if not story:
-        context = {'model_name': 'Story'}
-        return render(request, '404.html', status=404, context=context)
+    logger.debug("Scenes View")
 
     try:
-        scenes = Scene.objects.filter(story_id=story.id)
+        cursor = request.GET.get('cursor', '')
+        scenes = KeysetPage(Scene.objects.filter(story_id=story.id).defer('prose'), 'order', cursor, ITEMS_PER_PAGE, version=story.version)
+        fragments = await aget_fragments(story, ('scenes', [cursor]))
+        if 'scenes' not in fragments:
+            await scenes.aload()
         context = {
+            'story': story,
             'story_title': story.title,
-            'scenes': scenes
+            'scenes': scenes,
+            'cursor': cursor,
+            'fragments': fragments
         }
         return render(request, 'scenes.html', context=context)
     except Exception as error:
-        print("*********** Error while rendering scene list ***********")
-        print(error)
+        logger.exception("Error while rendering scene list")
         return render(request, '500.html')
 
 
 @login_required
-def scene_detail(request, story_slug, scene_order):
+@resolve_story(conditional=True)
+async def scene_detail(request, story, scene, story_slug, scene_order):
     """View function for rendering scene details."""
 
-    print("*************************************")
-    print("Scene Detail")
-
-    author_id = request.user.id
-    story = get_story_by_slug(story_slug, author_id)
-    if not story:
-        context = {'model_name': 'Story'}
-        return render(request, '404.html', status=404, context=context)
-
-    scene = get_scene(story.id, scene_order)
-    if not scene:
-        context = {'model_name': 'Scene'}
-        return render(request, '404.html', status=404, context=context)
+    logger.debug("Scene Detail")
 
     # Add scene note form
     if request.method == 'POST':
         form = SceneNoteForm(request.POST)
         if form.is_valid():
-            print("Adding new scene note ...")
-            print(form.cleaned_data['note'])
-            scene.notes.append(form.cleaned_data['note'])
-            scene.save()
+            logger.debug("Adding a note to scene %s", scene.pk)
+            await SceneNote.objects.acreate(scene_id=scene.id, text=form.cleaned_data['note'])
             return redirect('scene_detail', story_slug=story_slug, scene_order=scene_order)
     else:
         form = SceneNoteForm()
 
+    # Newest notes first, read only when the cached fragment misses
+    try:
+        notes_page = max(int(request.GET.get('notes', 1)), 1)
+    except ValueError:
+        notes_page = 1
+
+    notes = None
+    fragments = await aget_fragments(story, ('scene_detail', [scene.pk, notes_page]))
+    if 'scene_detail' not in fragments:
+        await aprefetch_related_objects([scene], 'characters')
+        notes = await aget_page(SceneNote.objects.filter(scene_id=scene.id).order_by('-id'), NOTES_PER_PAGE, notes_page)
+
     context = {
         'scene': scene,
+        'story': story,
         'story_title': story.title,
         'story_slug': story.slug,
-        'form': form
+        'notes': notes,
+        'notes_page': notes_page,
+        'form': form,
+        'fragments': fragments
     }
 
-    print(f"context: {context}")
+    logger.debug("Context: %s", SafeContext(context))
     return render(request, 'scene_detail.html', context=context)
 
 
 @login_required
-def create_or_update_scene(request, story_slug, scene_order=None):
+@resolve_story
+def create_or_update_scene(request, story, story_slug, scene=None, scene_order=None):
     """View function for creating a new scene in a story."""
 
-    print("******************************************")
-    print("Create or Update Scene")
+    logger.debug("Create or Update Scene")
 
     template_name = ''
     context= {}
 
-    author_id = request.user.id
-    story = get_story_by_slug(story_slug, author_id)
-    if not story:
-        context = {'model_name': 'Story'}
-        return render(request, '404.html', status=404, context=context)
-
     try:
         # Update scene
-        if scene_order:
-            scene = get_scene(story.id, scene_order)
-            if not scene:
-                context = {'model_name': 'Scene'}
-                return render(request, '404.html', status=404, context=context)
-
+        if scene:
             if request.method == 'POST':
-                print(f"Updating Scene object {scene_order}")
+                logger.debug("Updating scene %s", scene_order)
                 form = SceneForm(request.POST, instance=scene)
                 if form.is_valid():
                     scene = form.save()
@@ -290,27 +368,22 @@ def create_or_update_scene(request, story_slug, scene_order=None):
             template_name = 'update_scene.html'
             context = {
                 'form': form,
-                'story_title': story.title
+                'story_title': story.title,
+                'autosave_fields': AUTOSAVE_FIELDS[Scene]
             }
 
         # Create new scene
         else:
             if request.method == 'POST':
-                print("Creating a new Scene object ...")
-                form = SceneForm(
-                    request.POST,
-                    story_slug=story_slug,
-                    author_id=author_id
-                )
+                logger.debug("Creating a new scene")
+                form = SceneForm(request.POST, story=story)
                 if form.is_valid():
                     new_scene = form.save()
-                    return redirect('scene_detail', story_slug=story_slug, scene_order=new_scene.order)
+                    new_position = position_of(new_scene, Scene.objects.filter(story=story))
+                    return redirect('scene_detail', story_slug=story_slug, scene_order=new_position)
 
             else:
-                form = SceneForm(
-                    story_slug=story_slug,
-                    author_id=author_id
-                )
+                form = SceneForm(story=story)
 
             template_name = 'new_scene.html'
             context = {
@@ -319,40 +392,27 @@ def create_or_update_scene(request, story_slug, scene_order=None):
             }
 
     except Exception as error:
-        print("****** Error while creating or updating scene ******")
-        print(error)
+        logger.exception("Error while creating or updating scene")
         return render(request, '500.html')
 
     try:
-        print(f"context: {context}")
+        logger.debug("Context: %s", SafeContext(context))
         return render(request=request, template_name=template_name, context=context)
     except Exception as error:
-        print("*************** Error while rendering template ***************")
-        print(error)
+        logger.exception("Error while rendering template")
         return render(request, '500.html')
 
 
 @login_required
-def add_scene_character(request, story_slug: str, scene_order: int):
+@resolve_story
+def add_scene_character(request, story, scene, story_slug: str, scene_order: int):
     """View function for the form for adding a character to a specific scene."""
 
-    print("**********************")
-    print("Add Scene Character")
+    logger.debug("Add Scene Character")
 
     template_name = ''
     context = {}
 
-    author_id = request.user.id
-    story = get_story_by_slug(story_slug, author_id)
-    if not story:
-        context = {'model_name': 'Story'}
-        return render(request, '404.html', status=404, context=context)
-    
-    scene = get_scene(story.id, scene_order)
-    if not scene:
-                context = {'model_name': 'Scene'}
-                return render(request, '404.html', status=404, context=context)
-    
     # Form logic for adding scene characters
     if request.method == 'POST':
         form = SceneCharacterForm(request.POST, instance=scene)
@@ -370,39 +430,23 @@ def add_scene_character(request, story_slug: str, scene_order: int):
         'form': form
     }
 
-    print(f"context: {context}")
+    logger.debug("Context: %s", SafeContext(context))
     return render(request=request, template_name=template_name, context=context)
 
 
 @login_required
-def delete_scene(request, story_slug, scene_order):
+@resolve_story
+def delete_scene(request, story, scene, story_slug, scene_order):
     """View function for deleting an existing scene in a story."""
 
-    print("******************************")
-    print("Delete Scene")
-
-    author_id = request.user.id
-    story = get_story_by_slug(story_slug, author_id)
-    if not story:
-        context = {'model_name': 'Story'}
-        return render(request, '404.html', status=404, context=context)
-
-    scene = get_scene(story.id, scene_order)
-    if not scene:
-                context = {'model_name': 'Scene'}
-                return render(request, '404.html', status=404, context=context)
+    logger.debug("Delete Scene")
 
-    # Delete scene and update the order of the next scenes
+    # Later scenes keep their sort keys, so their positions close the gap on their own
     try:
         scene.delete()
-        Scene.objects.filter(
-            story=story,
-            order__gt=scene_order
-        ).update(order=F('order') - 1)
 
     except Exception as error:
-        print("There was an error while deleting the scene.")
-        print(error)
+        logger.exception("There was an error while deleting the scene.")
 
     return redirect('scenes', story_slug=story_slug)
 
@@ -410,81 +454,63 @@ def delete_scene(request, story_slug, scene_order):
 ### Character view functions
 
 @login_required
-def characters(request, story_slug):
+@resolve_story(conditional=True)
+async def characters(request, story, story_slug):
     """View function for listing characters."""
 
-    print("**********************************")
-    print("Characters View")
-
-    author_id = request.user.id
-    story = get_story_by_slug(story_slug, author_id)
-    if not story:
-        context = {'model_name': 'Story'}
-        return render(request, '404.html', status=404, context=context)
+    logger.debug("Characters View")
 
     try:
-        characters = Character.objects.filter(story_id=story.id)
+        cursor = request.GET.get('cursor', '')
+        characters = KeysetPage(Character.objects.filter(story_id=story.id), 'id', cursor, ITEMS_PER_PAGE)
+        fragments = await aget_fragments(story, ('characters', [cursor]))
+        if 'characters' not in fragments:
+            await characters.aload()
         context = {
             'user': request.user,
+            'story': story,
             'story_title': story.title,
-            'characters': characters
+            'characters': characters,
+            'cursor': cursor,
+            'fragments': fragments
         }
         return render(request, 'characters.html', context=context)
     except Exception as error:
-        print("*********** Error while rendering character list ***********")
-        print(error)
+        logger.exception("Error while rendering character list")
         context = {'error': error}
         return render(request, '500.html')
 
 
 @login_required
-def character_detail(request, story_slug, character_slug):
+@resolve_story(conditional=True)
+async def character_detail(request, story, character, story_slug, character_slug):
     """View function for displaying character details."""
 
-    author_id = request.user.id
-    story = get_story_by_slug(story_slug, author_id)
-    if not story:
-        context = {'model_name': 'Story'}
-        return render(request, '404.html', status=404, context=context)
-
-    character = get_character(story.id, character_slug)
-    if not character:
-        context = {'model_name': 'Character'}
-        return render(request, '404.html', status=404, context=context)
-
     context = {
         'story': story,
         'character': character
     }
-    print(f"context: {context}")
+    logger.debug("Context: %s", SafeContext(context))
 
     return render(request, 'character_detail.html', context=context)
 
 
 @login_required
-def create_or_update_character(request, story_slug=None, character_slug=None):
+@resolve_story
+def create_or_update_character(request, story, story_slug=None, character=None, character_slug=None):
     """View function for creating a new character."""
 
-    print("******************************************")
-    print("Create or Update Character")
+    logger.debug("Create or Update Character")
 
     template_name = ''
     context = {}
 
-    author_id = request.user.id
-    story = get_story_by_slug(story_slug, author_id)
-    if not story:
-        context = {'model_name': 'Story'}
-        return render(request, '404.html', status=404, context=context)
-
     try:
 
         # Update character
-        if character_slug:
-            character = get_character(story.id, character_slug)
-
+        if character:
             if request.method == 'POST':
-                print(f"Updating Character object {character_slug}")
+                logger.debug("Updating character %s", character_slug)
                 form = CharacterForm(request.POST, instance=character)
                 if form.is_valid():
                     character = form.save(  )
@@ -495,27 +521,21 @@ def create_or_update_character(request, story_slug=None, character_slug=None):
             template_name = 'update_character.html'
             context = {
                 'form': form,
-                'story_title': story.title
+                'story_title': story.title,
+                'autosave_fields': AUTOSAVE_FIELDS[Character]
             }
 
         # Create new character
         else:
             if request.method == 'POST':
-                print("Creating a new Character object ...")
-                form = CharacterForm(
-                    request.POST,
-                    story_slug=story_slug,
-                    author_id=author_id
-                )
+                logger.debug("Creating a new character")
+                form = CharacterForm(request.POST, story=story)
                 if form.is_valid():
                     new_character = form.save()
                     return redirect('character_detail', story_slug=story_slug, character_slug=new_character.slug)
 
             else:
-                form = CharacterForm(
-                    story_slug=story_slug,
-                    author_id=author_id
-                )
+                form = CharacterForm(story=story)
 
             template_name = 'new_character.html'
             context = {
@@ -524,42 +544,28 @@ def create_or_update_character(request, story_slug=None, character_slug=None):
             }
 
     except Exception as error:
-        print("****** Error while creating or updating character ******")
-        print(error)
+        logger.exception("Error while creating or updating character")
         return render(request, '500.html')
 
     try:
-        print(f"context: {context}")
+        logger.debug("Context: %s", SafeContext(context))
         return render(request=request, template_name=template_name, context=context)
     except Exception as error:
-        print("*************** Error while rendering template ***************")
-        print(error)
+        logger.exception("Error while rendering template")
         return render(request, '500.html')
 
 
 @login_required
-def delete_character(request, story_slug, character_slug):
+@resolve_story
+def delete_character(request, story, character, story_slug, character_slug):
     """View function for deleting a character."""
 
-    print("**************************")
-    print("Delete Character")
-
-    author_id = request.user.id
-    story = get_story_by_slug(story_slug, author_id)
-    if not story:
-        context = {'model_name': 'Story'}
-        return render(request, '404.html', status=404, context=context)
-
-    character = get_character(story.id, character_slug)
-    if not character:
-        context = {'model_name': 'Character'}
-        return render(request, '404.html', status=404, context=context)
+    logger.debug("Delete Character")
 
     try:
         character.delete()
     except Exception as error:
-        print("There was an error while deleting the character.")
-        print(error)
+        logger.exception("There was an error while deleting the character.")
 
     return redirect('characters', story_slug=story_slug)
 
@@ -567,51 +573,33 @@ def delete_character(request, story_slug, character_slug):
 ### Plot View Functions
 
 @login_required
-def plot_detail(request, story_slug):
+@resolve_story(plot=True, conditional=True)
+async def plot_detail(request, story, plot, story_slug):
     """View function for rendering story plot details."""
 
-    print("*************************************")
-    print("Plot Details")
+    logger.debug("Plot Details")
 
-    author_id = request.user.id
-    story = get_story_by_slug(story_slug, author_id)
-    if not story:
-        context = {'model_name': 'Story'}
-        return render(request, '404.html', status=404, context=context)
-    
-    # Get story plot
-    plot = get_plot(story.id)
-    if not plot:
-        context = {'model_name': 'Plot'}
-        return render(request, '404.html', status=404, context=context)
+    fragments = await aget_fragments(story, ('plot_detail', []), ('plot_points', []))
+    if 'plot_points' not in fragments:
+        await aprefetch_related_objects([plot], 'plotpoint_set')
 
     context = {
+        'story': story,
         'story_title': story.title,
-        'plot': plot
+        'plot': plot,
+        'fragments': fragments
     }
-    print(f"context: {context}")
+    logger.debug("Context: %s", SafeContext(context))
     return render(request, 'plot_detail.html', context=context)
 
 
 @login_required
-def update_plot(request, story_slug):
+@resolve_story(plot=True)
+def update_plot(request, story, plot, story_slug):
     """View function for updating story plot details."""
 
-    print("***********************************")
-    print("Update Plot Details")
+    logger.debug("Update Plot Details")
 
-    author_id = request.user.id
-    story = get_story_by_slug(story_slug, author_id)
-    if not story:
-        context = {'model_name': 'Story'}
-        return render(request, '404.html', status=404, context=context)
-
-    # Get story plot
-    plot = get_plot(story.id)
-    if not plot:
-        context = {'model_name': 'Plot'}
-        return render(request, '404.html', status=404, context=context)
-    
     if request.method == 'POST':
         form = PlotForm(request.POST, instance=plot)
         if form.is_valid():
@@ -624,27 +612,17 @@ def update_plot(request, story_slug):
         'plot': plot,
         'form': form
     }
-    print(f"context: {context}")
+    logger.debug("Context: %s", SafeContext(context))
     return render(request, 'update_plot.html', context=context)
 
 
 ### Plot point view functions
 
 @login_required
-def plotpoint_detail(request, story_slug, plotpoint_order):
+@resolve_story(conditional=True)
+async def plotpoint_detail(request, story, plotpoint, story_slug, plotpoint_order):
     """View function for rendering plot point details."""
 
-    author_id = request.user.id
-    story = get_story_by_slug(story_slug, author_id)
-    if not story:
-        context = {'model_name': 'Story'}
-        return render(request, '404.html', status=404, context=context)
-
-    plotpoint = get_plotpoint(story_slug, plotpoint_order, author_id)
-    if not plotpoint:
-        context = {'model_name': 'Plot Point'}
-        return render(request, '404.html', status=404, context=context)
-    
     context = {
         'story_slug': story.slug,
         'story_title': story.title,
@@ -655,32 +633,18 @@ def plotpoint_detail(request, story_slug, plotpoint_order):
 
 
 @login_required
-def create_or_update_plotpoint(request, story_slug, plotpoint_order=None):
+@resolve_story(plot=True)
+def create_or_update_plotpoint(request, story, plot, story_slug, plotpoint=None, plotpoint_order=None):
     """View function for creating or updating a plot point."""
 
     template_name = ''
     context = {}
 
-    author_id = request.user.id
-    story = get_story_by_slug(story_slug, author_id)
-    if not story:
-        context = {'model_name': 'Story'}
-        return render(request, '404.html', status=404, context=context)
-    
-    # Define plot ID
-    plot_id = story.plot.id
-    print(f"plot ID: {plot_id}")
-
     # Update plot point
-    if plotpoint_order:
-        plotpoint = get_plotpoint(story_slug, plotpoint_order, author_id)
-        if not plotpoint:
-            context = {'model_name': 'Plot Point'}
-            return render(request, '404.html', status=404, context=context)
-        
+    if plotpoint:
         # Form logic
         if request.method == 'POST':
-            print(f"Updating plot point {plotpoint_order} ...")
+            logger.debug("Updating plot point %s", plotpoint_order)
             form = PlotPointForm(
                 request.POST,
                 instance=plotpoint
@@ -705,21 +669,20 @@ def create_or_update_plotpoint(request, story_slug, plotpoint_order=None):
 
     # Create new plot point
     else:
-        print("Creating new plot point ...")
-
         if request.method == 'POST':
-            print(f"Creating new plot point ...")
-            form = PlotPointForm(request.POST, plot_id=plot_id)
+            logger.debug("Creating a new plot point")
+            form = PlotPointForm(request.POST, plot=plot)
             if form.is_valid():
                 new_plotpoint = form.save()
+                new_position = position_of(new_plotpoint, PlotPoint.objects.filter(plot=plot))
                 return redirect(
                     'plotpoint_detail',
                     story_slug=story_slug,
-                    plotpoint_order=new_plotpoint.order
+                    plotpoint_order=new_position
                 )
 
         else:
-            form = PlotPointForm(plot_id=plot_id)
+            form = PlotPointForm(plot=plot)
 
         template_name = 'new_plotpoint.html'
         context = {
@@ -731,34 +694,17 @@ def create_or_update_plotpoint(request, story_slug, plotpoint_order=None):
 
 
 @login_required
-def delete_plotpoint(request, story_slug, plotpoint_order):
+@resolve_story
+def delete_plotpoint(request, story, plotpoint, story_slug, plotpoint_order):
     """View function for deleting a plot point."""
 
-    print("******************************")
-    print("Delete Plot Point")
+    logger.debug("Delete Plot Point")
 
-    author_id = request.user.id
-    story = get_story_by_slug(story_slug, author_id)
-    if not story:
-        context = {'model_name': 'Story'}
-        return render(request, '404.html', status=404, context=context)
-
-    plotpoint = get_plotpoint(story_slug, plotpoint_order, author_id)
-    if not plotpoint:
-        context = {'model_name': 'Plot Point'}
-        return render(request, '404.html', status=404, context=context)
-
-    # Delete plot point and update the order of the next plot points
+    # Later plot points keep their sort keys, so their positions close the gap on their own
     try:
-        plot = plotpoint.plot
         plotpoint.delete()
-        PlotPoint.objects.filter(
-            plot=plot,
-            order__gt=plotpoint_order
-        ).update(order=F('order') - 1)
     except Exception as error:
-        print("There was an error while deleting plot point.")
-        print(error)
+        logger.exception("There was an error while deleting plot point.")
 
     return redirect('plot_detail', story_slug=story_slug)
 
@@ -766,88 +712,440 @@ def delete_plotpoint(request, story_slug, plotpoint_order):
 ### Vview functions to move scenes and plot points up or down in a list
 
 @login_required
-def move_up(request, story_slug, scene_order=None, plotpoint_order=None):
+@resolve_story
+def move_up(request, story, story_slug, scene=None, scene_order=None, plotpoint=None, plotpoint_order=None):
     """View function for moving scene or plot point objects up in a list."""
 
-    print("******************")
-    print("Move Up")
-
-    author_id = request.user.id
-    story = get_story_by_slug(story_slug, author_id)
-    if not story:
-        context = {'model_name': 'Story'}
-        return render(request, '404.html', status=404, context=context)
+    logger.debug("Move Up")
 
-    if scene_order:
-        print(f"Reordering scene {scene_order}")
+    if scene:
+        logger.debug("Moving scene %s", scene_order)
 
-        scene = get_scene(story.id, scene_order)
-        if not scene:
-                context = {'model_name': 'Scene'}
-                return render(request, '404.html', status=404, context=context)
-        
-        prev_scene = Scene.objects.filter(story=story, order__lt=scene.order).order_by('-order').first()
-        if prev_scene:
-            prev_scene.order, scene.order = scene.order, prev_scene.order
-            prev_scene.save()
-            scene.save()
+        if scene_order > 1:
+            move_to_position(scene, Scene.objects.filter(story=story), scene_order - 1)
+            Story.objects.filter(pk=story.pk).bump_version()
         return redirect('story_detail', story_slug=story_slug)
 
-    elif plotpoint_order:
-        print(f"Reordering plot point {plotpoint_order}")
-
-        plotpoint = get_plotpoint(story_slug, plotpoint_order, author_id)
-        if not plotpoint:
-            context = {'model_name': 'Plot Point'}
-            return render(request, '404.html', status=404, context=context)
-        
-        prev_plotpoint = PlotPoint.objects.filter(plot=plotpoint.plot, order__lt=plotpoint.order).order_by('-order').first()
-        if prev_plotpoint:
-            prev_plotpoint.order, plotpoint.order = plotpoint.order, prev_plotpoint.order
-            prev_plotpoint.save()
-            plotpoint.save()
+    elif plotpoint:
+        logger.debug("Moving plot point %s", plotpoint_order)
+
+        if plotpoint_order > 1:
+            move_to_position(plotpoint, PlotPoint.objects.filter(plot_id=plotpoint.plot_id), plotpoint_order - 1)
+            Story.objects.filter(pk=story.pk).bump_version()
         return redirect('plot_detail', story_slug=story_slug)
 
 
 @login_required
-def move_down(request, story_slug, scene_order=None, plotpoint_order=None):
+@resolve_story
+def move_down(request, story, story_slug, scene=None, scene_order=None, plotpoint=None, plotpoint_order=None):
     """View function for moving scene or plot point objects down in a list."""
 
-    print("******************")
-    print("Move Down")
+    logger.debug("Move Down")
 
-    author_id = request.user.id
-    story = get_story_by_slug(story_slug, author_id)
-    if not story:
-        context = {'model_name': 'Story'}
-        return render(request, '404.html', status=404, context=context)
+    if scene:
+        logger.debug("Moving scene %s", scene_order)
 
-    if scene_order:
-        print(f"Reordering scene {scene_order}")
-
-        scene = get_scene(story.id, scene_order)
-        if not scene:
-                context = {'model_name': 'Scene'}
-                return render(request, '404.html', status=404, context=context)
-        
-        next_scene = Scene.objects.filter(story=story, order__gt=scene.order).order_by('order').first()
-        if next_scene:
-            next_scene.order, scene.order = scene.order, next_scene.order
-            next_scene.save()
-            scene.save()
+        move_to_position(scene, Scene.objects.filter(story=story), scene_order + 1)
+        Story.objects.filter(pk=story.pk).bump_version()
         return redirect('story_detail', story_slug=story_slug)
 
-    elif plotpoint_order:
-        print(f"Reordering plot point {plotpoint_order}")
-
-        plotpoint = get_plotpoint(story_slug, plotpoint_order, author_id)
-        if not plotpoint:
-            context = {'model_name': 'Plot Point'}
-            return render(request, '404.html', status=404, context=context)
-        
-        next_plotpoint = PlotPoint.objects.filter(plot=plotpoint.plot, order__gt=plotpoint.order).order_by('order').first()
-        if next_plotpoint:
-            next_plotpoint.order, plotpoint.order = plotpoint.order, next_plotpoint.order
-            next_plotpoint.save()
-            plotpoint.save()
+    elif plotpoint:
+        logger.debug("Moving plot point %s", plotpoint_order)
+
+        move_to_position(plotpoint, PlotPoint.objects.filter(plot_id=plotpoint.plot_id), plotpoint_order + 1)
+        Story.objects.filter(pk=story.pk).bump_version()
         return redirect('plot_detail', story_slug=story_slug)
+
+
+@login_required
+@require_POST
+@resolve_story(as_json=True)
+def reorder(request, story, story_slug):
+    """View function for moving one scene or plot point, or reordering the whole list, in one request.
+
+    Accepts a JSON body such as {"kind": "scenes", "position": 400, "target": 3}
+    or {"kind": "plotpoints", "order": [3, 1, 2]}, where the numbers are the
+    current 1-based positions, and responds with the new order.
+    """
+
+    logger.debug("Reorder")
+
+    try:
+        data = json.loads(request.body) if request.content_type == 'application/json' else request.POST
+    except ValueError:
+        return JsonResponse({'error': 'The request body is not valid JSON.'}, status=400)
+    if not isinstance(data, dict):
+        return JsonResponse({'error': 'The request body must be a JSON object.'}, status=400)
+
+    form = ReorderForm(data)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+
+    if form.cleaned_data['kind'] == 'scenes':
+        siblings = Scene.objects.filter(story=story)
+        label_field = 'title'
+    else:
+        siblings = PlotPoint.objects.filter(plot__story=story)
+        label_field = 'name'
+
+    with transaction.atomic():
+        items = list(siblings.order_by('order').only('id', 'order'))
+        order = form.cleaned_data['order']
+
+        # Full permutation of the current positions
+        if order is not None:
+            if sorted(order) != list(range(1, len(items) + 1)):
+                return JsonResponse({'error': f"The order must list each position from 1 to {len(items)} once."}, status=400)
+            apply_ordering(siblings, [items[position - 1] for position in order])
+
+        # Single item moved to a target position
+        else:
+            position = form.cleaned_data['position']
+            if position > len(items):
+                return JsonResponse({'error': f"There is no item at position {position}."}, status=404)
+            move_to_position(items[position - 1], siblings, form.cleaned_data['target'])
+
+        # Sort keys are rewritten with bulk updates, which send no signals
+        Story.objects.filter(pk=story.pk).bump_version()
+
+    labels = siblings.order_by('order').values_list(label_field, flat=True)
+    context = {
+        'kind': form.cleaned_data['kind'],
+        'order': [
+            {'position': position, label_field: label}
+            for position, label in enumerate(labels, start=1)
+        ]
+    }
+    return JsonResponse(context)
+
+
+### Autosave view functions
+
+@login_required
+@require_POST
+@resolve_story(as_json=True)
+def autosave(request, story, story_slug, scene=None, scene_order=None, character=None, character_slug=None):
+    """View function for saving a partial patch of a scene or character, as JSON.
+
+    Accepts a JSON object, or form fields, holding only the fields that
+    changed, such as {"prose": "..."}, and responds with the fields written
+    and the fields still pending, see app/autosave.py. With `flush=1` in the
+    query string, everything pending is written at once.
+    """
+
+    logger.debug("Autosave")
+
+    try:
+        if request.content_type == 'application/json':
+            patch = json.loads(request.body)
+            if not isinstance(patch, dict):
+                return JsonResponse({'error': 'The patch must be a JSON object.'}, status=400)
+            patch = form_data(patch)
+        else:
+            patch = request.POST.dict()
+            patch.pop('csrfmiddlewaretoken', None)
+    except ValueError:
+        return JsonResponse({'error': 'The request body is not valid JSON.'}, status=400)
+
+    instance = scene or character
+    editor = request.session.session_key or request.user.id
+    try:
+        context = save_patch(instance, patch, editor, flush=request.GET.get('flush') == '1')
+    except PatchError as error:
+        return JsonResponse({'errors': error.errors}, status=400)
+
+    # A renamed character moves to a new URL
+    if character and context['saved']:
+        context['slug'] = character.slug
+    return JsonResponse(context)
+
+
+### Revision view functions
+
+@login_required
+@resolve_story(as_json=True)
+def revisions(request, story, story_slug, scene=None, scene_order=None, character=None, character_slug=None):
+    """View function for the revision list of a story, scene or character, newest first, as JSON.
+
+    Takes an optional `before` revision number to page back through older revisions.
+    """
+
+    logger.debug("Revisions View")
+
+    rows = revisions_of(scene or character or story).order_by('-number')
+    try:
+        if request.GET.get('before'):
+            rows = rows.filter(number__lt=int(request.GET['before']))
+    except ValueError:
+        return JsonResponse({'error': 'The revision number must be a whole number.'}, status=400)
+
+    rows = list(rows.values('number', 'base', 'created_at')[:ITEMS_PER_PAGE + 1])
+    context = {
+        'revisions': [
+            {'number': row['number'], 'created_at': row['created_at'], 'snapshot': row['base'] == row['number']}
+            for row in rows[:ITEMS_PER_PAGE]
+        ],
+        'before': rows[ITEMS_PER_PAGE - 1]['number'] if len(rows) > ITEMS_PER_PAGE else None
+    }
+    return JsonResponse(context)
+
+
+@login_required
+@resolve_story(as_json=True)
+def revision(request, story, story_slug, number, scene=None, scene_order=None, character=None, character_slug=None):
+    """View function for the fields of a story, scene or character as of one revision, as JSON."""
+
+    logger.debug("Revision View")
+
+    chain = chain_to(revisions_of(scene or character or story), number)
+    if not chain:
+        return not_found(request, 'Revision', as_json=True)
+
+    context = {
+        'number': number,
+        'created_at': chain[-1].created_at,
+        'fields': replay(chain)
+    }
+    return JsonResponse(context)
+
+
+### Relationship view functions
+
+def character_labels(story, ids=None, slugs=None) -> dict:
+    """Look up the slug and name of the characters in a graph answer by ID or slug, in one query."""
+
+    characters = Character.objects.filter(story_id=story.id)
+    characters = characters.filter(pk__in=ids) if slugs is None else characters.filter(slug__in=slugs)
+    return {row['id']: {'slug': row['slug'], 'name': row['full_name']} for row in characters.values('id', 'slug', 'full_name')}
+
+
+def relationship_kinds(request):
+    """The relationship kinds named by `kind` parameters, or None for every kind."""
+
+    return set(request.GET.getlist('kind')) or None
+
+
+def edge_json(graph, pk, labels) -> dict:
+    source, target, kind = graph.edges[pk]
+    return {'id': pk, 'kind': kind, 'source': labels[source]['slug'], 'target': labels[target]['slug']}
+
+
+@login_required
+@resolve_story(as_json=True)
+def relationships(request, story, story_slug):
+    """View function for listing the relationships of a story, or adding one, as JSON.
+
+    GET lists relationships by ID, paged with an optional `after` ID. POST
+    takes a JSON object or form fields naming the `source` and `target`
+    characters by slug, the `kind` and an optional `description`.
+    """
+
+    logger.debug("Relationships View")
+
+    if request.method == 'POST':
+        try:
+            data = json.loads(request.body) if request.content_type == 'application/json' else request.POST
+        except ValueError:
+            return JsonResponse({'error': 'The request body is not valid JSON.'}, status=400)
+        if not isinstance(data, dict):
+            return JsonResponse({'error': 'The request body must be a JSON object.'}, status=400)
+
+        form = RelationshipForm(data, story=story)
+        if not form.is_valid():
+            return JsonResponse({'errors': form.errors}, status=400)
+        try:
+            with transaction.atomic():
+                relationship = form.save()
+        except IntegrityError:
+            # The same pair was related by a concurrent request after the form was validated
+            form.add_error(None, 'These characters already have this relationship.')
+            return JsonResponse({'errors': form.errors}, status=400)
+        context = {
+            'id': relationship.id,
+            'source': relationship.source.slug,
+            'target': relationship.target.slug,
+            'kind': relationship.kind,
+            'description': relationship.description
+        }
+        return JsonResponse(context, status=201)
+
+    rows = Relationship.objects.filter(story_id=story.id).order_by('id')
+    try:
+        if request.GET.get('after'):
+            rows = rows.filter(id__gt=int(request.GET['after']))
+    except ValueError:
+        return JsonResponse({'error': 'The relationship ID must be a whole number.'}, status=400)
+
+    rows = list(
+        rows.values('id', 'source__slug', 'target__slug', 'kind', 'description')[:ITEMS_PER_PAGE + 1]
+    )
+    context = {
+        'relationships': [
+            {
+                'id': row['id'],
+                'source': row['source__slug'],
+                'target': row['target__slug'],
+                'kind': row['kind'],
+                'description': row['description']
+            }
+            for row in rows[:ITEMS_PER_PAGE]
+        ],
+        'after': rows[ITEMS_PER_PAGE - 1]['id'] if len(rows) > ITEMS_PER_PAGE else None
+    }
+    return JsonResponse(context)
+
+
+@login_required
+@require_POST
+@resolve_story(as_json=True)
+def delete_relationship(request, story, story_slug, relationship_id):
+    """View function for removing a relationship, as JSON."""
+
+    logger.debug("Delete Relationship")
+
+    relationship = Relationship.objects.filter(pk=relationship_id, story_id=story.id).first()
+    if not relationship:
+        return not_found(request, 'Relationship', as_json=True)
+    relationship.delete()
+    return JsonResponse({'deleted': relationship_id})
+
+
+@login_required
+@resolve_story(as_json=True)
+def character_neighbors(request, story, character, story_slug, character_slug):
+    """View function for the characters related to a character, as JSON.
+
+    Takes an optional `depth` (default 1, at most `MAX_DEPTH`) to include
+    characters related through others, and `kind` parameters to follow
+    only some kinds of relationship. Each neighbor names the character it
+    was reached through and the relationships between the two.
+    """
+
+    logger.debug("Character Neighbors View")
+
+    try:
+        depth = min(max(int(request.GET.get('depth', 1)), 1), MAX_DEPTH)
+    except ValueError:
+        return JsonResponse({'error': 'The depth must be a whole number.'}, status=400)
+
+    kinds = relationship_kinds(request)
+    graph = get_graph(story)
+    neighbors = graph.neighbors(character.id, depth, kinds)
+    labels = character_labels(story, ids=[pk for pk, _, _ in neighbors])
+    labels[character.id] = {'slug': character.slug, 'name': character.full_name}
+
+    context = {
+        'character': character.slug,
+        'depth': depth,
+        'neighbors': [
+            {
+                **labels[pk],
+                'distance': distance,
+                'via': labels[parent]['slug'],
+                'relationships': [edge_json(graph, edge, labels) for edge in graph.between(parent, pk, kinds)]
+            }
+            for pk, distance, parent in neighbors
+        ]
+    }
+    return JsonResponse(context)
+
+
+@login_required
+@resolve_story(as_json=True)
+def relationship_path(request, story, story_slug):
+    """View function for a shortest chain of relationships between the characters `from` and `to`, as JSON.
+
+    Each character on the path lists the relationships linking it to the
+    one before. The path is null if the characters are not connected.
+    Takes `kind` parameters to follow only some kinds of relationship.
+    """
+
+    logger.debug("Relationship Path View")
+
+    ends = [request.GET.get('from', ''), request.GET.get('to', '')]
+    ids = {label['slug']: pk for pk, label in character_labels(story, slugs=ends).items()}
+    if not all(slug in ids for slug in ends):
+        return not_found(request, 'Character', as_json=True)
+
+    kinds = relationship_kinds(request)
+    graph = get_graph(story)
+    path = graph.shortest_path(ids[ends[0]], ids[ends[1]], kinds)
+
+    context = {'from': ends[0], 'to': ends[1], 'length': None, 'path': None}
+    if path is not None:
+        labels = character_labels(story, ids=path)
+        context['length'] = len(path) - 1
+        context['path'] = [
+            {
+                **labels[pk],
+                'relationships': [edge_json(graph, edge, labels) for edge in graph.between(previous, pk, kinds)] if previous is not None else []
+            }
+            for previous, pk in zip([None] + path, path)
+        ]
+    return JsonResponse(context)
+
+
+@login_required
+@resolve_story(as_json=True)
+def relationship_groups(request, story, story_slug):
+    """View function for the groups of characters connected by relationships, largest first, as JSON.
+
+    Characters without relationships are left out. Takes `kind` parameters
+    to follow only some kinds of relationship.
+    """
+
+    logger.debug("Relationship Groups View")
+
+    groups = get_graph(story).groups(relationship_kinds(request))
+    labels = character_labels(story, ids=[pk for group in groups for pk in group])
+
+    return JsonResponse({'groups': [[labels[pk] for pk in group] for group in groups]})
+
+
+@login_required
+@resolve_story(as_json=True, conditional=True)
+def character_cooccurrence(request, story, story_slug):
+    """View function for who shares scenes with whom, and where characters appear, as JSON.
+
+    Responds with each character's scene count and first and last scene,
+    the matrix of scenes shared by each pair of characters, each
+    character's share of the scenes in each of `segments` (default 10) runs
+    of consecutive scenes, and the pairs sharing the most scenes, see
+    app/cooccurrence.py.
+    """
+
+    logger.debug("Character Co-occurrence View")
+
+    try:
+        segments = min(max(int(request.GET.get('segments', SEGMENTS)), 1), MAX_SEGMENTS)
+    except ValueError:
+        return JsonResponse({'error': 'The number of segments must be a whole number.'}, status=400)
+
+    return JsonResponse(cooccurrence_summary(story, segments))
+
+
+### Search view functions
+
+@login_required
+def search(request):
+    """View function for ranked full-text search over the author's stories, scenes and characters.
+
+    Takes the query in `q` and optional `limit` (at most 50) and `offset`
+    parameters, and responds with JSON results holding a highlighted title
+    and snippet and a link to the matching page.
+    """
+
+    logger.debug("Search")
+
+    query = request.GET.get('q', '').strip()
+    try:
+        limit = min(max(int(request.GET.get('limit', 20)), 1), 50)
+        offset = max(int(request.GET.get('offset', 0)), 0)
+    except ValueError:
+        return JsonResponse({'error': 'The limit and offset must be whole numbers.'}, status=400)
+
+    context = {
+        'query': query,
+        'results': search_index(request.user.id, query, limit=limit, offset=offset)
+    }
+    return JsonResponse(context)
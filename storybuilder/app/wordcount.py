@@ -0,0 +1,80 @@
+"""Word counts of scene prose, kept up to date from the change made by each save.
+
+A word is a run of non-whitespace characters, as `str.split` sees it. An
+edit usually touches a few words in a long text, so instead of counting
+the whole text again, `count_change` finds the span that differs between
+the old and new text and counts only the words inside it.
+"""
+
+# Characters compared per step when looking for the common prefix and suffix
+SCAN_BLOCK = 4096
+
+
+def count_words(text: str) -> int:
+    """Count the words in a text."""
+
+    return len(text.split()) if text else 0
+
+
+def common_prefix_length(old: str, new: str) -> int:
+    """Return the length of the longest common prefix of two strings.
+
+    Whole blocks are compared first, so only the block holding the first
+    difference is compared character by character.
+    """
+
+    limit = min(len(old), len(new))
+    start = 0
+    while start < limit and old[start:start + SCAN_BLOCK] == new[start:start + SCAN_BLOCK]:
+        start += SCAN_BLOCK
+    end = min(start + SCAN_BLOCK, limit)
+    while start < end and old[start] == new[start]:
+        start += 1
+    return min(start, limit)
+
+
+def common_suffix_length(old: str, new: str, limit: int) -> int:
+    """Return the length of the longest common suffix of two strings, up to `limit` characters."""
+
+    length = 0
+    while length < limit:
+        step = min(SCAN_BLOCK, limit - length)
+        if old[len(old) - length - step:len(old) - length] != new[len(new) - length - step:len(new) - length]:
+            break
+        length += step
+    else:
+        return length
+
+    while length < limit and old[-length - 1] == new[-length - 1]:
+        length += 1
+    return length
+
+
+def changed_span(old: str, new: str) -> tuple:
+    """Return (start, old_end, new_end), the slices of both texts that hold every changed word.
+
+    The common prefix and suffix are trimmed back to whitespace, so a word
+    that was edited in the middle is inside the span in full and the words
+    outside the span are identical in both texts.
+    """
+
+    prefix = common_prefix_length(old, new)
+    while prefix and not old[prefix - 1].isspace():
+        prefix -= 1
+
+    suffix = common_suffix_length(old, new, min(len(old), len(new)) - prefix)
+    while suffix and not old[len(old) - suffix].isspace():
+        suffix -= 1
+
+    return prefix, len(old) - suffix, len(new) - suffix
+
+
+def count_change(old: str, new: str) -> int:
+    """Return the change in word count from `old` to `new`, counting only the changed span."""
+
+    old, new = old or '', new or ''
+    if old == new:
+        return 0
+
+    start, old_end, new_end = changed_span(old, new)
+    return count_words(new[start:new_end]) - count_words(old[start:old_end])
@@ -13,4 +13,7 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'storybuilder.settings')
 
+# Each request runs its queries on a new thread, so connections can't be reused
+os.environ.setdefault('DATABASE_CONN_MAX_AGE', '0')
+
 application = get_asgi_application()
@@ -45,6 +45,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'app.middleware.RequestIDMiddleware',
+    'app.middleware.ReadAfterWriteMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -54,6 +56,57 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Opt-in query counting per URL name, see app/middleware.py
+QUERY_BUDGET_ENABLED = os.environ.get('QUERY_BUDGET_ENABLED', 'False') == 'True'
+if QUERY_BUDGET_ENABLED:
+    MIDDLEWARE.insert(1, 'app.middleware.QueryBudgetMiddleware')
+
+# Maximum queries per request, including the session and user lookups. Views that write
+# leave room for the savepoint their transaction becomes inside a test case.
+QUERY_BUDGET_DEFAULT = 10
+QUERY_BUDGETS = {
+    'home': 3,
+    'stories': 4,
+    'new_story': 2,
+    'import_story': 50,
+    'writing_stats': 5,
+    'search': 6,
+    'story_detail': 3,
+    'update_story': 3,
+    'export_story': 8,
+    'story_graph': 8,
+    'reorder': 12,
+    'scenes': 4,
+    'new_scene': 5,
+    'scene_detail': 7,
+    'update_scene': 7,
+    'move_up': 9,
+    'move_down': 9,
+    'add_scene_character': 6,
+    'characters': 4,
+    'new_character': 3,
+    'character_detail': 4,
+    'update_character': 4,
+    'plot_detail': 5,
+    'update_plot': 3,
+    'new_plotpoint': 3,
+    'plotpoint_detail': 4,
+    'update_plotpoint': 4,
+    'story_revisions': 4,
+    'story_revision': 4,
+    'scene_revisions': 5,
+    'scene_revision': 5,
+    'character_revisions': 5,
+    'character_revision': 5,
+    'relationships': 4,
+    'character_neighbors': 6,
+    'relationship_path': 5,
+    'relationship_groups': 5,
+    'character_cooccurrence': 5,
+    'profile': 4,
+    'update_profile': 3,
+}
+
 ROOT_URLCONF = 'storybuilder.urls'
 
 TEMPLATES = [
@@ -79,13 +132,117 @@ WSGI_APPLICATION = 'storybuilder.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
+DATABASE_PATH = BASE_DIR / 'db.sqlite3'
+
+# Seconds to keep a connection open between requests; asgi.py defaults it to
+# 0, as ASGI requests run their queries on a new thread each time
+DATABASE_CONN_MAX_AGE = int(os.environ.get('DATABASE_CONN_MAX_AGE', 600))
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': DATABASE_PATH,
+        'CONN_MAX_AGE': DATABASE_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+    },
+    # The same file opened read-only, for the reads of requests that have not written
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': f"{DATABASE_PATH.as_uri()}?mode=ro",
+        'CONN_MAX_AGE': DATABASE_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+
+DATABASE_ROUTERS = ['app.database.ReadWriteRouter']
+
+# Connection that read-only queries are routed to; empty to read from the primary
+DATABASE_READ_ALIAS = os.environ.get('DATABASE_READ_ALIAS', 'replica')
+
+# Applied to every new SQLite connection, see app/database.py
+SQLITE_PRAGMAS = {
+    'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'wal'),
+    'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000)),
+    'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'normal'),
+    # Negative sizes are in KiB: 64 MiB of page cache per connection
+    'cache_size': int(os.environ.get('SQLITE_CACHE_SIZE', -64 * 1024)),
+    'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'storybuilder',
+        'OPTIONS': {'MAX_ENTRIES': 5000},
     }
 }
 
+# Rendered page fragments, keyed by story version (see app/fragments.py)
+FRAGMENT_CACHE_ALIAS = 'default'
+FRAGMENT_CACHE_TIMEOUT = 60 * 60
+
+# Writing progress history, see app/progress.py: raw word count updates are
+# kept this many days, and daily totals this many before they become weekly
+WORD_COUNT_RAW_DAYS = int(os.environ.get('WORD_COUNT_RAW_DAYS', 90))
+WORD_COUNT_DAILY_DAYS = int(os.environ.get('WORD_COUNT_DAILY_DAYS', 365))
+
+# Autosave, see app/autosave.py: each editor's patches to a scene or
+# character are written at most once per this many seconds
+AUTOSAVE_INTERVAL = int(os.environ.get('AUTOSAVE_INTERVAL', 10))
+
+# Revision history, see app/revisions.py: a full snapshot at least every
+# interval revisions, and the latest revisions of each object plus every
+# revision from the last days are kept when compacting
+REVISION_SNAPSHOT_INTERVAL = int(os.environ.get('REVISION_SNAPSHOT_INTERVAL', 20))
+REVISION_KEEP = int(os.environ.get('REVISION_KEEP', 50))
+REVISION_KEEP_DAYS = int(os.environ.get('REVISION_KEEP_DAYS', 90))
+
+# Character relationship graphs, see app/graph.py: the number of built
+# graphs each process keeps in memory, one per story and graph version
+GRAPH_CACHE_SIZE = int(os.environ.get('GRAPH_CACHE_SIZE', 256))
+
+# Part of every page ETag; change it when a deploy changes the page templates
+# so browsers stop revalidating against the old pages
+PAGE_ETAG_SALT = os.environ.get('PAGE_ETAG_SALT', '')
+
+
+# Logging
+# https://docs.djangoproject.com/en/5.0/topics/logging/
+#
+# App loggers stay at WARNING unless LOG_LEVEL says otherwise, so debug
+# tracing costs nothing in production. Set LOG_FORMAT=json for one JSON
+# object per line.
+
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'WARNING')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'filters': {
+        'request_id': {'()': 'app.log.RequestIDFilter'},
+    },
+    'formatters': {
+        'text': {'format': '%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s'},
+        'json': {'()': 'app.log.JSONFormatter'},
+    },
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+            'filters': ['request_id'],
+            'formatter': os.environ.get('LOG_FORMAT', 'text'),
+        },
+    },
+    'loggers': {
+        'app': {'handlers': ['console'], 'level': LOG_LEVEL, 'propagate': False},
+        'accounts': {'handlers': ['console'], 'level': LOG_LEVEL, 'propagate': False},
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators